@@ -26,6 +26,20 @@ def package_version():
     return package_metadata['version']
 
 
+@pytest.fixture(scope='function', autouse=True)
+def vsh_home(tmpdir_factory, monkeypatch) -> Path:
+    """Keeps configuration, history, locks, caches and the index out of the real home folder"""
+    from vsh import disk_usage, history, locks, package_index
+
+    home = Path(str(tmpdir_factory.mktemp('home')))
+    monkeypatch.setenv('HOME', str(home))
+    monkeypatch.setattr(disk_usage, 'CACHE_PATH', home / '.vsh' / 'cache' / 'du')
+    monkeypatch.setattr(history, 'HISTORY_PATH', home / '.vsh' / 'history.log')
+    monkeypatch.setattr(locks, 'LOCKS_PATH', home / '.vsh' / 'locks')
+    monkeypatch.setattr(package_index, 'INDEX_PATH', home / '.vsh' / 'index.json')
+    yield home
+
+
 @pytest.fixture(scope='function')
 def workon_home(tmpdir) -> Path:
     old_workon_home = os.environ.get('WORKON_HOME', '')
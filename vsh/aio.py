@@ -0,0 +1,219 @@
+import asyncio
+import contextlib
+import functools
+import os
+import signal
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Iterable, List, Optional, Tuple
+
+from . import api, history, locks, packages
+
+__all__ = ('MAX_WORKERS', 'STREAM_LIMIT', 'create', 'enter', 'remove', 'run_blocking')
+
+# Threads shared by every async operation for blocking filesystem work
+MAX_WORKERS = 32
+
+# Longest line read from an entered command's output
+STREAM_LIMIT = 2 ** 20
+
+# Called with each line of output; may also be a coroutine function
+LineCallback = Callable[[str], Any]
+
+_executor: Optional[ThreadPoolExecutor] = None
+
+
+async def create(path: Path, include_pip: bool = True, requirements: Optional[Path] = None, precompile: bool = True, verbose: int = 0, **kwds) -> Path:
+    """Creates a virtual environment without blocking the event loop
+
+    Directory work runs in a bounded thread pool while ensurepip and
+    bytecode compilation run as asyncio subprocesses.  The exclusive lock
+    is held from start to finish, and a newly created environment is
+    removed again if creation fails or is cancelled.
+
+    Args:
+        path: path to virtual environment
+        include_pip: Includes pip within virtualenv [default: True]
+        requirements: path to requirements file to install
+        precompile: compile bytecode of site-packages after setup [default: True]
+        verbose: more output [default: 0]
+        kwds: other arguments of vsh.api.create
+
+    Returns:
+        path to virtual environment
+    """
+    path = path.expanduser().resolve().absolute()
+    # Held until setup is complete so no other creator reuses an environment without pip yet
+    fd = await _acquire(path, verbose=verbose)
+    try:
+        existed = await _run_locked(path, api.validate_environment, path)
+        try:
+            await _run_locked(path, api.create, path, include_pip=False, precompile=False, verbose=verbose, **kwds)
+            python = str(packages.find_bin_path(path) / 'python')
+            if include_pip:
+                await _check_call([python, '-Esm', 'ensurepip', '--upgrade', '--default-pip'])
+            if requirements:
+                await _run_locked(path, api.install_requirements, path, requirements=requirements, verbose=verbose)
+            site_packages = await run_blocking(packages.find_site_packages, path)
+            if precompile and site_packages:
+                # Files which do not compile are skipped, as in vsh.builder.compile_site_packages
+                await _call([python, '-Esm', 'compileall', '-q', '-j', '0', str(site_packages)])
+        except BaseException:
+            # Failed or cancelled; never leave a partial environment behind
+            if not existed:
+                await _run_locked(path, api.remove, path)
+            raise
+    finally:
+        locks.release(fd)
+    return path
+
+
+async def enter(path: Path, command: Optional[Iterable[str]] = None, verbose: int = 0, working: Optional[Path] = None, ignore_working: bool = False, on_stdout: Optional[LineCallback] = None, on_stderr: Optional[LineCallback] = None) -> int:
+    """Runs a command in a virtual environment without blocking the event loop
+
+    Output is inherited unless a callback is given, in which case each
+    line is passed to it as it arrives.  The command runs in a session
+    of its own, so cancelling the calling task kills the shell together
+    with every process it started.
+
+    Args:
+        path:  path to virtual environment
+        command: command to run in virtual env [default: shell]
+        verbose: Adds more information to stdout
+        working: Working folder path
+        ignore_working: use the current folder instead of the working path
+        on_stdout: called with each line written to stdout
+        on_stderr: called with each line written to stderr
+
+    Returns:
+        return code for command run
+    """
+    path = path.expanduser().resolve().absolute()
+    args, cwd, env = await run_blocking(api.build_enter_command, path, command=command, verbose=verbose, working=working, ignore_working=ignore_working)
+    fd = await _acquire(path, shared=True, verbose=verbose)
+    started = time.time()
+    try:
+        process = await asyncio.create_subprocess_exec(
+            *args, cwd=str(cwd), env=env, limit=STREAM_LIMIT, start_new_session=True,
+            stdout=subprocess.PIPE if on_stdout else None,
+            stderr=subprocess.PIPE if on_stderr else None,
+            )
+        try:
+            await asyncio.gather(_stream(process.stdout, on_stdout), _stream(process.stderr, on_stderr))
+            return_code = await process.wait()
+        except BaseException:
+            await _terminate(process)
+            raise
+    finally:
+        locks.release(fd)
+    await run_blocking(history.record, path, timestamp=started, duration=time.time() - started)
+    return return_code
+
+
+async def remove(path: Path, verbose: int = 0, dry_run: bool = False, check: bool = False) -> Path:
+    """Removes a virtual environment without blocking the event loop
+
+    Args:
+        path: path to virtual environment
+        verbose: more output [default: 0]
+        dry_run: do not update system
+        check: Raises PathNotFoundError if True and path isn't found [default: False]
+
+    Returns:
+        folder path removed
+    """
+    return await run_blocking(api.remove, path, verbose=verbose, dry_run=dry_run, check=check)
+
+
+async def run_blocking(func: Callable, *args, **kwds) -> Any:
+    """Runs a blocking function in the shared, bounded thread pool
+
+    Args:
+        func: function to run
+        args: positional arguments of func
+        kwds: keyword arguments of func
+
+    Returns:
+        result of func
+    """
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix='vsh-aio')
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, functools.partial(func, *args, **kwds))
+
+
+async def _acquire(path: Path, shared: bool = False, verbose: int = 0) -> Optional[int]:
+    """Takes a lock on a virtual environment in the thread pool"""
+    future = asyncio.ensure_future(run_blocking(locks.acquire, path, shared=shared, verbose=verbose))
+    try:
+        fd, _ = await asyncio.shield(future)
+    except asyncio.CancelledError:
+        # The thread keeps waiting for the lock; release it once taken
+        future.add_done_callback(_release_acquired)
+        raise
+    return fd
+
+
+async def _call(args: List[str]) -> Tuple[int, bytes]:
+    process = await asyncio.create_subprocess_exec(*args, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, start_new_session=True)
+    try:
+        output, _ = await process.communicate()
+        return_code = await process.wait()
+    except BaseException:
+        await _terminate(process)
+        raise
+    return return_code, output
+
+
+def _call_held(path: Path, func: Callable, *args, **kwds) -> Any:
+    with locks.held(path):
+        return func(*args, **kwds)
+
+
+async def _check_call(args: List[str]):
+    return_code, output = await _call(args)
+    if return_code:
+        raise subprocess.CalledProcessError(return_code, args, output=output)
+
+
+def _release_acquired(future: asyncio.Future):
+    if not future.cancelled() and future.exception() is None:
+        locks.release(future.result()[0])
+
+
+async def _run_locked(path: Path, func: Callable, *args, **kwds) -> Any:
+    """Runs a blocking function under the exclusive lock the calling task holds
+
+    Threads cannot be interrupted, so cancellation waits for the function
+    to finish before the caller can release the lock.
+    """
+    future = asyncio.ensure_future(run_blocking(_call_held, path, func, *args, **kwds))
+    try:
+        return await asyncio.shield(future)
+    except asyncio.CancelledError:
+        await asyncio.wait([future])
+        raise
+
+
+async def _stream(reader: Optional[asyncio.StreamReader], callback: Optional[LineCallback]):
+    if reader is None or callback is None:
+        return
+    async for line in reader:
+        result = callback(line.decode('utf-8', errors='replace').rstrip('\r\n'))
+        if asyncio.iscoroutine(result):
+            await result
+
+
+async def _terminate(process: asyncio.subprocess.Process):
+    """Kills a command started in a session of its own and every process in its group"""
+    if process.returncode is None:
+        with contextlib.suppress(ProcessLookupError):
+            if hasattr(os, 'killpg'):
+                os.killpg(process.pid, signal.SIGKILL)
+            else:
+                process.kill()
+        await asyncio.shield(process.wait())
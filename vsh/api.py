@@ -1,20 +1,317 @@
+import contextlib
+import fnmatch
 import os
 import re
 import shlex
 import shutil
+import signal
 import subprocess
 import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Dict, Iterable, Optional, Set, Tuple
-
-from . import terminal
+from typing import Any, Callable, ContextManager, Dict, Iterable, List, Optional, Sequence, Set, Tuple, Union
+
+from . import (
+    disk_usage,
+    ephemeral,
+    history,
+    instrument,
+    locks,
+    package_index,
+    packages,
+    resource_usage,
+    terminal,
+    tiering,
+    wheelhouse
+)
 from .__metadata__ import package_metadata
-from .builder import VenvBuilder
-from .errors import InterpreterNotFound, InvalidEnvironmentError, PathNotFoundError, VenvConfigNotFound, VenvNameError
+from .builder import PIP_LOCK_NAME, VenvBuilder, compile_site_packages, ensure_pip, stop_pip_setup
+from .errors import (
+    InterpreterNotFound,
+    InvalidEnvironmentError,
+    PathNotFoundError,
+    VenvConfigNotFound,
+    VenvLockedError,
+    VenvNameError
+)
+from .requirements import marker_environment
+from .units import format_size, parse_duration, parse_size
 from .vendored import click
 from .vsh_config import WORKON_HOME, VshConfig
 
-__all__ = ('create', 'enter', 'remove', 'show_envs', 'show_version')
+__all__ = ('RunResult', 'Venv', 'check_envs', 'create', 'diff_envs', 'du', 'each', 'enter', 'freeze', 'gc', 'install_requirements', 'list_packages', 'matrix', 'provision', 'remove', 'run', 'show_envs', 'show_version', 'tier', 'which_has')
+
+
+class _cached:
+    """Computes a Venv property on first access and keeps it in its cache"""
+
+    def __init__(self, func: Callable):
+        self.func = func
+        self.name = func.__name__
+        self.__doc__ = func.__doc__
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+        try:
+            return instance._cache[self.name]
+        except KeyError:
+            value = instance._cache[self.name] = self.func(instance)
+            return value
+
+
+@dataclass
+class RunResult:
+    """Outcome of a command run in a virtual environment
+
+    Attributes:
+        args: command and arguments which were run
+        returncode: exit status of the command
+        stdout: captured standard output; None when not captured
+        stderr: captured standard error; None when not captured
+        duration: seconds the command ran
+        timed_out: the command was killed after its timeout
+
+    """
+    args: List[str]
+    returncode: int
+    stdout: Optional[str] = None
+    stderr: Optional[str] = None
+    duration: float = 0.0
+    timed_out: bool = False
+
+    @property
+    def ok(self) -> bool:
+        return self.returncode == 0 and not self.timed_out
+
+
+class Venv:
+    """A virtual environment resolved once and reused
+
+    The path is resolved when created and everything derived from it
+    (bin folder, interpreter, site-packages, configuration, activated
+    environment) is computed on first use and then cached, so api
+    functions given a Venv never resolve or search the same paths twice.
+    Commands run through Venv.run are spawned directly; no shell is
+    started and no vshrc files are sourced.  Used as a context manager
+    the environment is kept from removal until closed; removing or
+    upgrading it from the same thread meanwhile raises VenvLockedError.
+
+    Attributes:
+        path: resolved path to virtual environment
+        name: name of virtual environment
+        working: folder commands run in [default: configured working path or current folder]
+
+    """
+    __slots__ = ('path', 'name', 'working', '_cache', '_lock')
+
+    def __init__(self, path: Path, working: Optional[Path] = None, check: bool = True):
+        """
+        Args:
+            path: path to virtual environment
+            working: folder commands run in [default: configured working path or current folder]
+            check: restore an archived environment and require a valid one [default: True]
+
+        Raises:
+            InvalidEnvironmentError: when check is True and path is not a valid environment
+        """
+        self.path = Path(path).expanduser().resolve()
+        self.name = self.path.name
+        self.working = working
+        self._cache: Dict[str, Any] = {}
+        self._lock: Optional[ContextManager[bool]] = None
+        if check:
+            if self.is_archived:
+                with locks.locked(self.path):
+                    if tiering.is_archived(self.path):
+                        tiering.restore(self.path)
+                self.refresh()
+            if not self.is_valid:
+                validate_environment(self.path, check=True)
+
+    def __enter__(self) -> 'Venv':
+        lock = locks.locked(self.path, shared=True)
+        lock.__enter__()
+        self._lock = lock
+        return self
+
+    def __exit__(self, *exc_info):
+        lock, self._lock = self._lock, None
+        lock.__exit__(*exc_info)
+
+    def __fspath__(self) -> str:
+        return str(self.path)
+
+    def __repr__(self) -> str:
+        return f'{type(self).__name__}({str(self.path)!r})'
+
+    @_cached
+    def bin_path(self) -> Path:
+        """Folder holding the interpreter and scripts"""
+        return packages.find_bin_path(self.path)
+
+    @_cached
+    def config(self) -> VshConfig:
+        """vsh configuration, created when missing"""
+        if self.config_path.exists():
+            return read_vsh_config(path=self.config_path)
+        return create_vsh_config(name=self.name, path=self.path, working=self.working, vsh_config_path=self.config_path)
+
+    @_cached
+    def config_path(self) -> Path:
+        """Path to the vsh configuration file"""
+        return find_vsh_config(name=self.name, check=False)
+
+    @_cached
+    def cwd(self) -> Path:
+        """Folder commands run in"""
+        return Path(self.working or self.config.working_path or Path.cwd())
+
+    @_cached
+    def env(self) -> Dict[str, str]:
+        """Environment variables of the activated environment"""
+        return _update_environment(config=self.config)
+
+    @_cached
+    def is_archived(self) -> bool:
+        """The environment was archived by tier"""
+        return tiering.is_archived(self.path)
+
+    @_cached
+    def is_valid(self) -> bool:
+        """The path holds a virtual environment (archived ones included)"""
+        return validate_environment(self.path)
+
+    @_cached
+    def python(self) -> Path:
+        """Interpreter of the environment"""
+        return self.bin_path / 'python'
+
+    @_cached
+    def site_packages(self) -> Optional[Path]:
+        """site-packages folder of the environment"""
+        return packages.find_site_packages(self.path)
+
+    @_cached
+    def version(self) -> Optional[str]:
+        """Python version of the environment from pyvenv.cfg"""
+        pyvenv_cfg = packages.read_pyvenv_cfg(self.path)
+        return pyvenv_cfg.get('version') or pyvenv_cfg.get('version_info')
+
+    def refresh(self):
+        """Forgets cached values after the environment changed on disk"""
+        self._cache.clear()
+
+    def run(self, args: Union[str, Sequence[str]], capture: bool = True, stream: Optional[Callable[[str, str], Any]] = None, timeout: Optional[float] = None, cwd: Optional[Path] = None, env: Optional[Dict[str, str]] = None, check: bool = False) -> RunResult:
+        """Runs a command in the virtual environment
+
+        Args:
+            args: command and arguments; a string is split like a shell would
+            capture: keep stdout and stderr in the result [default: True]
+            stream: called with ("stdout" or "stderr", line) for each line as it arrives, from reader threads
+            timeout: seconds before the command and any processes it started are killed [default: no limit]
+            cwd: folder to run in [default: the session's folder]
+            env: environment variables added for this run
+            check: raise when the command fails [default: False]
+
+        Raises:
+            CalledProcessError: when check is True and the command fails
+            FileNotFoundError: when the command cannot be found
+
+        Returns:
+            result of the run
+        """
+        args = shlex.split(args) if isinstance(args, str) else [str(arg) for arg in args]
+        run_env = dict(self.env, **(env or {}))
+        # Popen only searches the caller's PATH on some platforms
+        executable = shutil.which(args[0], path=run_env.get('PATH')) or args[0]
+        pipe = subprocess.PIPE if capture or stream else None
+        output: Dict[str, List[str]] = {'stdout': [], 'stderr': []}
+        started = time.time()
+        timed_out = False
+        with locks.locked(self.path, shared=True), instrument.phase('spawn'):
+            # A session of its own lets a timeout kill children still holding the pipes
+            proc = subprocess.Popen([executable, *args[1:]], cwd=str(cwd or self.cwd), env=run_env, stdout=pipe, stderr=pipe, start_new_session=True)
+            readers = [
+                threading.Thread(target=_read_lines, args=(getattr(proc, name), name, output[name] if capture else None, stream), daemon=True)
+                for name in output if pipe
+                ]
+            for reader in readers:
+                reader.start()
+            try:
+                returncode = proc.wait(timeout=timeout)
+            except subprocess.TimeoutExpired:
+                _kill_session(proc)
+                returncode = proc.wait()
+                timed_out = True
+            except BaseException:
+                # Outside the terminal's process group Ctrl-C no longer reaches the command
+                _kill_session(proc)
+                proc.wait()
+                raise
+            for reader in readers:
+                reader.join()
+        duration = time.time() - started
+        history.record(self.path, timestamp=started, duration=duration)
+        result = RunResult(
+            args=args, returncode=returncode, duration=duration, timed_out=timed_out,
+            stdout=''.join(output['stdout']) if capture else None,
+            stderr=''.join(output['stderr']) if capture else None,
+            )
+        if check and not result.ok:
+            raise subprocess.CalledProcessError(returncode, args, output=result.stdout, stderr=result.stderr)
+        return result
+
+
+def build_enter_command(path: Union[Path, Venv], command: Optional[Iterable[str]] = None, verbose: int = 0, working: Optional[Path] = None, ignore_working: bool = False) -> Tuple[List[str], Path, Dict]:
+    """Builds the shell command which runs a command in a virtual environment
+
+    Archived environments are restored first.
+
+    Args:
+        path:  path to virtual environment or Venv
+        command: command to run in virtual env [default: shell]
+        verbose: Adds more information to stdout
+        working: Working folder path
+        ignore_working: use the current folder instead of the working path
+
+    Returns:
+        arguments, working folder and environment variables for the shell
+    """
+    venv = _as_venv(path)
+    path = venv.path
+    if venv.is_archived:
+        with locks.locked(path, verbose=verbose):
+            if tiering.is_archived(path):
+                tiering.restore(path, verbose=verbose)
+        venv.refresh()
+    venv.working = working or venv.working
+    config = venv.config
+    if working and working != config.working_path:
+        config.working_path = Path(working)
+        with instrument.phase('config'):
+            config.dump(venv.config_path)
+    env = venv.env
+    # Setup the environment scripts
+    working_path = working or config.working_path
+    cwd = Path.cwd() if ignore_working else Path(working_path or Path.cwd())
+    # This should work for all POSIX environments as well as Powershell
+    source = '.'
+    commands = []
+    with instrument.phase('rc discovery'):
+        for vshrc_path in find_vsh_rc_files(config.venv_path):
+            vshrc_command = f'{source} {vshrc_path}'
+            commands.append(vshrc_command)
+    if isinstance(command, (list, tuple)):
+        command = ' '.join(command)
+    commands.append(f'{command}')
+    interactive = '-i' if sys.stdout.isatty() else ''
+    shelled_command = f'{config.shell_path} {interactive} -c \"{"; ".join(commands)}\"'
+    terminal.echo(f'Running in {terminal.blue(config.venv_name)}: {terminal.green(shelled_command)}', verbose=verbose)
+    return shlex.split(shelled_command), cwd, env
 
 
 def build_vsh_rc_file(venv_path: Path, working: Optional[Path] = None) -> Path:
@@ -42,13 +339,40 @@ def build_vsh_rc_file(venv_path: Path, working: Optional[Path] = None) -> Path:
     return vsh_venv_config_path
 
 
-def create(path: Path, site_packages: bool = False, overwrite: bool = False, symlinks: bool = False, upgrade: bool = False, include_pip: bool = False, prompt: str = '', python: str = '', verbose: int = 0, interactive: bool = False, dry_run: bool = False, working: Optional[Path] = None) -> Path:
+def check_envs(path: Optional[Path] = None, home: Optional[Path] = None) -> Dict[Path, List[packages.DependencyProblem]]:
+    """Displays missing or conflicting requirements within virtual environments
+
+    Works like pip check, but reads dist-info metadata directly so pip
+    does not need to be installed.  Markers are evaluated for the
+    interpreter version found in each environment's pyvenv.cfg.
+
+    Args:
+        path: path to virtual environment [default: every environment under home]
+        home: path to virtual environment home
+
+    Returns:
+        venv path to its unmet requirements
+    """
+    if path:
+        venv_paths = [path.expanduser().resolve().absolute()]
+    else:
+        venv_paths = [venv_path for name, venv_path in sorted(find_environment_folders(path=home or WORKON_HOME))]
+    with ThreadPoolExecutor() as executor:
+        results = dict(zip(venv_paths, executor.map(_check_environment, venv_paths)))
+    for venv_path, problems in results.items():
+        for problem in problems:
+            terminal.echo(f'{terminal.yellow(venv_path.name)}: {problem}')
+    return results
+
+
+@instrument.span('create')
+def create(path: Union[Path, Venv], site_packages: bool = False, overwrite: bool = False, symlinks: bool = False, upgrade: bool = False, include_pip: bool = False, prompt: str = '', python: str = '', verbose: int = 0, interactive: bool = False, dry_run: bool = False, working: Optional[Path] = None, requirements: Optional[Path] = None, lazy_pip: bool = False, shared_pip: bool = False, precompile: bool = True, background_pip: bool = False) -> Path:
     """Creates a virtual environment
 
     Notes: Wraps venv
 
     Args:
-        path: path to virtual environment
+        path: path to virtual environment or Venv
 
         site_packages: use system packages within environment [default: False]
         overwrite: replace target folder [default: False]
@@ -58,6 +382,11 @@ def create(path: Path, site_packages: bool = False, overwrite: bool = False, sym
         prompt: Modifies prompt
         python: Version of python, python executable or path to python
         working: working path
+        requirements: path to requirements file to install
+        lazy_pip: without include_pip, install pip on the first run of pip [default: False]
+        shared_pip: without include_pip, use one pip shared by environments of the same python version [default: False]
+        precompile: compile bytecode of site-packages in parallel after setup [default: True]
+        background_pip: without include_pip, install pip in the background; pip waits for it to finish [default: False]
 
         verbose: more output [default: 0]
         interactive: ask before updating system [default: False]
@@ -67,9 +396,9 @@ def create(path: Path, site_packages: bool = False, overwrite: bool = False, sym
         str: path to venv
     """
     verbose = max(int(verbose or 0), 0)
-    path = path.expanduser().resolve().absolute()
-    name = path.name
-    builder = _get_builder(path=path, site_packages=site_packages, overwrite=overwrite, symlinks=symlinks, upgrade=upgrade, include_pip=include_pip, prompt=prompt)
+    venv = _as_venv(path)
+    path, name = venv.path, venv.name
+    builder = _get_builder(path=venv, site_packages=site_packages, overwrite=overwrite, symlinks=symlinks, upgrade=upgrade, include_pip=include_pip, prompt=prompt, lazy_pip=lazy_pip, shared_pip=shared_pip, background_pip=background_pip)
     interactive_prompt = f'Create virtual environment "{terminal.yellow(name)}" under: {terminal.green(path)}?'
     run_command = click.confirm(interactive_prompt) if interactive else True
     if run_command:
@@ -77,12 +406,38 @@ def create(path: Path, site_packages: bool = False, overwrite: bool = False, sym
             executable = _get_interpreter(python)
             if not executable:
                 raise InterpreterNotFound(version=python)
-            builder.create(env_dir=str(path), executable=str(executable))
-            create_vsh_config(name=name, path=path, working=working)
+            with locks.locked(path, verbose=verbose) as waited:
+                # Another process created the environment while this one waited
+                if waited and not (upgrade or overwrite) and validate_environment(path) and not tiering.is_archived(path):
+                    terminal.echo(f'Reusing virtual environment "{terminal.yellow(name)}" under: {terminal.green(path)}', verbose=verbose)
+                    # Only the build is shared; the requirements may differ from the other process's
+                    if requirements:
+                        venv.refresh()
+                        install_requirements(venv, requirements=requirements, verbose=verbose)
+                    return path
+                if tiering.is_archived(path):
+                    tiering.restore(path, verbose=verbose)
+                with instrument.span('build'):
+                    builder.create(env_dir=str(path), executable=str(executable))
+                venv.refresh()
+                # Upgrades keep the existing configuration (e.g. pinned, requirements)
+                if not (upgrade and venv.config_path.exists()):
+                    create_vsh_config(name=name, path=path, working=working)
+                if requirements or upgrade:
+                    install_requirements(venv, requirements=requirements, verbose=verbose)
+                # A background pip installation compiles its own files
+                if precompile and not (path / PIP_LOCK_NAME).exists():
+                    started = time.perf_counter()
+                    with instrument.span('compile_site_packages'):
+                        compiled = compile_site_packages(str(path))
+                    terminal.echo(f'Compiled site-packages in {time.perf_counter() - started:.2f}s', verbose=verbose)
+                    if not compiled:
+                        terminal.echo(f'{terminal.yellow("WARNING")}: Some files in site-packages could not be compiled', verbose=verbose)
         terminal.echo(f'Created virtual environment "{terminal.yellow(name)}" under: {terminal.green(path)}', verbose=verbose)
     return path
 
 
+@instrument.phase('config')
 def create_vsh_config(name: str, path: Path, working: Optional[Path] = None, vsh_config_path: Optional[Path] = None) -> VshConfig:
     """Creates a vsh virtual environment configuration file
 
@@ -107,47 +462,149 @@ def create_vsh_config(name: str, path: Path, working: Optional[Path] = None, vsh
     return config
 
 
-def enter(path: Path, command: Optional[Iterable[str]] = None, verbose: int = 0, working: Optional[Path] = None, ignore_working: bool = False) -> int:
+def diff_envs(first: Path, second: Path, files: bool = False) -> packages.EnvironmentDiff:
+    """Displays the differences between the distributions of two virtual environments
+
+    Both environments are read from dist-info metadata in parallel; no
+    interpreter is started and nothing is imported.
+
+    Args:
+        first: path to first virtual environment
+        second: path to second virtual environment
+        files: also compare RECORD hashes and find locally modified files [default: False]
+
+    Returns:
+        differences between the environments
+    """
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        first_packages, second_packages = executor.map(list_packages, [first, second])
+    diff = packages.diff_distributions(first_packages, second_packages, files=files)
+    for name, version in diff.added.items():
+        terminal.echo(f'{terminal.green("+")} {name}=={version}')
+    for name, version in diff.removed.items():
+        terminal.echo(f'{terminal.red("-")} {name}=={version}')
+    for name, (first_version, second_version) in diff.changed.items():
+        terminal.echo(f'{terminal.yellow("~")} {name} {first_version} -> {second_version}')
+    for name in diff.rebuilt:
+        terminal.echo(f'{terminal.yellow("~")} {name} (different build)')
+    for name, modified in diff.modified.items():
+        for modified_path in modified:
+            terminal.echo(f'{terminal.magenta("!")} {name} modified: {modified_path}')
+    return diff
+
+
+def du(path: Union[Path, Venv], limit: int = 0) -> disk_usage.VenvUsage:
+    """Displays the disk usage of a virtual environment by distribution
+
+    Args:
+        path: path to virtual environment or Venv
+        limit: only show the largest distributions [default: all]
+
+    Returns:
+        disk usage of the virtual environment
+    """
+    venv = _as_venv(path)
+    if not venv.is_valid:
+        validate_environment(venv.path, check=True)
+    venv_usage = disk_usage.usage(venv.path)
+    packages = sorted(venv_usage.packages.items(), key=lambda item: item[1], reverse=True)
+    for name, size in packages[:limit or None]:
+        terminal.echo(f'{terminal.green(f"{format_size(size):>8}")}  {terminal.yellow(name)}')
+    terminal.echo(f'{terminal.green(f"{format_size(venv_usage.total):>8}")}  {terminal.blue("Total")}')
+    return venv_usage
+
+
+def each(command: Iterable[str], pattern: str = '*', jobs: Optional[int] = None, fail_fast: bool = False, path: Optional[Path] = None) -> Dict[Path, Optional[int]]:
+    """Runs a command in many virtual environments at once
+
+    The command runs directly, without a shell or vshrc files, with the
+    activated environment variables.  Every output line is prefixed with
+    the name of its environment and a table of return codes follows.
+    Archived environments are skipped.
+
+    Args:
+        command: command and arguments to run
+        pattern: glob matched against environment names [default: *]
+        jobs: number of environments run at once [default: ThreadPoolExecutor's default]
+        fail_fast: start no further runs once one fails [default: False]
+        path: path to virtual environment home
+
+    Returns:
+        venv path to return code; None when not run because of fail_fast
+    """
+    command = list(command)
+    venv_paths = sorted(
+        venv_path for name, venv_path in find_environment_folders(path=path or WORKON_HOME)
+        if fnmatch.fnmatch(name, pattern) and not tiering.is_archived(venv_path)
+        )
+    width = max((len(venv_path.name) for venv_path in venv_paths), default=0)
+    base_env = dict(os.environ)
+    output_lock = threading.Lock()
+    failed = threading.Event()
+
+    def run(venv_path: Path) -> Optional[int]:
+        if fail_fast and failed.is_set():
+            return None
+        prefix = f'{terminal.yellow(venv_path.name.ljust(width))} | '
+        return_code = _run_prefixed(command, venv_path, base_env=base_env, prefix=prefix, output_lock=output_lock)
+        if return_code:
+            failed.set()
+        return return_code
+
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        results = dict(zip(venv_paths, executor.map(run, venv_paths)))
+    for venv_path, return_code in results.items():
+        if return_code is None:
+            status = terminal.yellow('skipped')
+        else:
+            status = terminal.green(return_code) if return_code == 0 else terminal.red(return_code)
+        terminal.echo(f'{venv_path.name.ljust(width)}  {status}')
+    return results
+
+
+@instrument.span('enter')
+def enter(path: Union[Path, Venv], command: Optional[Iterable[str]] = None, verbose: int = 0, working: Optional[Path] = None, ignore_working: bool = False, show_usage: bool = False, metrics_path: Optional[Path] = None) -> int:
     """Enters a virtual environment
 
     Args:
-        path:  path to virtual environment
+        path:  path to virtual environment or Venv
         command: command to run in virtual env [default: shell]
         verbose: Adds more information to stdout
         working: Working folder path
+        show_usage: print wall time, CPU, max RSS and block I/O of the command to stderr
+        metrics_path: append the same resource usage as JSON lines to this file
 
     Returns:
         return code for command run
     """
-    path = path.expanduser().resolve().absolute()
-    vsh_config_path = find_vsh_config(name=path.name, check=False)
-    if not vsh_config_path.exists():
-        config = create_vsh_config(name=path.name, path=path, working=working, vsh_config_path=vsh_config_path)
-    else:
-        config = read_vsh_config(path=vsh_config_path)
-    if working and working != config.working_path:
-        config.working_path = Path(working)
-        config.dump(vsh_config_path)
+    # Wall and CPU overhead are both measured from here until the spawn
+    entered, entered_cpu = time.perf_counter(), time.process_time()
     verbose = max(int(verbose or 0), 0)
-    env = _update_environment(config=config)
-    # Setup the environment scripts
-    working_path = working or config.working_path
-    cwd = Path.cwd() if ignore_working else Path(working_path or Path.cwd())
-    # This should work for all POSIX environments as well as Powershell
-    source = '.'
-    commands = []
-    for vshrc_path in find_vsh_rc_files(config.venv_path):
-        vshrc_command = f'{source} {vshrc_path}'
-        commands.append(vshrc_command)
-    if isinstance(command, (list, tuple)):
-        command = ' '.join(command)
-    commands.append(f'{command}')
-    interactive = '-i' if sys.stdout.isatty() else ''
-    shelled_command = f'{config.shell_path} {interactive} -c \"{"; ".join(commands)}\"'
-    terminal.echo(f'Running in {terminal.blue(config.venv_name)}: {terminal.green(shelled_command)}', verbose=verbose)
-    proc = subprocess.run(shlex.split(shelled_command), cwd=cwd, env=env)
-    terminal.echo(f'Command return code: {terminal.green(str(proc.returncode)) if proc.returncode == 0 else terminal.red(str(proc.returncode))}', verbose=verbose)
-    return proc.returncode
+    venv = _as_venv(path)
+    path = venv.path
+    args, cwd, env = build_enter_command(venv, command=command, verbose=verbose, working=working, ignore_working=ignore_working)
+    started = time.time()
+    # A shared lock keeps removals and upgrades from changing the environment while in use
+    with locks.locked(path, shared=True, verbose=verbose), instrument.phase('spawn'):
+        before = resource_usage.snapshot() if show_usage or metrics_path else None
+        spawned, overhead_cpu = time.perf_counter(), time.process_time() - entered_cpu
+        proc = subprocess.Popen(args, cwd=cwd, env=env)
+        try:
+            returncode = proc.wait()
+        except BaseException as error:
+            # The shell must finish before the lock is released and an ephemeral environment removed
+            ephemeral.stop_process(proc, error)
+            raise
+        wall = time.perf_counter() - spawned
+    history.record(path, timestamp=started, duration=time.time() - started)
+    terminal.echo(f'Command return code: {terminal.green(str(returncode)) if returncode == 0 else terminal.red(str(returncode))}', verbose=verbose)
+    if show_usage or metrics_path:
+        usage = resource_usage.measure(before, path=path, command=args, returncode=returncode, timestamp=started, wall=wall, overhead=spawned - entered, overhead_cpu=overhead_cpu)
+        if show_usage:
+            terminal.echo(resource_usage.format_usage(usage), err=True)
+        if metrics_path:
+            resource_usage.append(usage, metrics_path=metrics_path)
+    return returncode
 
 
 def find_environment_folders(path: Optional[Path] = None, verbose: int = 0) -> Iterable[Tuple[str, Path]]:
@@ -177,6 +634,25 @@ def find_environment_folders(path: Optional[Path] = None, verbose: int = 0) -> I
         directories[:] = [d for d in directories if d not in found]
 
 
+def find_ram_path(name: str, min_free: Union[str, int] = '1G') -> Optional[Path]:
+    """Finds a memory backed path for an ephemeral virtual environment
+
+    This only chooses the location; the environment may grow past
+    min_free afterwards, as the tmpfs is shared and not sized per
+    environment.
+
+    Args:
+        name: name of virtual environment
+        min_free: space which must be free in memory and on the filesystem (e.g. 1G)
+
+    Returns:
+        path under a tmpfs such as $XDG_RUNTIME_DIR or /dev/shm, or None when no location has room
+    """
+    min_free = parse_size(min_free) if isinstance(min_free, str) else min_free
+    ram_home = ephemeral.find_ram_home(min_free=min_free)
+    return ram_home / name if ram_home else None
+
+
 def find_vsh_rc_files(venv_path: Path) -> Iterable[Path]:
     """Find the vshrc files
 
@@ -205,7 +681,7 @@ def find_vsh_rc_files(venv_path: Path) -> Iterable[Path]:
                 path_sequence.append(top_of_current_repo_path)
                 break
     # general set of paths to search for vsh configuration files
-    paths = [p for p in map(Path, [p_ for p_ in path_sequence if p_]) if p.exists() and (p / '.vshrc').exists()]
+    paths = [p for p in map(Path, [p_ for p_ in path_sequence if p_]) if (p / '.vshrc').exists()]
     memoized_paths: Set[Path] = set()
     for p in paths:
         p = p.expanduser().resolve().absolute()
@@ -248,6 +724,71 @@ def find_vsh_config(name: str, check: bool = True) -> Path:
     return vsh_config_path
 
 
+def freeze(path: Union[Path, Venv], output_format: str = 'text', include_all: bool = False) -> str:
+    """Displays the distributions installed in a virtual environment
+
+    Output matches pip freeze, but is read directly from dist-info
+    metadata so neither a shell, an interpreter nor pip is started.
+
+    Args:
+        path: path to virtual environment or Venv
+        output_format: either text or json [default: text]
+        include_all: include pip, setuptools, wheel and distribute [default: False]
+
+    Returns:
+        formatted distributions
+    """
+    text = packages.format_freeze(list_packages(path), output_format=output_format, include_all=include_all)
+    if text:
+        terminal.echo(text)
+    return text
+
+
+def gc(max_size: Union[str, int], keep_recent: Union[str, float] = '7d', path: Optional[Path] = None, verbose: int = 0, dry_run: bool = False) -> List[Path]:
+    """Removes least recently used virtual environments until a disk budget is met
+
+    Args:
+        max_size: size or number of bytes all environments may use
+        keep_recent: duration or number of seconds; venvs used within are kept [default: 7d]
+        path: path to virtual environment home
+        verbose: more output [default: 0]
+        dry_run: do not update system
+
+    Returns:
+        paths of removed virtual environments
+    """
+    verbose = max(int(verbose or 0), 0)
+    budget = parse_size(max_size) if isinstance(max_size, str) else int(max_size)
+    keep_seconds = parse_duration(keep_recent) if isinstance(keep_recent, str) else float(keep_recent)
+    venv_paths = [venv_path for name, venv_path in find_environment_folders(path=path or WORKON_HOME)]
+    sizes = disk_usage.directory_sizes(venv_paths)
+    total = sum(sizes.values())
+    last_used = history.last_used()
+    now = time.time()
+    removed: List[Path] = []
+    for venv_path in sorted(venv_paths, key=lambda p: _get_last_used(p, last_used)):
+        if total <= budget:
+            break
+        if now - _get_last_used(venv_path, last_used) < keep_seconds:
+            continue
+        vsh_config_path = find_vsh_config(name=venv_path.name, check=False)
+        if vsh_config_path.exists() and read_vsh_config(path=vsh_config_path).pinned:
+            continue
+        # Environments in use are skipped rather than waited on
+        try:
+            with locks.locked(venv_path, blocking=False):
+                remove(venv_path, verbose=verbose, dry_run=dry_run)
+        except VenvLockedError:
+            continue
+        total -= sizes[venv_path]
+        removed.append(venv_path)
+    # The log only grows; gc is where its superseded records are dropped
+    if not dry_run:
+        history.compact()
+    terminal.echo(f'{terminal.blue("Total")}: {terminal.green(format_size(total))} of {terminal.yellow(format_size(budget))}', verbose=verbose)
+    return removed
+
+
 def get_venv_home(name: str, check: bool = True) -> Path:
     """Find the virtual environment's home given a name
 
@@ -264,7 +805,7 @@ def get_venv_home(name: str, check: bool = True) -> Path:
     """
     default_path = WORKON_HOME
     venv_path = default_path / name
-    if venv_path.exists() and venv_path.is_dir():
+    if venv_path.is_dir():
         if validate_venv_path(venv_path, check=False):
             return venv_path
     elif not check:
@@ -272,6 +813,159 @@ def get_venv_home(name: str, check: bool = True) -> Path:
     raise VenvNameError(name=name)
 
 
+@instrument.span('install_requirements')
+def install_requirements(path: Union[Path, Venv], requirements: Optional[Path] = None, verbose: int = 0, dry_run: bool = False, offline: bool = False) -> bool:
+    """Installs a requirements file into a virtual environment
+
+    The resolved requirement set is hashed and installation is skipped
+    when the hash matches the last successful install.  Wheels are
+    built into a shared wheelhouse so identical requirement sets are
+    only built once across virtual environments.
+
+    Args:
+        path: path to virtual environment or Venv
+        requirements: path to requirements file [default: last installed requirements file]
+        verbose: more output [default: 0]
+        dry_run: do not update system
+        offline: never use a package index; the wheelhouse must already hold every wheel [default: False]
+
+    Returns:
+        True if requirements were installed
+    """
+    verbose = max(int(verbose or 0), 0)
+    venv = _as_venv(path)
+    path, config = venv.path, venv.config
+    requirements = requirements or config.requirements_path
+    if not requirements:
+        return False
+    requirements = Path(requirements).expanduser().resolve().absolute()
+    python_version = venv.version or ''
+    digest = wheelhouse.requirements_hash(wheelhouse.read_requirements(requirements), python_version=python_version)
+    if digest == config.requirements_hash and Path(config.requirements_path or '') == requirements:
+        terminal.echo(f'Requirements up to date: {terminal.green(requirements)}', verbose=verbose)
+        return False
+    if not dry_run:
+        python = venv.python
+        ensure_pip(str(path))
+        wheelhouse_path = wheelhouse.build_wheelhouse(python, requirements, digest=digest, offline=offline)
+        wheelhouse.install_requirements(python, requirements, wheelhouse=wheelhouse_path)
+        config.requirements_path = requirements
+        config.requirements_hash = digest
+        config.dump(venv.config_path)
+    terminal.echo(f'Installed requirements: {terminal.green(requirements)}', verbose=verbose)
+    return True
+
+
+def list_packages(path: Union[Path, Venv]) -> List[packages.Distribution]:
+    """Lists the distributions installed in a virtual environment
+
+    Args:
+        path: path to virtual environment or Venv
+
+    Raises:
+        InvalidEnvironmentError: when path is not a valid environment
+
+    Returns:
+        installed distributions sorted by name
+    """
+    venv = _as_venv(path)
+    if not venv.is_valid:
+        validate_environment(venv.path, check=True)
+    site_packages = venv.site_packages
+    if not site_packages:
+        raise InvalidEnvironmentError(path=venv.path)
+    return packages.list_packages(site_packages)
+
+
+def matrix(name: str, versions: Iterable[str], command: Iterable[str], jobs: Optional[int] = None, include_pip: bool = True, requirements: Optional[Path] = None, path: Optional[Path] = None, verbose: int = 0) -> Dict[str, Tuple[int, float]]:
+    """Runs a command in one virtual environment per python version at once
+
+    Environments are named NAME-pyXY (e.g. proj-py37, or proj-pypy3 for
+    pypy3) under the home and are created in parallel when missing, or reused.  The command
+    then runs in all of them concurrently, followed by a report.
+
+    Args:
+        name: base name of the virtual environments
+        versions: python versions or executables (e.g. 3.6, 3.7, pypy3)
+        command: command and arguments to run
+        jobs: number of environments created or run at once [default: one per version]
+        include_pip: Includes pip within created virtual environments [default: True]
+        requirements: path to requirements file to install
+        path: path to virtual environment home
+        verbose: more output [default: 0]
+
+    Raises:
+        InterpreterNotFound: when any of the versions has no interpreter
+
+    Returns:
+        python version to (return code, seconds taken)
+    """
+    verbose = max(int(verbose or 0), 0)
+    command = list(command)
+    versions = [version.strip() for version in versions if version.strip()]
+    # Resolve every interpreter up front so no work starts for a broken matrix
+    interpreters = {version: _get_interpreter(version) for version in versions}
+    venv_paths = {version: (path or WORKON_HOME) / _matrix_name(name, version) for version in versions}
+    width = max((len(venv_path.name) for venv_path in venv_paths.values()), default=0)
+    base_env = dict(os.environ)
+    output_lock = threading.Lock()
+
+    def prepare(version: str):
+        venv_path = venv_paths[version]
+        if not validate_environment(venv_path):
+            create(venv_path, include_pip=include_pip, python=str(interpreters[version]), requirements=requirements, verbose=verbose)
+        elif requirements:
+            install_requirements(venv_path, requirements=requirements, verbose=verbose)
+
+    def run(version: str) -> Tuple[int, float]:
+        started = time.perf_counter()
+        prefix = f'{terminal.yellow(venv_paths[version].name.ljust(width))} | '
+        return_code = _run_prefixed(command, venv_paths[version], base_env=base_env, prefix=prefix, output_lock=output_lock)
+        return return_code, time.perf_counter() - started
+
+    with ThreadPoolExecutor(max_workers=jobs or max(len(versions), 1)) as executor:
+        list(executor.map(prepare, versions))
+        results = dict(zip(versions, executor.map(run, versions)))
+    for version, (return_code, duration) in results.items():
+        status = terminal.green('pass') if return_code == 0 else terminal.red(f'fail ({return_code})')
+        terminal.echo(f'{venv_paths[version].name.ljust(width)}  python {version:<6} {status}  {duration:.1f}s')
+    return results
+
+
+def provision(paths: Iterable[Path], requirements: Path, python: str = '', jobs: Optional[int] = None, offline: bool = False, verbose: int = 0, dry_run: bool = False) -> List[Path]:
+    """Provisions many virtual environments from one requirements file
+
+    Missing environments are created first.  The wheelhouse is then
+    filled in a single pass, after which every environment installs
+    from it in parallel without touching a package index.
+
+    Args:
+        paths: paths to virtual environments
+        requirements: path to requirements file
+        python: Version of python, python executable or path to python
+        jobs: number of environments provisioned at once [default: ThreadPoolExecutor's default]
+        offline: never use a package index; the wheelhouse must already hold every wheel [default: False]
+        verbose: more output [default: 0]
+        dry_run: do not update system
+
+    Returns:
+        paths of environments which had requirements installed
+    """
+    verbose = max(int(verbose or 0), 0)
+    paths = [path.expanduser().resolve().absolute() for path in paths]
+    missing = [path for path in paths if not validate_environment(path)]
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        list(executor.map(lambda p: create(p, include_pip=True, python=python, verbose=verbose, dry_run=dry_run), missing))
+    if dry_run or not paths:
+        return []
+    # Fill the wheelhouse once so parallel installs never build the same wheel
+    installed = [install_requirements(paths[0], requirements=requirements, verbose=verbose, offline=offline)]
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        installed.extend(executor.map(lambda p: install_requirements(p, requirements=requirements, verbose=verbose, offline=offline), paths[1:]))
+    return [path for path, was_installed in zip(paths, installed) if was_installed]
+
+
+@instrument.phase('config')
 def read_vsh_config(path: Path) -> VshConfig:
     """Reads vsh configuration file
 
@@ -286,11 +980,11 @@ def read_vsh_config(path: Path) -> VshConfig:
     return config
 
 
-def remove(path: Path, verbose: int = 0, interactive: bool = False, dry_run: bool = False, check: bool = False) -> Path:
+def remove(path: Union[Path, Venv], verbose: int = 0, interactive: bool = False, dry_run: bool = False, check: bool = False) -> Path:
     """Remove a virtual environment
 
     Args:
-        path: path to virtual environment
+        path: path to virtual environment or Venv
         verbose: more output [default: 0]
         interactive: ask before updating system [default: False]
         dry_run: do not update system
@@ -304,16 +998,23 @@ def remove(path: Path, verbose: int = 0, interactive: bool = False, dry_run: boo
     """
     verbose = max(int(verbose or 0), 0)
     check = False if check is None else check
-    path = path.expanduser().resolve().absolute()
-    if not validate_environment(path) and check is True:
+    venv = _as_venv(path)
+    path = venv.path
+    if not venv.is_valid and check is True:
         raise InvalidEnvironmentError(path=path)
     run_command = click.confirm(f'Remove {terminal.yellow(str(path))}?') == 'y' if interactive else True
     if run_command and not dry_run:
-        if path.exists():
-            shutil.rmtree(path)
-            remove_venv_config(name=path.name)
-        elif check is True:
-            raise PathNotFoundError(path=path)
+        with locks.locked(path, verbose=verbose):
+            if path.exists():
+                # A background pip installation would keep writing into the removed folder
+                stop_pip_setup(str(path))
+                shutil.rmtree(path)
+                remove_venv_config(name=path.name)
+                venv.refresh()
+            elif check is True:
+                raise PathNotFoundError(path=path)
+            # Still held exclusively, so no other process can be using it
+            locks.discard(path)
     terminal.echo(f'{terminal.blue("Removed")}: {terminal.green(path)}', verbose=verbose)
     return path
 
@@ -335,15 +1036,35 @@ def remove_venv_config(name: str) -> Path:
     return config_file_path
 
 
-def show_envs(path: Optional[Path] = None):
+def run(path: Path, args: Union[str, Sequence[str]], **kwds) -> RunResult:
+    """Runs one command in a virtual environment without a shell
+
+    Open a Venv instead to run several commands with a single setup.
+
+    Args:
+        path: path to virtual environment
+        args: command and arguments; a string is split like a shell would
+        kwds: see Venv.run
+
+    Returns:
+        result of the run
+    """
+    return Venv(path).run(args, **kwds)
+
+
+def show_envs(path: Optional[Path] = None, size: bool = False):
     """Displays available virtual environments
 
     Args:
         path: path to virtual environment folder
+        size: include the disk usage of each virtual environment
     """
     path = path or WORKON_HOME or Path.cwd()
-    for name, path in sorted(find_environment_folders(path=path, verbose=1)):
-        terminal.echo(f'Found {terminal.yellow(name)} under: {terminal.yellow(path)}')
+    environments = sorted(find_environment_folders(path=path, verbose=1))
+    usages = disk_usage.usages(venv_path for name, venv_path in environments) if size else {}
+    for name, path in environments:
+        venv_size = f' ({terminal.green(format_size(usages[path].total))})' if size else ''
+        terminal.echo(f'Found {terminal.yellow(name)} under: {terminal.yellow(path)}{venv_size}')
 
 
 def show_version():
@@ -352,13 +1073,48 @@ def show_version():
     terminal.echo(f"{package_metadata['name']} {package_metadata['version']}")
 
 
-def upgrade(path: Path, site_packages=None, overwrite=None, symlinks=None, include_pip=None, prompt=None, python=None, verbose=None, interactive=None, dry_run=None, working=None) -> Path:
+def tier(idle: Union[str, float] = '30d', path: Optional[Path] = None, verbose: int = 0, dry_run: bool = False) -> List[Path]:
+    """Archives virtual environments which have not been entered recently
+
+    Archived environments are replaced with a stub that is still
+    recognized as a valid environment and are transparently restored
+    the next time they are entered.
+
+    Args:
+        idle: duration or number of seconds since last entered [default: 30d]
+        path: path to virtual environment home
+        verbose: more output [default: 0]
+        dry_run: do not update system
+
+    Returns:
+        paths of archived virtual environments
+    """
+    verbose = max(int(verbose or 0), 0)
+    idle_seconds = parse_duration(idle) if isinstance(idle, str) else float(idle)
+    now = time.time()
+    last_used = history.last_used()
+    archived = []
+    for name, venv_path in sorted(find_environment_folders(path=path or WORKON_HOME)):
+        if tiering.is_archived(venv_path):
+            continue
+        if now - _get_last_used(venv_path, last_used) < idle_seconds:
+            continue
+        try:
+            with locks.locked(venv_path, blocking=False):
+                tiering.archive(venv_path, verbose=verbose, dry_run=dry_run)
+        except VenvLockedError:
+            continue
+        archived.append(venv_path)
+    return archived
+
+
+def upgrade(path: Union[Path, Venv], site_packages=None, overwrite=None, symlinks=None, include_pip=None, prompt=None, python=None, verbose=None, interactive=None, dry_run=None, working=None, requirements=None, lazy_pip=None, shared_pip=None, precompile=None, background_pip=None) -> Path:
     """Upgrades a virtual environment
 
     Notes: Wraps venv
 
     Args:
-        path: path to virtual environment
+        path: path to virtual environment or Venv
 
         site_packages: use system packages within environment [default: False]
         overwrite: replace target folder [default: False]
@@ -367,6 +1123,11 @@ def upgrade(path: Path, site_packages=None, overwrite=None, symlinks=None, inclu
         prompt: Modifies prompt
         python: Version of python, python executable or path to python
         working: working path
+        requirements: path to requirements file to install [default: last installed requirements file]
+        lazy_pip: without include_pip, install pip on the first run of pip [default: False]
+        shared_pip: without include_pip, use one pip shared by environments of the same python version [default: False]
+        precompile: compile bytecode of site-packages in parallel after setup [default: True]
+        background_pip: without include_pip, install pip in the background; pip waits for it to finish [default: False]
 
         verbose: more output [default: 0]
         interactive: ask before updating system [default: False]
@@ -375,9 +1136,10 @@ def upgrade(path: Path, site_packages=None, overwrite=None, symlinks=None, inclu
     Returns:
         str: path to venv
     """
-    return create(path=path, site_packages=site_packages, overwrite=overwrite, symlinks=symlinks, upgrade=True, include_pip=include_pip, prompt=prompt, python=python, verbose=verbose, interactive=interactive, dry_run=dry_run, working=working)
+    return create(path=path, site_packages=site_packages, overwrite=overwrite, symlinks=symlinks, upgrade=True, include_pip=include_pip, prompt=prompt, python=python, verbose=verbose, interactive=interactive, dry_run=dry_run, working=working, requirements=requirements, lazy_pip=lazy_pip, shared_pip=shared_pip, precompile=True if precompile is None else precompile, background_pip=background_pip)
 
 
+@instrument.phase('validation')
 def validate_environment(path: Path, check: bool = False) -> bool:
     """Validates if path is a valid virtual environment
 
@@ -393,6 +1155,9 @@ def validate_environment(path: Path, check: bool = False) -> bool:
     """
     valid = None
     win32 = sys.platform == 'win32'
+    if tiering.is_archived(path):
+        # Archived environments are restored on demand
+        return True
     validate_venv_path(path=path, check=check)
 
     # Expected structure
@@ -441,6 +1206,7 @@ def validate_environment(path: Path, check: bool = False) -> bool:
     return True if valid else False
 
 
+@instrument.phase('validation')
 def validate_venv_path(path: Path, check: bool = False) -> bool:
     """Validates that a given path is a path to a virtual environment
 
@@ -463,19 +1229,11 @@ def validate_venv_path(path: Path, check: bool = False) -> bool:
     standard_struct['python'] = f'{standard_struct["bin"]}/python'
     standard_struct['site-packages'] = f'{standard_struct["lib"]}/*/site-packages'
     valid = False
-    if path and path.exists():
-        checked = False
-        subchecked = False
-        for globbed_path in standard_struct.values():
-            checked = True
-            for resolved_path in path.glob(globbed_path):
-                if not resolved_path.exists():
-                    if check:
-                        raise InvalidEnvironmentError(f'Could not find {globbed_path} under {path}.')
-
-                    return valid
-                subchecked = True
-        valid = checked and subchecked
+    if path and tiering.is_archived(path):
+        valid = True
+    elif path and path.exists():
+        # glob only yields existing paths, so the first match settles it
+        valid = any(next(path.glob(globbed_path), None) is not None for globbed_path in standard_struct.values())
     if not valid and check:
         raise InvalidEnvironmentError(f'Invalid virtual environment path: {path}.')
     return valid
@@ -518,6 +1276,52 @@ def validate_venv_name_and_path(name: str, path: Optional[Path]) -> Tuple[str, O
 # ----------------------------------------------------------------------
 # Support
 # ----------------------------------------------------------------------
+def which_has(requirement: str, path: Optional[Path] = None) -> Dict[Path, Tuple[str, str]]:
+    """Displays the virtual environments which contain a distribution
+
+    Answers come from the package index under ~/.vsh which is first
+    refreshed for any environment whose site-packages changed.  Rather
+    than validating every folder under the home, the environments are
+    the indexed ones plus the home's direct sub folders, each checked
+    with a stat or two.  Archived environments are included and marked.
+
+    Args:
+        requirement: PEP 508 requirement (e.g. requests<2.20)
+        path: path to virtual environment home
+
+    Returns:
+        venv path to (distribution name, version) for every match
+    """
+    home = Path(path or WORKON_HOME)
+    index = package_index.load()
+    candidates = {Path(venv_path) for venv_path in index.venvs if home in Path(venv_path).parents}
+    with contextlib.suppress(OSError), os.scandir(str(home)) as entries:
+        candidates.update(Path(entry.path) for entry in entries if entry.is_dir())
+    venv_paths = sorted(venv_path for venv_path in candidates if (venv_path / 'pyvenv.cfg').is_file() or tiering.is_archived(venv_path))
+    index = package_index.refresh(venv_paths)
+    found = index.which_has(requirement)
+    for venv_path, (name, version) in sorted(found.items()):
+        archived = f' {terminal.blue("(archived)")}' if index.venvs[str(venv_path)].get('archived') else ''
+        terminal.echo(f'Found {terminal.green(f"{name}=={version}")} in {terminal.yellow(venv_path.name)} under: {terminal.yellow(venv_path)}{archived}')
+    return found
+
+
+def _as_venv(path: Union[Path, Venv]) -> Venv:
+    """Reuses a Venv or resolves a path into one without validating it"""
+    return path if isinstance(path, Venv) else Venv(path, check=False)
+
+
+def _check_environment(path: Path) -> List[packages.DependencyProblem]:
+    """Finds unmet requirements within a single virtual environment"""
+    if tiering.is_archived(path):
+        return []
+    pyvenv_cfg = packages.read_pyvenv_cfg(path)
+    python_version = pyvenv_cfg.get('version') or pyvenv_cfg.get('version_info')
+    implementation_name = 'pypy' if 'pypy' in pyvenv_cfg.get('home', '').lower() else None
+    environment = marker_environment(python_version=python_version, implementation_name=implementation_name)
+    return packages.check_distributions(list_packages(path), environment)
+
+
 def _escape_zero_length_codes(prompt=None):
     # This is necessary because bash does something funky with PS1 and
     #  doesn't correctly calculate the length of the command-line.  When
@@ -538,9 +1342,8 @@ def _escape_zero_length_codes(prompt=None):
     return prompt
 
 
-def _get_builder(path: Path, site_packages=None, overwrite=None, symlinks=None, upgrade=None, include_pip=None, prompt=None):
-    path = path.expanduser().resolve().absolute()
-    name = path.name
+def _get_builder(path: Union[Path, Venv], site_packages=None, overwrite=None, symlinks=None, upgrade=None, include_pip=None, prompt=None, lazy_pip=None, shared_pip=None, background_pip=None):
+    name = _as_venv(path).name
     builder = VenvBuilder(
         system_site_packages=False if site_packages is None else site_packages,
         clear=False if overwrite is None else overwrite,
@@ -548,10 +1351,19 @@ def _get_builder(path: Path, site_packages=None, overwrite=None, symlinks=None,
         upgrade=False if upgrade is None else upgrade,
         with_pip=True if include_pip is None else include_pip,
         prompt=f'({name})' if prompt is None else prompt,
+        lazy_pip=False if lazy_pip is None else lazy_pip,
+        shared_pip=False if shared_pip is None else shared_pip,
+        background_pip=False if background_pip is None else background_pip,
         )
     return builder
 
 
+def _get_last_used(path: Path, last_used: Dict[Path, float]) -> float:
+    """Returns when a virtual environment was last used"""
+    # Environments which were never entered fall back to their creation
+    return last_used.get(path.expanduser().resolve().absolute()) or path.stat().st_mtime
+
+
 def _get_interpreter(python=None) -> Path:
     """Returns the interpreter given the string"""
     if not python:
@@ -577,6 +1389,58 @@ def _get_interpreter(python=None) -> Path:
     raise InterpreterNotFound(version=python)
 
 
+def _kill_session(proc: subprocess.Popen):
+    """Kills a command started in a session of its own and every process in its group"""
+    if proc.returncode is not None:
+        return
+    with contextlib.suppress(ProcessLookupError):
+        if hasattr(os, 'killpg'):
+            os.killpg(proc.pid, signal.SIGKILL)
+        else:
+            proc.kill()
+
+
+def _matrix_name(name: str, version: str) -> str:
+    """Names the virtual environment of a python version or executable in a matrix"""
+    # python3.7 and 3.7 are both py37; pypy3 stays pypy3 rather than pypypy3
+    suffix = re.sub(r'^py(thon)?', '', Path(version).name.replace('.', ''))
+    return f'{name}-py{suffix}'
+
+
+def _read_lines(pipe, name: str, lines: Optional[List[str]], stream: Optional[Callable[[str, str], Any]]):
+    """Reads a pipe line by line, keeping and streaming each line"""
+    for raw in iter(pipe.readline, b''):
+        line = raw.decode('utf-8', errors='replace')
+        if lines is not None:
+            lines.append(line)
+        if stream:
+            stream(name, line.rstrip('\r\n'))
+    pipe.close()
+
+
+def _run_prefixed(command: List[str], venv_path: Path, base_env: Dict[str, str], prefix: str, output_lock: threading.Lock) -> int:
+    """Runs a command directly in an activated environment, prefixing each line of output"""
+    env = dict(base_env)
+    env[package_metadata['name'].upper()] = venv_path.name
+    env['VIRTUAL_ENV'] = str(venv_path)
+    env['PATH'] = os.pathsep.join([str(packages.find_bin_path(venv_path)), base_env.get('PATH', '')])
+    started = time.time()
+    with locks.locked(venv_path, shared=True):
+        try:
+            proc = subprocess.Popen(command, env=env, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+        except OSError as error:
+            with output_lock:
+                terminal.echo(f'{prefix}{terminal.red(error)}')
+            return 127
+        for line in proc.stdout:
+            with output_lock:
+                terminal.echo(f'{prefix}{line.decode("utf-8", errors="replace").rstrip()}')
+        return_code = proc.wait()
+    # Recorded like enter and Venv.run so gc and tier leave environments in use alone
+    history.record(venv_path, timestamp=started, duration=time.time() - started)
+    return return_code
+
+
 def _update_environment(config: VshConfig) -> Dict:
     """Updates environment similar to activate command from venv
 
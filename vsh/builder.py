@@ -1,14 +1,222 @@
+import contextlib
+import errno
 import os
+import shutil
+import signal
 import subprocess
 import sys
 import types
 import venv
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import Optional
 
+from . import instrument, packages
+from . import shared_pip as shared
+
+try:
+    import fcntl
+except ImportError:  # windows
+    fcntl = None
+
+# Identifies pip scripts which install pip on first use
+PIP_SHIM_MARKER = '# vsh: lazy pip shim'
+
+# Linux ioctl which shares the blocks of one file with another (reflink)
+FICLONE = 0x40049409
+
+# Errors meaning an in-kernel copy method is unavailable for these files
+COPY_FALLBACK_ERRORS = (errno.EBADF, errno.EINVAL, errno.ENOSYS, errno.ENOTTY, errno.EOPNOTSUPP, errno.EXDEV)
+
+# Holds the pid of a background pip installation, which keeps it flocked while it runs
+PIP_LOCK_NAME = '.vsh-pip.lock'
+
+PIP_SHIM = '''\
+#!{executable} -Es
+{marker}
+import importlib
+import importlib.util
+import os
+import site
+import subprocess
+import sys
+import sysconfig
+import time
+
+LOCK_PATH = {lock_path!r}
+
+
+def has_pip():
+    # site-packages may have been created after this interpreter started
+    site.addsitedir(sysconfig.get_paths()['purelib'])
+    importlib.invalidate_caches()
+    return importlib.util.find_spec('pip') is not None
+
+
+def installing():
+    try:
+        with open(LOCK_PATH) as lock:
+            pid = int(lock.read())
+        os.kill(pid, 0) if pid > 0 else None
+    except (OSError, ValueError):
+        return False
+    return pid > 0
+
+
+if __name__ == '__main__':
+    # Waits for a background pip installation started by vsh
+    while installing():
+        time.sleep(0.1)
+    if not has_pip():
+        # Installs pip from the interpreter's bundled wheels and overwrites
+        #  this script with pip's own entry points; its output goes to
+        #  stderr so stdout only holds the output of the pip command
+        cmd = [sys.executable, '-Esm', 'ensurepip', '--upgrade', '--default-pip']
+        return_code = subprocess.call(cmd, stdout=sys.stderr.fileno())
+        if return_code:
+            sys.exit(return_code)
+    os.execv(sys.executable, [sys.executable, '-m', 'pip', *sys.argv[1:]])
+'''
+
+
+def compile_site_packages(env_dir: str, workers: int = 0) -> bool:
+    """Compiles the bytecode of everything in site-packages
+
+    Compilation runs with the environment's interpreter so the cached
+    files match its version.  Files which do not compile (e.g. python 2
+    test files shipped by a distribution) are skipped like pip skips
+    them; precompiling only saves time later and never fails.
+
+    Args:
+        env_dir: path to environment
+        workers: number of compiling processes [default: 0, the cpu count]
+
+    Returns:
+        True if every file compiled
+    """
+    site_packages = packages.find_site_packages(Path(env_dir))
+    if not site_packages:
+        return True
+    python = packages.find_bin_path(Path(env_dir)) / 'python'
+    cmd = [str(python), '-Esm', 'compileall', '-q', '-j', str(workers), str(site_packages)]
+    return subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL).returncode == 0
+
+
+def copy_file(src: str, dst: str):
+    """Copies a file without moving its contents through userspace when possible
+
+    A reflink is tried first, followed by copy_file_range, sendfile and
+    finally a plain buffered copy.
+
+    Args:
+        src: path of file to copy
+        dst: path of the new file
+    """
+    with open(src, 'rb') as source, open(dst, 'wb') as target:
+        for method in (_reflink, _copy_file_range, _sendfile):
+            try:
+                if method(source.fileno(), target.fileno()):
+                    return
+            except OSError as error:
+                if error.errno not in COPY_FALLBACK_ERRORS:
+                    raise
+            # Restart from an empty target with the next method
+            target.truncate(0)
+            os.lseek(source.fileno(), 0, os.SEEK_SET)
+            os.lseek(target.fileno(), 0, os.SEEK_SET)
+        shutil.copyfileobj(source, target)
+
+
+def ensure_pip(env_dir: str):
+    """Installs pip, or waits for its background installation, in a virtual environment created with a pip shim
+
+    Args:
+        env_dir: path to environment
+    """
+    pip_path = packages.find_bin_path(Path(env_dir)) / 'pip'
+    if pip_path.is_file() and PIP_SHIM_MARKER in pip_path.read_text(encoding='utf-8', errors='replace'):
+        subprocess.check_output([str(pip_path), '--version'], stderr=subprocess.STDOUT)
+
+
+def stop_pip_setup(env_dir: str):
+    """Kills a background pip installation and waits for it to exit
+
+    The installer holds a lock on its lock file for as long as it runs,
+    so a stale file left by a killed installer is never mistaken for a
+    running one.
+
+    Args:
+        env_dir: path to environment
+    """
+    if fcntl is None:
+        return
+    try:
+        fd = os.open(os.path.join(env_dir, PIP_LOCK_NAME), os.O_RDONLY)
+    except FileNotFoundError:
+        return
+    try:
+        try:
+            fcntl.flock(fd, fcntl.LOCK_SH | fcntl.LOCK_NB)
+            return
+        except BlockingIOError:
+            pass
+        try:
+            pid = int(os.read(fd, 32))
+        except ValueError:
+            pid = 0
+        if pid > 0:
+            # The installer runs in a session of its own together with ensurepip's pip
+            with contextlib.suppress(ProcessLookupError):
+                os.killpg(pid, signal.SIGKILL)
+        fcntl.flock(fd, fcntl.LOCK_SH)
+    finally:
+        os.close(fd)
+
+
+def _copy_file_range(source: int, target: int) -> bool:
+    if not hasattr(os, 'copy_file_range'):
+        return False
+    while os.copy_file_range(source, target, 1 << 30):
+        pass
+    return True
+
+
+def _reflink(source: int, target: int) -> bool:
+    if not sys.platform.startswith('linux'):
+        return False
+    import fcntl
+    fcntl.ioctl(target, FICLONE, source)
+    return True
+
+
+def _sendfile(source: int, target: int) -> bool:
+    if not hasattr(os, 'sendfile') or sys.platform == 'win32':
+        return False
+    offset = 0
+    while True:
+        sent = os.sendfile(target, source, offset, 1 << 30)
+        if not sent:
+            return True
+        offset += sent
+
 
 class VenvBuilder(venv.EnvBuilder):
 
+    def __init__(self, *args, lazy_pip: bool = False, shared_pip: bool = False, background_pip: bool = False, **kwds):
+        """
+        Args:
+            lazy_pip: install a pip script which installs pip on first use instead of pip
+            shared_pip: use one pip installation shared by every environment of the same python version
+            background_pip: install pip in a background process, gating the pip script until it finishes
+        """
+        super().__init__(*args, **kwds)
+        # Scripts with shebangs are not executable on windows
+        self.lazy_pip: bool = lazy_pip and sys.platform != 'win32'
+        self.shared_pip: bool = shared_pip and sys.platform != 'win32'
+        self.background_pip: bool = background_pip and sys.platform != 'win32'
+        if (lazy_pip and not self.lazy_pip) or (shared_pip and not self.shared_pip) or (background_pip and not self.background_pip):
+            self.with_pip = True
+
     def create(self, env_dir: str, executable: Optional[str] = None):
         """
         Create a virtual environment in a directory.
@@ -18,23 +226,39 @@ class VenvBuilder(venv.EnvBuilder):
             executable: path to python interpreter executable [default: sys.executable]
         """
         env_dir = os.path.abspath(env_dir)
-        context = self.ensure_directories(env_dir=env_dir, executable=executable)
+        with instrument.span('ensure_directories'):
+            context = self.ensure_directories(env_dir=env_dir, executable=executable)
         # See issue 24875. We need system_site_packages to be False
         # until after pip is installed.
         true_system_site_packages: bool = self.system_site_packages
         self.system_site_packages: bool = False
-        self.create_configuration(context)
-        self.setup_python(context)
+        with instrument.span('create_configuration'):
+            self.create_configuration(context)
+        with instrument.span('setup_python'):
+            self.setup_python(context)
         if self.with_pip:
-            self._setup_pip(context)
+            with instrument.span('_setup_pip'):
+                self._setup_pip(context)
+        elif self.shared_pip:
+            with instrument.span('_setup_shared_pip'):
+                self._setup_shared_pip(context)
+        elif self.background_pip or self.lazy_pip:
+            with instrument.span('_setup_pip_shim'):
+                self._setup_pip_shim(context)
         if not self.upgrade:
-            self.setup_scripts(context)
-            self.post_setup(context)
+            with instrument.span('setup_scripts'):
+                self.setup_scripts(context)
+                self.post_setup(context)
         if true_system_site_packages:
             # We had set it to False before, now
             # restore it and rewrite the configuration
             self.system_site_packages = True
-        self.create_configuration(context)
+        with instrument.span('create_configuration'):
+            self.create_configuration(context)
+        # Started last so the installer never runs with an unfinished pyvenv.cfg
+        if self.background_pip and not (self.with_pip or self.shared_pip):
+            with instrument.span('_start_pip_setup'):
+                self._start_pip_setup(context)
 
     def ensure_directories(self, env_dir: str, executable: Optional[str] = None):
         """
@@ -95,6 +319,28 @@ class VenvBuilder(venv.EnvBuilder):
         create_if_needed(binpath)
         return context
 
+    def setup_python(self, context: types.SimpleNamespace):
+        """Set up the Python executables, copying the aliases in parallel when not using symlinks"""
+        if self.symlinks or os.name == 'nt':
+            return super().setup_python(context)
+        self.symlink_or_copy(context.executable, context.env_exe)
+        os.chmod(context.env_exe, 0o755)
+        aliases = [os.path.join(context.bin_path, suffix) for suffix in ('python', 'python3', f'python3.{sys.version_info[1]}')]
+        aliases = [alias for alias in aliases if not os.path.exists(alias)]
+
+        def copy_alias(alias: str):
+            self.symlink_or_copy(context.env_exe, alias, relative_symlinks_ok=True)
+            os.chmod(alias, 0o755)
+
+        with ThreadPoolExecutor(max_workers=max(len(aliases), 1)) as executor:
+            list(executor.map(copy_alias, aliases))
+
+    def symlink_or_copy(self, src: str, dst: str, relative_symlinks_ok: bool = False):
+        """Symlinks or copies a file, copying in the kernel when possible"""
+        if self.symlinks or os.name == 'nt':
+            return super().symlink_or_copy(src, dst, relative_symlinks_ok=relative_symlinks_ok)
+        copy_file(src, dst)
+
     def _setup_pip(self, context: types.SimpleNamespace):
         """Installs or upgrades pip in a virtual environment"""
         # We run ensurepip in isolated mode to avoid side effects from
@@ -103,3 +349,51 @@ class VenvBuilder(venv.EnvBuilder):
         # Originally -Im, but -Esm works on both python2 and python3
         cmd = [context.env_exe, '-Esm', 'ensurepip', '--upgrade', '--default-pip']
         subprocess.check_output(cmd, stderr=subprocess.STDOUT)
+
+    def _setup_pip_shim(self, context: types.SimpleNamespace):
+        """Installs pip scripts which install pip the first time they run"""
+        shim = PIP_SHIM.format(executable=context.env_exe, marker=PIP_SHIM_MARKER, lock_path=os.path.join(context.env_dir, PIP_LOCK_NAME))
+        for name in ('pip', 'pip3'):
+            shim_path = Path(context.bin_path) / name
+            if shim_path.exists():
+                continue
+            shim_path.write_text(shim, encoding='utf-8')
+            shim_path.chmod(0o755)
+
+    def _setup_shared_pip(self, context: types.SimpleNamespace):
+        """Links the shared pip installation into a virtual environment, upgrading it with the environment"""
+        version = shared.interpreter_version(context.env_exe)
+        shared_site_packages = shared.ensure(context.executable, version)
+        if self.upgrade:
+            shared.upgrade(version)
+        shared.link(Path(context.env_dir), version, shared_site_packages)
+
+    def _start_pip_setup(self, context: types.SimpleNamespace):
+        """Starts installing pip in a background process which outlives vsh
+
+        The lock file holds the pid of the installer and is removed once
+        pip is installed; pip scripts wait while the installer is alive
+        and stop_pip_setup kills it while it holds the file locked.
+        """
+        lock_path = os.path.join(context.env_dir, PIP_LOCK_NAME)
+        # The lock is always released so a failed installer cannot block pip;
+        #  the pip script then installs pip itself
+        code = '\n'.join([
+            'import contextlib, ensurepip, os, sys',
+            'try:',
+            '    ensurepip.bootstrap(upgrade=True, default_pip=True)',
+            'finally:',
+            '    with contextlib.suppress(OSError):',
+            '        os.unlink(sys.argv[1])',
+            ])
+        # The installer inherits the locked descriptor, keeping the file locked until it exits
+        fd = os.open(lock_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            process = subprocess.Popen([context.env_exe, '-Esc', code, lock_path], stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, start_new_session=True, pass_fds=(fd,))
+            os.write(fd, str(process.pid).encode('utf-8'))
+        finally:
+            os.close(fd)
+        # The installer may have finished before the lock was written
+        if process.poll() is not None and os.path.exists(lock_path):
+            os.unlink(lock_path)
@@ -13,18 +13,40 @@ class Counts:
     to help capture and validate call counts
 
     Attributes:
+        check_envs: expected call count for vsh.api.check_envs
         create: expected call count for vsh.api.create
+        diff_envs: expected call count for vsh.api.diff_envs
+        du: expected call count for vsh.api.du
+        each: expected call count for vsh.api.each
         enter: expected call count for vsh.api.enter
+        find_ram_path: expected call count for vsh.api.find_ram_path
+        freeze: expected call count for vsh.api.freeze
+        gc: expected call count for vsh.api.gc
+        matrix: expected call count for vsh.api.matrix
+        provision: expected call count for vsh.api.provision
         remove: expected call count for vsh.api.remove
         show_envs: expected call count for vsh.api.show_envs
         show_version: expected call count for vsh.api.show_version
+        tier: expected call count for vsh.api.tier
+        which_has: expected call count for vsh.api.which_has
 
     """
+    check_envs: int = 0
     create: int = 0
+    diff_envs: int = 0
+    du: int = 0
+    each: int = 0
     enter: int = 0
+    find_ram_path: int = 0
+    freeze: int = 0
+    gc: int = 0
+    matrix: int = 0
+    provision: int = 0
     remove: int = 0
     show_envs: int = 0
     show_version: int = 0
+    tier: int = 0
+    which_has: int = 0
 
     def check(self) -> Dict[str, bool]:
         """Returns a dictionary of boolean which represents whether or
@@ -46,18 +68,56 @@ class Counts:
             venv_path: path to virtual environment under test
             exit_code: the expected exit code of the vsh.api.enter call
         """
+        self.mock_check_envs(mocker=mocker)
         self.mock_create(mocker=mocker, venv_path=venv_path)
+        self.mock_diff_envs(mocker=mocker)
+        self.mock_du(mocker=mocker)
+        self.mock_each(mocker=mocker)
         self.mock_enter(mocker=mocker, exit_code=exit_code)
+        self.mock_find_ram_path(mocker=mocker, venv_path=venv_path)
+        self.mock_freeze(mocker=mocker)
+        self.mock_gc(mocker=mocker)
+        self.mock_matrix(mocker=mocker)
+        self.mock_provision(mocker=mocker)
         self.mock_remove(mocker=mocker, venv_path=venv_path)
         self.mock_show_envs(mocker=mocker)
         self.mock_show_version(mocker=mocker)
+        self.mock_tier(mocker=mocker)
+        self.mock_which_has(mocker=mocker)
+
+    def mock_check_envs(self, mocker):
+        mocker.patch('vsh.api.check_envs', return_value={})
 
     def mock_create(self, mocker, venv_path: Path):
         mocker.patch('vsh.api.create', return_value=venv_path)
 
+    def mock_diff_envs(self, mocker):
+        mocker.patch('vsh.api.diff_envs', return_value=None)
+
+    def mock_du(self, mocker):
+        mocker.patch('vsh.api.du')
+
+    def mock_each(self, mocker):
+        mocker.patch('vsh.api.each', return_value={})
+
     def mock_enter(self, mocker, exit_code: int = 0):
         mocker.patch('vsh.api.enter', return_value=exit_code)
 
+    def mock_find_ram_path(self, mocker, venv_path: Path):
+        mocker.patch('vsh.api.find_ram_path', return_value=venv_path)
+
+    def mock_freeze(self, mocker):
+        mocker.patch('vsh.api.freeze', return_value='')
+
+    def mock_gc(self, mocker):
+        mocker.patch('vsh.api.gc', return_value=[])
+
+    def mock_matrix(self, mocker):
+        mocker.patch('vsh.api.matrix', return_value={})
+
+    def mock_provision(self, mocker):
+        mocker.patch('vsh.api.provision', return_value=[])
+
     def mock_remove(self, mocker, venv_path: Path):
         mocker.patch('vsh.api.remove', return_value=venv_path)
 
@@ -67,6 +127,12 @@ class Counts:
     def mock_show_version(self, mocker):
         mocker.patch('vsh.api.show_version')
 
+    def mock_tier(self, mocker):
+        mocker.patch('vsh.api.tier', return_value=[])
+
+    def mock_which_has(self, mocker):
+        mocker.patch('vsh.api.which_has', return_value={})
+
 
 @dataclass
 class VshCliTestCase:
@@ -104,6 +170,12 @@ class VshMultiCliTestCase:
     VshCliTestCase(command='vsh --help'),
     VshCliTestCase(command='vsh -l', counts=Counts(show_envs=1)),
     VshCliTestCase(command='vsh --list', counts=Counts(show_envs=1)),
+    VshCliTestCase(command='vsh -l --size', counts=Counts(show_envs=1)),
+    VshCliTestCase(command='vsh --du test-vsh-cli', counts=Counts(du=1)),
+    VshCliTestCase(command='vsh --freeze --json test-vsh-cli', counts=Counts(freeze=1)),
+    VshCliTestCase(command='vsh --diff other-vsh-cli --files test-vsh-cli', counts=Counts(diff_envs=1)),
+    VshCliTestCase(command='vsh --check', counts=Counts(check_envs=1)),
+    VshCliTestCase(command='vsh --check test-vsh-cli', counts=Counts(check_envs=1)),
     VshCliTestCase(command='vsh -C test-vsh-cli', counts=Counts(create=1)),
     VshCliTestCase(command='vsh test-vsh-cli echo "hi"', counts=Counts(create=1, enter=1)),
     VshCliTestCase(command='vsh -r test-vsh-cli', counts=Counts(remove=1)),
@@ -111,6 +183,25 @@ class VshMultiCliTestCase:
     VshCliTestCase(command='vsh --version', counts=Counts(show_version=1)),
     VshCliTestCase(command='vsh --no-pip test-vsh-cli env', counts=Counts(create=1, enter=1)),
     VshCliTestCase(command='vsh -C tmp-venv', counts=Counts(create=1)),
+    VshCliTestCase(command='vsh --lazy-pip -C tmp-venv', counts=Counts(create=1)),
+    VshCliTestCase(command='vsh --shared-pip -C tmp-venv', counts=Counts(create=1)),
+    VshCliTestCase(command='vsh -e --unique test-vsh-cli env', counts=Counts(create=1, enter=1, remove=1)),
+    VshCliTestCase(command='vsh -e --ram test-vsh-cli env', counts=Counts(create=1, enter=1, find_ram_path=1, remove=1)),
+    VshCliTestCase(command='vsh -e --ram --ram-min-free 64M test-vsh-cli env', counts=Counts(create=1, enter=1, find_ram_path=1, remove=1)),
+    VshCliTestCase(command='vsh -e --ram --path ~/tmp/test-vsh-cli env', counts=Counts(create=1, enter=1, remove=1)),
+    VshCliTestCase(command='vsh --background-pip test-vsh-cli env', counts=Counts(create=1, enter=1)),
+    VshCliTestCase(command='vsh -e --no-compile test-vsh-cli env', counts=Counts(create=1, enter=1, remove=1)),
+    VshCliTestCase(command='vsh --tier 30d', counts=Counts(tier=1)),
+    VshCliTestCase(command='vsh --gc --max-size 50G', counts=Counts(gc=1)),
+    VshCliTestCase(command='vsh --gc', exit_code=1),
+    VshCliTestCase(command='vsh --provision -R requirements.txt -j 4 test-vsh-cli other-vsh-cli', counts=Counts(provision=1)),
+    VshCliTestCase(command='vsh --provision test-vsh-cli', exit_code=1),
+    VshCliTestCase(command='vsh --each --filter "test-*" -j 4 --fail-fast python -c "import sys"', counts=Counts(each=1)),
+    VshCliTestCase(command='vsh --each', exit_code=1),
+    VshCliTestCase(command='vsh --matrix -p 3.6,3.7 proj pytest -q', counts=Counts(matrix=1)),
+    VshCliTestCase(command='vsh --matrix proj pytest', exit_code=1),
+    VshCliTestCase(command='vsh --which-has "requests<2.20"', counts=Counts(which_has=1)),
+    VshCliTestCase(command='vsh --usage --metrics ~/tmp/metrics.jsonl test-vsh-cli env', counts=Counts(create=1, enter=1)),
     ])
 def test_vsh_cli(workon_home, test_case, click_runner, mocker, venv_path):
     """Tests `vsh` command-line interface"""
@@ -1,11 +1,13 @@
 import atexit
+import contextlib
 import os
 import subprocess
 import sys
 import textwrap
 from pathlib import Path
 
-from vsh import api, terminal
+from vsh import api, instrument, terminal
+from vsh.ephemeral import exit_on_signals, unique_name
 from vsh.errors import VenvNameError
 from vsh.vendored import click, colorama
 
@@ -14,38 +16,115 @@ atexit.register(colorama.deinit)
 
 
 @click.command(context_settings={'ignore_unknown_options': True, 'allow_interspersed_args': False})
+@click.option('--background-pip', is_flag=True, help='Enter at once while pip installs in the background')
 @click.option('-c', '--copy', is_flag=True if sys.platform != 'win32' else False, help='Do not create symlinks for python binaries during creation')
+@click.option('--check', is_flag=True, help='Check installed packages for missing or conflicting requirements [default: all]')
+@click.option('--cprofile', is_flag=True, help='Also run cProfile with --profile, writing its stats next to the trace')
 @click.option('-C', '--create-only', is_flag=True, help='Create virtual environment, but do not enter')
 @click.option('-d', '--dry-run', is_flag=True, help='Do not make changes to the system')
+@click.option('--diff', metavar='VENV_NAME', default=None, help='Compare installed packages against another virtual environment')
+@click.option('--du', is_flag=True, help='Show disk usage of virtual environment by installed package')
+@click.option('--each', is_flag=True, help='Run COMMAND in every virtual environment matching --filter in parallel')
 @click.option('-e', '--ephemeral', is_flag=True, help='Create, enter and remove on vsh exit')
 @click.option('-f', '--force', is_flag=True, help='Force removal options')
+@click.option('--fail-fast', is_flag=True, help='Start no further --each runs after one fails')
+@click.option('--files', is_flag=True, help='Also compare installed files with --diff')
+@click.option('--filter', 'pattern', metavar='GLOB', default='*', help='Virtual environment names used by --each [default: *]')
+@click.option('--freeze', is_flag=True, help='Show installed packages without starting pip')
+@click.option('--gc', is_flag=True, help='Remove least recently used virtual environments until --max-size is met')
 @click.option('-i', '--interactive', is_flag=True, help='Run interactively (debug)')
+@click.option('-j', '--jobs', metavar='N', default=None, help='Number of virtual environments handled at once', type=int)
+@click.option('--lazy-pip', is_flag=True, help='Do not include pip until pip is first run')
 @click.option('-l', '--list', 'ls', is_flag=True, help='Show available virtual environments')
+@click.option('--json', 'as_json', is_flag=True, help='Use json output where supported')
+@click.option('--keep-recent', metavar='DURATION', default='7d', help='Never collect virtual environments used within DURATION [default: 7d]')
+@click.option('--matrix', is_flag=True, help='Run COMMAND in VENV_NAME-pyXY for every comma separated --python version at once')
+@click.option('--max-size', metavar='SIZE', default=None, help='Disk budget for all virtual environments used by --gc (e.g. 50G)')
+@click.option('--metrics', 'metrics_path', metavar='FILE', default=None, help='Append resource usage of COMMAND as JSON lines to FILE', type=Path)
+@click.option('--no-compile', is_flag=True, help='Do not precompile bytecode after creating or upgrading')
 @click.option('--no-pip', is_flag=True, help='Do not include pip')
+@click.option('--offline', is_flag=True, help='Install requirements only from wheels already in the wheelhouse')
 @click.option('-o', '--overwrite', is_flag=True, help='Overwrite existing virtual environment')
 @click.option('--path', metavar='PATH', help='Path to virtual environment', type=Path)
-@click.option('-p', '--python', metavar='VERSION', help='Python version to use')
+@click.option('--profile', is_flag=True, help='Time the phases of vsh, writing a Chrome trace and printing a summary')
+@click.option('--profile-file', metavar='FILE', default=None, help=f'Chrome trace written by --profile [default: {instrument.PROFILE_PATH}]', type=Path)
+@click.option('-p', '--python', metavar='VERSION', help='Python version to use (comma separated with --matrix)')
+@click.option('--provision', is_flag=True, help='Create every VENV_NAME given and install --requirements into each from one wheelhouse')
+@click.option('--ram', is_flag=True, help='Place ephemeral virtual environments in memory (e.g. /dev/shm) when there is room')
+@click.option('--ram-min-free', metavar='SIZE', default='1G', help='Memory which must be free to use --ram; not a limit on the environment [default: 1G]')
 @click.option('-r', '--remove', is_flag=True, help='Remove virtual environment')
+@click.option('--shared-pip', is_flag=True, help='Use one pip shared by all virtual environments of the same python version')
+@click.option('--size', is_flag=True, help='Include disk usage when listing virtual environments')
+@click.option('--tier', metavar='DURATION', default=None, help='Archive virtual environments not entered within DURATION (e.g. 30d)')
+@click.option('-R', '--requirements', metavar='FILE', default=None, help='Install requirements FILE when creating or upgrading', type=Path)
+@click.option('--unique', is_flag=True, help='Add a random suffix to the name of ephemeral virtual environments so parallel runs never collide')
 @click.option('-u', '--upgrade', is_flag=True, help='Upgrades to latest python version')
+@click.option('--usage', 'show_usage', is_flag=True, help='Show wall time, CPU, max RSS and block I/O of COMMAND')
 @click.option('-v', '--verbose', count=True, help='More output')
 @click.option('-V', '--version', is_flag=True, help='Show version and exit')
 @click.option('-w', '--working', metavar='PATH', default=None, help=f'Default startup PATH when entering virtual environment', type=Path)
+@click.option('--which-has', metavar='REQUIREMENT', default=None, help='Show virtual environments containing REQUIREMENT (e.g. "requests<2.20")')
 @click.option('-W', '--ignore-working', 'ignore_working', is_flag=True, default=False, help=f'Ignore startup path when entering virtual environment [use: {Path.cwd()}]')
 @click.option('--shell-completion', is_flag=True, help='Show shell completion code')
 @click.argument('name', metavar='VENV_NAME', required=False)
 @click.argument('command', required=False, nargs=-1)
 @click.pass_context
-def vsh(ctx, copy, create_only, dry_run, ephemeral, force, interactive, shell_completion, ls, no_pip, overwrite, path, python, remove, upgrade, verbose, version, name, command, working, ignore_working):
+def vsh(ctx, as_json, background_pip, check, copy, cprofile, create_only, diff, dry_run, du, each, ephemeral, fail_fast, files, force, freeze, gc, interactive, jobs, keep_recent, lazy_pip, shared_pip, shell_completion, ls, matrix, max_size, metrics_path, no_compile, no_pip, offline, overwrite, path, pattern, profile, profile_file, provision, python, ram, ram_min_free, remove, requirements, size, tier, unique, upgrade, show_usage, verbose, version, which_has, name, command, working, ignore_working):
+    path_given = path is not None
+    # Closed with the context, which also happens when exit() is called below
+    resources = contextlib.ExitStack()
+    ctx.call_on_close(resources.close)
+    if instrument.enabled():
+        trace = resources.enter_context(instrument.tracing())
+        resources.callback(instrument.report, trace)
+    if profile or profile_file or cprofile:
+        resources.enter_context(instrument.profiling(path=profile_file or instrument.PROFILE_PATH, cprofile=cprofile))
     if shell_completion:
         # Todo: fix bash/shell completion
         subprocess.run('. vsh', shell=True)
         exit(0)
     if ls:
-        api.show_envs()
+        api.show_envs(size=size)
         exit(0)
     elif version:
         api.show_version()
         exit(0)
+    elif tier:
+        api.tier(idle=tier, verbose=verbose + 1, dry_run=dry_run)
+        exit(0)
+    elif check and not (name or path):
+        problems = api.check_envs()
+        exit(1 if any(problems.values()) else 0)
+    elif which_has:
+        api.which_has(which_has)
+        exit(0)
+    elif each:
+        # VENV_NAME is not used by --each; it is the start of the command
+        command = [name, *command] if name else []
+        if not command:
+            terminal.echo(f'{terminal.red("Error")}: {terminal.blue("--each")} requires a {terminal.blue("COMMAND")}.')
+            exit(1)
+        results = api.each(command, pattern=pattern, jobs=jobs, fail_fast=fail_fast)
+        exit(1 if any(results.values()) or None in results.values() else 0)
+    elif matrix:
+        if not (python and name and command):
+            terminal.echo(f'{terminal.red("Error")}: {terminal.blue("--matrix")} requires {terminal.blue("--python")}, a {terminal.blue("VENV_NAME")} and a {terminal.blue("COMMAND")}.')
+            exit(1)
+        results = api.matrix(name, python.split(','), command, jobs=jobs, include_pip=not no_pip, requirements=requirements, verbose=verbose - 1)
+        exit(1 if any(return_code for return_code, duration in results.values()) else 0)
+    elif provision:
+        if not (requirements and name):
+            terminal.echo(f'{terminal.red("Error")}: {terminal.blue("--provision")} requires {terminal.blue("--requirements")} and at least one {terminal.blue("VENV_NAME")}.')
+            exit(1)
+        paths = [api.get_venv_home(name=venv_name, check=False) for venv_name in [name, *command]]
+        api.provision(paths, requirements=requirements, python=python, jobs=jobs, offline=offline, verbose=verbose + 1, dry_run=dry_run)
+        exit(0)
+    elif gc:
+        if not max_size:
+            terminal.echo(f'{terminal.red("Error")}: {terminal.blue("--gc")} requires {terminal.blue("--max-size")}.')
+            exit(1)
+        api.gc(max_size=max_size, keep_recent=keep_recent, verbose=verbose + 1, dry_run=dry_run)
+        exit(0)
     else:
         try:
             name, path = api.validate_venv_name_and_path(name=name, path=path)
@@ -70,40 +149,74 @@ def vsh(ctx, copy, create_only, dry_run, ephemeral, force, interactive, shell_co
     if not path:
         path = api.get_venv_home(name=name)
 
+    if du:
+        api.du(path)
+        exit(0)
+    elif freeze:
+        api.freeze(path, output_format='json' if as_json else 'text')
+        exit(0)
+    elif check:
+        problems = api.check_envs(path)
+        exit(1 if any(problems.values()) else 0)
+    elif diff:
+        other_name, other_path = api.validate_venv_name_and_path(name=diff, path=None)
+        exit(1 if api.diff_envs(path, other_path, files=files) else 0)
+
+    if ephemeral and unique and not path_given:
+        name = unique_name(name, home=path.parent)
+        path = path.parent / name
+
+    if ephemeral and ram and not (path_given or api.validate_environment(path)):
+        ram_path = api.find_ram_path(name, min_free=ram_min_free)
+        if ram_path:
+            path = ram_path
+        else:
+            terminal.echo(f'{terminal.yellow("WARNING")}: No memory backed folder with {ram_min_free} free, using {path}', verbose=verbose)
+
+    # Resolved once; the api reuses its paths and configuration
+    venv = api.Venv(path, check=False)
+
     # Determine if an environment already exists
-    exists = api.validate_environment(path)
+    exists = venv.is_valid
 
     # when no command exists, default to the shell itself
     if not command and not remove:
         command = os.getenv('SHELL')
 
-    # when upgrade is requested, then perform upgrade
-    if exists and upgrade:
-        api.upgrade(path, include_pip=not no_pip, overwrite=overwrite, symlinks=not copy, python=python, working=working, verbose=verbose - 1)
+    # Termination signals still remove ephemeral environments
+    with exit_on_signals():
+        try:
+            # when upgrade is requested, then perform upgrade
+            if exists and upgrade:
+                api.upgrade(venv, include_pip=not (no_pip or lazy_pip or shared_pip or background_pip), overwrite=overwrite, symlinks=not copy, python=python, working=working, verbose=verbose - 1, requirements=requirements, lazy_pip=lazy_pip, shared_pip=shared_pip, precompile=not no_compile, background_pip=background_pip)
 
-    elif not exists and not remove:
-        api.create(path, include_pip=not no_pip, overwrite=overwrite, symlinks=not copy, python=python, working=working, verbose=verbose - 1)
-        if ephemeral:
-            remove = True
+            elif not exists and not remove:
+                # Set first so a partially created ephemeral environment is removed too
+                if ephemeral:
+                    remove = True
+                api.create(venv, include_pip=not (no_pip or lazy_pip or shared_pip or background_pip), overwrite=overwrite, symlinks=not copy, python=python, working=working, verbose=verbose - 1, requirements=requirements, lazy_pip=lazy_pip, shared_pip=shared_pip, precompile=not no_compile, background_pip=background_pip)
 
-    if (sys.platform in ['win32'] or command) and not create_only:
-        return_code = api.enter(path, command, verbose=verbose - 1, working=working, ignore_working=ignore_working)
+            elif exists and requirements and not remove:
+                api.install_requirements(venv, requirements=requirements, verbose=verbose - 1, offline=offline)
 
-    if ephemeral and not (force or remove):
-        msg = textwrap.dedent(f"""\
+            if (sys.platform in ['win32'] or command) and not create_only:
+                return_code = api.enter(venv, command, verbose=verbose - 1, working=working, ignore_working=ignore_working, show_usage=show_usage, metrics_path=metrics_path)
 
-        {terminal.yellow("WARNING: Ephemeral option ignored. Aborting removal.")}
+            if ephemeral and not (force or remove):
+                msg = textwrap.dedent(f"""\
 
-        Virtual environment "{terminal.green(name)}" existed previously.
-        To remove, run:
+                {terminal.yellow("WARNING: Ephemeral option ignored. Aborting removal.")}
 
-            {terminal.blue(f"vsh -r {name}")}
+                Virtual environment "{terminal.green(name)}" existed previously.
+                To remove, run:
 
-        """)  # noqa
-        terminal.echo(msg)
+                    {terminal.blue(f"vsh -r {name}")}
 
-    if remove:
-        api.remove(path, verbose=verbose - 1, interactive=interactive, dry_run=dry_run)
+                """)  # noqa
+                terminal.echo(msg)
+        finally:
+            if remove:
+                api.remove(venv, verbose=verbose - 1, interactive=interactive, dry_run=dry_run)
 
     sys.tracebacklimit = 0
     exit(return_code)
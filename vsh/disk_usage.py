@@ -0,0 +1,186 @@
+import hashlib
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set
+
+from .packages import find_bin_path, find_distributions, find_site_packages, parse_dist_info_name, read_record
+from .vsh_config import HOME
+
+__all__ = ('CACHE_PATH', 'VenvUsage', 'directory_size', 'directory_sizes', 'package_sizes', 'usage', 'usages')
+
+# Cached disk usage per virtual environment
+CACHE_PATH = HOME / '.vsh' / 'cache' / 'du'
+
+
+@dataclass
+class VenvUsage:
+    """Disk usage of a virtual environment
+
+    Attributes:
+        path: path to the virtual environment
+        total: number of bytes used by files within the virtual environment
+        packages: number of bytes used by each installed distribution
+    """
+    path: Path
+    total: int = 0
+    packages: Dict[str, int] = field(default_factory=dict)
+
+
+def directory_size(path: Path) -> int:
+    """Calculates the disk space used by a folder
+
+    Sizes are apparent file sizes, the unit RECORD files use, so totals
+    and per-distribution sizes can be compared.  Symbolic links are
+    counted, but never followed.
+
+    Args:
+        path: path to folder
+
+    Returns:
+        number of bytes used by files within the folder
+    """
+    total = 0
+    folders = [str(path)]
+    while folders:
+        folder = folders.pop()
+        try:
+            entries = list(os.scandir(folder))
+        except OSError:
+            continue
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    folders.append(entry.path)
+                else:
+                    total += entry.stat(follow_symlinks=False).st_size
+            except OSError:
+                continue
+    return total
+
+
+def directory_sizes(paths: Iterable[Path], workers: Optional[int] = None) -> Dict[Path, int]:
+    """Calculates the disk space used by several folders in parallel
+
+    Args:
+        paths: paths to folders
+        workers: number of threads [default: ThreadPoolExecutor's default]
+
+    Returns:
+        mapping of folder path to number of bytes used by its files
+    """
+    paths = list(paths)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        sizes = executor.map(directory_size, paths)
+        return dict(zip(paths, sizes))
+
+
+def package_sizes(site_packages: Path) -> Dict[str, int]:
+    """Calculates the disk space used by each installed distribution
+
+    Sizes come from dist-info RECORD files where present.  Anything
+    within site-packages that no RECORD accounts for is measured
+    directly and reported under its own name.
+
+    Args:
+        site_packages: path to site-packages
+
+    Returns:
+        mapping of distribution name to number of bytes
+    """
+    sizes: Dict[str, int] = {}
+    owned: Set[str] = set()
+    for dist_info in find_distributions(site_packages):
+        name, version = parse_dist_info_name(dist_info)
+        size = 0
+        recorded = False
+        for record in read_record(dist_info):
+            recorded = True
+            owned.add(record.path.split('/', 1)[0])
+            if record.size is not None:
+                size += record.size
+            else:
+                # RECORD does not list sizes for itself or compiled files
+                try:
+                    size += (site_packages / record.path).lstat().st_size
+                except OSError:
+                    pass
+        if not recorded:
+            owned.add(dist_info.name)
+            size = directory_size(dist_info)
+        sizes[name] = sizes.get(name, 0) + size
+    with os.scandir(str(site_packages)) as entries:
+        for entry in entries:
+            if entry.name in owned:
+                continue
+            if entry.is_dir(follow_symlinks=False):
+                sizes[entry.name] = directory_size(Path(entry.path))
+            else:
+                sizes[entry.name] = entry.stat(follow_symlinks=False).st_size
+    return sizes
+
+
+def usage(path: Path, cache_path: Optional[Path] = None) -> VenvUsage:
+    """Calculates the disk usage of a virtual environment
+
+    Results are cached and reused until the modification time of the
+    virtual environment, its bin or its site-packages folder changes,
+    which is the case whenever a distribution is installed or removed.
+
+    Args:
+        path: path to virtual environment
+        cache_path: path to cache folder [default: ~/.vsh/cache/du]
+
+    Returns:
+        disk usage of the virtual environment
+    """
+    cache_file = Path(cache_path or CACHE_PATH) / f'{hashlib.sha1(str(path).encode("utf-8")).hexdigest()}.json'
+    site_packages = find_site_packages(path)
+    key = _cache_key(path, site_packages)
+    try:
+        data = json.loads(cache_file.read_text(encoding='utf-8'))
+        if data['key'] == key:
+            return VenvUsage(path=path, total=data['total'], packages=data['packages'])
+    except (OSError, ValueError, KeyError):
+        pass
+    venv_usage = VenvUsage(
+        path=path,
+        total=directory_size(path),
+        packages=package_sizes(site_packages) if site_packages else {},
+        )
+    data = asdict(venv_usage)
+    data.update({'key': key, 'path': str(path)})
+    cache_file.parent.mkdir(parents=True, exist_ok=True)
+    staged_file = cache_file.with_suffix(f'.{os.getpid()}.tmp')
+    staged_file.write_text(json.dumps(data), encoding='utf-8')
+    os.replace(str(staged_file), str(cache_file))
+    return venv_usage
+
+
+def usages(paths: Iterable[Path], workers: Optional[int] = None, cache_path: Optional[Path] = None) -> Dict[Path, VenvUsage]:
+    """Calculates the disk usage of several virtual environments in parallel
+
+    Args:
+        paths: paths to virtual environments
+        workers: number of threads [default: ThreadPoolExecutor's default]
+        cache_path: path to cache folder [default: ~/.vsh/cache/du]
+
+    Returns:
+        mapping of venv path to its disk usage
+    """
+    paths = list(paths)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = executor.map(lambda p: usage(p, cache_path=cache_path), paths)
+        return dict(zip(paths, results))
+
+
+def _cache_key(path: Path, site_packages: Optional[Path]) -> List[int]:
+    key = []
+    for folder in (path, find_bin_path(path), site_packages):
+        try:
+            key.append(folder.stat().st_mtime_ns if folder else 0)
+        except OSError:
+            key.append(0)
+    return key
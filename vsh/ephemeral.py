@@ -0,0 +1,177 @@
+import contextlib
+import os
+import secrets
+import signal
+import subprocess
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, Optional
+
+__all__ = ('EXIT_SIGNALS', 'MEMORY_FILESYSTEMS', 'STOP_TIMEOUT', 'available_memory', 'exit_on_signals', 'find_ram_home', 'mount_types', 'ram_candidates', 'stop_process', 'unique_name')
+
+# Signals which end vsh; turned into SystemExit so cleanup still runs
+EXIT_SIGNALS = tuple(getattr(signal, name) for name in ('SIGTERM', 'SIGHUP') if hasattr(signal, name))
+
+# Filesystem types which keep their files in memory
+MEMORY_FILESYSTEMS = ('ramfs', 'tmpfs')
+
+# Seconds a child is given to exit after a termination signal is passed on
+STOP_TIMEOUT = 5.0
+
+
+def available_memory(meminfo_path: Path = Path('/proc/meminfo')) -> Optional[int]:
+    """Finds how much memory can be used without swapping
+
+    Args:
+        meminfo_path: path to meminfo [default: /proc/meminfo]
+
+    Returns:
+        number of bytes or None when unknown
+    """
+    try:
+        text = meminfo_path.read_text()
+    except OSError:
+        return None
+    for line in text.splitlines():
+        key, _, value = line.partition(':')
+        if key == 'MemAvailable':
+            return int(value.split()[0]) * 1024
+    return None
+
+
+@contextlib.contextmanager
+def exit_on_signals(signals: Iterable[int] = EXIT_SIGNALS) -> Iterator[None]:
+    """Raises SystemExit when a termination signal arrives
+
+    Without this, signals like SIGTERM end vsh at once and skip the
+    removal of ephemeral virtual environments.
+
+    Args:
+        signals: signals to handle [default: SIGTERM, SIGHUP]
+    """
+    def handler(signum, frame):
+        raise SystemExit(128 + signum)
+
+    previous = {signum: signal.signal(signum, handler) for signum in signals}
+    try:
+        yield
+    finally:
+        for signum, previous_handler in previous.items():
+            signal.signal(signum, previous_handler)
+
+
+def find_ram_home(min_free: int, candidates: Optional[Iterable[Path]] = None) -> Optional[Path]:
+    """Finds a memory backed folder for ephemeral virtual environments
+
+    Args:
+        min_free: bytes which must be free on the filesystem and in memory
+        candidates: folders to consider [default: see ram_candidates]
+
+    Returns:
+        private vsh folder under the first suitable candidate or None
+    """
+    mounts = mount_types()
+    memory = available_memory()
+    if memory is not None and memory < min_free:
+        return None
+    for candidate in ram_candidates() if candidates is None else candidates:
+        if _mount_type(candidate, mounts) not in MEMORY_FILESYSTEMS:
+            continue
+        try:
+            stats = os.statvfs(candidate)
+        except OSError:
+            continue
+        if stats.f_bavail * stats.f_frsize < min_free:
+            continue
+        home = candidate / f'vsh-{os.getuid()}'
+        try:
+            home.mkdir(mode=0o700, exist_ok=True)
+        except OSError:
+            continue
+        if os.access(home, os.W_OK):
+            return home
+    return None
+
+
+def mount_types(mounts_path: Path = Path('/proc/mounts')) -> Dict[Path, str]:
+    """Reads the filesystem type of every mount point
+
+    Args:
+        mounts_path: path to mount table [default: /proc/mounts]
+
+    Returns:
+        mapping of mount point to filesystem type
+    """
+    try:
+        text = mounts_path.read_text()
+    except OSError:
+        return {}
+    mounts = {}
+    for line in text.splitlines():
+        fields = line.split()
+        if len(fields) >= 3:
+            # Spaces in mount points are escaped as octal
+            mount_point = fields[1].replace('\\040', ' ')
+            mounts[Path(mount_point)] = fields[2]
+    return mounts
+
+
+def ram_candidates() -> Iterable[Path]:
+    """Lists folders which are usually memory backed, most private first
+
+    Returns:
+        existing candidate folders
+    """
+    runtime_dir = os.getenv('XDG_RUNTIME_DIR')
+    for folder in (runtime_dir, '/dev/shm'):
+        if folder and Path(folder).is_dir():
+            yield Path(folder)
+
+
+def stop_process(process: subprocess.Popen, error: BaseException, timeout: float = STOP_TIMEOUT) -> int:
+    """Passes the signal which ended vsh on to a child and waits for it
+
+    exit_on_signals turns termination signals into SystemExit(128 + signal),
+    which only reaches vsh; the child is sent the same signal so it can
+    finish before its virtual environment is removed.  On Ctrl-C the
+    terminal has already signalled the child.
+
+    Args:
+        process: child still running
+        error: exception which interrupted waiting for the child
+        timeout: seconds before the child is killed [default: 5]
+
+    Returns:
+        return code of child
+    """
+    code = getattr(error, 'code', None)
+    if isinstance(code, int) and code - 128 in EXIT_SIGNALS and process.poll() is None:
+        process.send_signal(code - 128)
+    try:
+        return process.wait(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        return process.wait()
+
+
+def unique_name(name: str, home: Optional[Path] = None) -> str:
+    """Makes a virtual environment name no other invocation will use
+
+    Args:
+        name: name of virtual environment
+        home: folder the environment will be created in
+
+    Returns:
+        name with a random suffix (e.g. name-3f9a02c1)
+    """
+    while True:
+        candidate = f'{name}-{secrets.token_hex(4)}'
+        if home is None or not (home / candidate).exists():
+            return candidate
+
+
+def _mount_type(path: Path, mounts: Dict[Path, str]) -> str:
+    path = path.resolve()
+    for parent in (path, *path.parents):
+        if parent in mounts:
+            return mounts[parent]
+    return ''
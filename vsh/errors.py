@@ -38,9 +38,18 @@ class PathNotFoundError(BaseError):
     """ERROR: Could not find path: {path}"""
 
 
+class RequirementsError(BaseError):
+    """ERROR: pip could not install {requirements}:
+{output}"""
+
+
 class VenvConfigNotFound(BaseError):
     """ERROR: Could not find venv: {name}"""
 
 
+class VenvLockedError(BaseError):
+    """ERROR: Virtual environment is in use: {path}"""
+
+
 class VenvNameError(BaseError):
     """ERROR: Could not find virtual environment named: {name}"""
@@ -0,0 +1,135 @@
+import contextlib
+import os
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Tuple
+
+from .vsh_config import HOME
+
+__all__ = ('HISTORY_PATH', 'append_line', 'compact', 'last_used', 'read', 'record')
+
+# Append-only log of (timestamp, duration, venv path) records
+HISTORY_PATH = HOME / '.vsh' / 'history.log'
+
+
+def append_line(log_path: Path, line: str) -> Path:
+    """Appends a line to a log shared by vsh processes
+
+    The line is written with a single write to a file opened with
+    O_APPEND, so concurrent vsh processes never interleave lines.
+
+    Args:
+        log_path: path to log, created with its folder when missing
+        line: text to append, without a trailing newline
+
+    Returns:
+        path to log
+    """
+    log_path = Path(log_path).expanduser()
+    log_path.parent.mkdir(parents=True, exist_ok=True)
+    fd = os.open(str(log_path), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        os.write(fd, f'{line}\n'.encode('utf-8'))
+    finally:
+        os.close(fd)
+    return log_path
+
+
+def compact(history_path: Optional[Path] = None) -> Path:
+    """Rewrites the history log keeping only the last record of each virtual environment
+
+    The compacted log is written next to the log and moved into place
+    with os.replace, so readers see either the old or the new log.
+    Records appended while compacting are carried over.
+
+    Args:
+        history_path: path to history log [default: ~/.vsh/history.log]
+
+    Returns:
+        path to history log
+    """
+    history_path = Path(history_path or HISTORY_PATH)
+    if not history_path.exists():
+        return history_path
+    latest: Dict[Path, Tuple[float, bytes]] = {}
+    with history_path.open('rb') as stream:
+        for line in stream:
+            parsed = _parse(line.decode('utf-8', errors='replace'))
+            if parsed is None:
+                continue
+            path, timestamp, duration = parsed
+            if path not in latest or timestamp + duration >= latest[path][0]:
+                latest[path] = (timestamp + duration, line if line.endswith(b'\n') else line + b'\n')
+        compacted_path = history_path.with_name(f'.{history_path.name}.{os.getpid()}')
+        try:
+            with compacted_path.open('wb') as compacted:
+                compacted.writelines(line for _, line in latest.values())
+                compacted.write(stream.read())
+            os.replace(str(compacted_path), str(history_path))
+        except BaseException:
+            with contextlib.suppress(FileNotFoundError):
+                compacted_path.unlink()
+            raise
+    return history_path
+
+
+def last_used(history_path: Optional[Path] = None) -> Dict[Path, float]:
+    """Finds when each virtual environment was last used
+
+    Args:
+        history_path: path to history log [default: ~/.vsh/history.log]
+
+    Returns:
+        mapping of venv path to the timestamp it was last exited
+    """
+    used: Dict[Path, float] = {}
+    for path, timestamp, duration in read(history_path=history_path):
+        used[path] = max(used.get(path, 0.0), timestamp + duration)
+    return used
+
+
+def read(history_path: Optional[Path] = None) -> Iterable[Tuple[Path, float, float]]:
+    """Reads the history log
+
+    Args:
+        history_path: path to history log [default: ~/.vsh/history.log]
+
+    Yields:
+        - path: venv path
+        - timestamp: time the venv was entered
+        - duration: number of seconds spent in the venv
+    """
+    history_path = Path(history_path or HISTORY_PATH)
+    if not history_path.exists():
+        return
+    with history_path.open('r', encoding='utf-8') as stream:
+        for line in stream:
+            parsed = _parse(line)
+            if parsed is not None:
+                yield parsed
+
+
+def record(path: Path, timestamp: float, duration: float, history_path: Optional[Path] = None) -> Path:
+    """Appends a usage record to the history log (see append_line)
+
+    Args:
+        path: path to virtual environment
+        timestamp: time the venv was entered
+        duration: number of seconds spent in the venv
+        history_path: path to history log [default: ~/.vsh/history.log]
+
+    Returns:
+        path to history log
+    """
+    return append_line(Path(history_path or HISTORY_PATH), f'{timestamp:.0f}\t{duration:.3f}\t{path}')
+
+
+def _parse(line: str) -> Optional[Tuple[Path, float, float]]:
+    fields = line.rstrip('\n').split('\t', 2)
+    # A torn or foreign line should never break a lookup
+    if len(fields) != 3:
+        return None
+    timestamp, duration, path = fields
+    try:
+        return Path(path), float(timestamp), float(duration)
+    except ValueError:
+        return None
@@ -0,0 +1,370 @@
+import collections
+import contextlib
+import cProfile
+import json
+import os
+import sys
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Counter, Dict, Iterator, List, Optional, Tuple
+
+__all__ = (
+    'EVENTS', 'IOTrace', 'OTHER_PHASE', 'PROFILE_PATH', 'Profile', 'Span', 'TRACE_IO_VARIABLE',
+    'active', 'enabled', 'finish_profile', 'phase', 'profiling', 'report', 'span', 'start', 'start_profile', 'stop', 'tracing',
+    )
+
+# Environment variable enabling io tracing of the command line (1 or table, json)
+TRACE_IO_VARIABLE = 'VSH_TRACE_IO'
+
+# Audit events counted, by the category they are reported under
+EVENTS = {
+    'open': 'open',
+    'os.listdir': 'listdir',
+    'os.scandir': 'listdir',
+    'subprocess.Popen': 'spawn',
+    'os.system': 'spawn',
+    'os.exec': 'spawn',
+    'os.spawn': 'spawn',
+    }
+
+# Phase of events raised outside of any phase
+OTHER_PHASE = 'other'
+
+# Chrome trace written by --profile unless --profile-file is given
+PROFILE_PATH = Path('vsh-profile.json')
+
+_CATEGORIES = ('open', 'stat', 'listdir', 'spawn')
+
+_hook_installed = False
+_trace: Optional['IOTrace'] = None
+_profile: Optional['Profile'] = None
+# Phases and spans entered by the current thread, innermost last
+_local = threading.local()
+_stat_functions: Dict[str, object] = {}
+
+
+@dataclass
+class IOTrace:
+    """Filesystem and process operations counted per vsh phase
+
+    Attributes:
+        counts: operation counts keyed by phase, then by category
+            (open, stat, listdir, spawn)
+
+    """
+    counts: Dict[str, Counter[str]] = field(default_factory=lambda: collections.defaultdict(collections.Counter))
+
+    @property
+    def json(self) -> Dict[str, Dict[str, int]]:
+        return {name: dict(counter) for name, counter in self.counts.items()}
+
+    def count(self, category: str, phase: Optional[str] = None) -> int:
+        """Counts operations of a category
+
+        Args:
+            category: one of open, stat, listdir or spawn
+            phase: only count operations within this phase [default: all phases]
+
+        Returns:
+            number of operations
+        """
+        if phase is not None:
+            return self.counts.get(phase, {}).get(category, 0)
+        return sum(counter.get(category, 0) for counter in self.counts.values())
+
+    def over_budget(self, budget: Dict[str, int], phase: Optional[str] = None) -> Dict[str, Tuple[int, int]]:
+        """Finds categories which exceeded their budget
+
+        Args:
+            budget: most operations allowed per category (e.g. {"spawn": 1, "stat": 30})
+            phase: only count operations within this phase [default: all phases]
+
+        Returns:
+            (count, allowed) for every category over budget; empty when within budget
+        """
+        found = {category: (self.count(category, phase=phase), allowed) for category, allowed in budget.items()}
+        return {category: counts for category, counts in found.items() if counts[0] > counts[1]}
+
+    def format_table(self) -> str:
+        """Formats counts as a table with one row per phase"""
+        width = max([len('phase'), len('total')] + [len(name) for name in self.counts])
+        lines = [f'{"phase".ljust(width)}  ' + '  '.join(f'{category:>7}' for category in _CATEGORIES)]
+        for name, counter in self.counts.items():
+            lines.append(f'{name.ljust(width)}  ' + '  '.join(f'{counter.get(category, 0):>7}' for category in _CATEGORIES))
+        lines.append(f'{"total".ljust(width)}  ' + '  '.join(f'{self.count(category):>7}' for category in _CATEGORIES))
+        return '\n'.join(lines)
+
+    def record(self, category: str):
+        phases = _phases()
+        self.counts[phases[-1] if phases else OTHER_PHASE][category] += 1
+
+
+@dataclass
+class Span:
+    """Time spent in a named part of vsh
+
+    Attributes:
+        name: name of span (e.g. setup_python, rc discovery)
+        start: seconds since the profile started
+        duration: seconds spent in the span
+        thread: identifier of the thread the span ran in
+        depth: number of spans the span is nested in
+
+    """
+    name: str
+    start: float
+    duration: float
+    thread: int
+    depth: int = 0
+
+
+@dataclass
+class Profile:
+    """Nested spans recorded while vsh ran
+
+    Attributes:
+        path: path the Chrome trace is written to
+        spans: spans in the order they finished
+        started: performance counter when the profile started
+        profiler: cProfile profiler run alongside, if requested
+
+    """
+    path: Path = PROFILE_PATH
+    spans: List[Span] = field(default_factory=list)
+    started: float = field(default_factory=time.perf_counter)
+    profiler: Optional[cProfile.Profile] = None
+
+    @property
+    def chrome_trace(self) -> Dict:
+        """Spans as Chrome trace events (chrome://tracing, Perfetto)"""
+        pid = os.getpid()
+        events = [
+            {'name': span.name, 'cat': 'vsh', 'ph': 'X', 'ts': round(span.start * 1e6), 'dur': round(span.duration * 1e6), 'pid': pid, 'tid': span.thread}
+            for span in sorted(self.spans, key=lambda span: (span.start, span.depth))
+            ]
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def format_summary(self) -> str:
+        """Formats total seconds and calls per span name, slowest first"""
+        totals: Dict[str, List[float]] = {}
+        for span in self.spans:
+            total = totals.setdefault(span.name, [0.0, 0])
+            total[0] += span.duration
+            total[1] += 1
+        width = max([len('span')] + [len(name) for name in totals])
+        lines = [f'{"span".ljust(width)}  {"seconds":>8}  {"calls":>5}']
+        for name, (seconds, calls) in sorted(totals.items(), key=lambda item: item[1][0], reverse=True):
+            lines.append(f'{name.ljust(width)}  {seconds:>8.3f}  {calls:>5}')
+        return '\n'.join(lines)
+
+    def record(self, name: str, started: float, depth: int):
+        self.spans.append(Span(name=name, start=started - self.started, duration=time.perf_counter() - started, thread=threading.get_ident(), depth=depth))
+
+
+def active() -> Optional[IOTrace]:
+    """Returns the trace being recorded, if any"""
+    return _trace
+
+
+def enabled() -> bool:
+    """Checks if io tracing was requested through VSH_TRACE_IO"""
+    return os.getenv(TRACE_IO_VARIABLE, '').lower() not in ('', '0', 'false', 'no')
+
+
+def finish_profile() -> Optional[Profile]:
+    """Stops profiling, writes the Chrome trace and prints a summary to stderr
+
+    With cProfile, its statistics are written next to the trace with a
+    .prof suffix (see python -m pstats).
+
+    Returns:
+        profile recorded
+    """
+    global _profile
+    profile, _profile = _profile, None
+    if profile is None:
+        return None
+    profile.record('vsh', profile.started, depth=0)
+    profile.path.parent.mkdir(parents=True, exist_ok=True)
+    profile.path.write_text(json.dumps(profile.chrome_trace), encoding='utf-8')
+    lines = [profile.format_summary(), f'Chrome trace: {profile.path}']
+    if profile.profiler:
+        profile.profiler.disable()
+        stats_path = profile.path.with_suffix('.prof')
+        profile.profiler.dump_stats(str(stats_path))
+        lines.append(f'cProfile stats: {stats_path}')
+    print('\n'.join(lines), file=sys.stderr, flush=True)
+    return profile
+
+
+@contextlib.contextmanager
+def phase(name: str) -> Iterator[None]:
+    """Attributes operations to a phase (e.g. config, validation, rc discovery, spawn)
+
+    Phases nest; operations count toward the innermost one.  This costs
+    next to nothing while no trace is recorded.
+
+    Args:
+        name: name of phase
+    """
+    phases = _phases()
+    phases.append(name)
+    try:
+        with span(name):
+            yield
+    finally:
+        phases.pop()
+
+
+@contextlib.contextmanager
+def profiling(path: Path = PROFILE_PATH, cprofile: bool = False) -> Iterator[Profile]:
+    """Profiles the block (see start_profile)
+
+    Yields:
+        profile being recorded
+    """
+    profile = start_profile(path=path, cprofile=cprofile)
+    try:
+        yield profile
+    finally:
+        finish_profile()
+
+
+def report(trace: Optional[IOTrace] = None, output_format: Optional[str] = None):
+    """Writes a trace to stderr
+
+    Args:
+        trace: trace to write [default: active trace]
+        output_format: table or json [default: json when VSH_TRACE_IO=json, else table]
+    """
+    trace = trace or _trace
+    if trace is None:
+        return
+    output_format = output_format or ('json' if os.getenv(TRACE_IO_VARIABLE, '').lower() == 'json' else 'table')
+    text = json.dumps(trace.json, indent=2) if output_format == 'json' else trace.format_table()
+    print(text, file=sys.stderr, flush=True)
+
+
+@contextlib.contextmanager
+def span(name: str) -> Iterator[None]:
+    """Times a part of vsh while profiling
+
+    Spans nest and may be used as decorators; they do nothing unless a
+    profile is being recorded.
+
+    Args:
+        name: name of span
+    """
+    profile = _profile
+    if profile is None:
+        yield
+        return
+    spans = _spans()
+    started = time.perf_counter()
+    spans.append(name)
+    try:
+        yield
+    finally:
+        spans.pop()
+        profile.record(name, started, depth=len(spans) + 1)
+
+
+def start() -> IOTrace:
+    """Starts recording a new trace
+
+    open, listdir/scandir and process creation are counted by an audit
+    hook (python 3.8+).  CPython raises no audit events for stat, so
+    os.stat and os.lstat are wrapped while the trace is recorded; before
+    python 3.11 pathlib holds its own reference and is not counted.
+
+    The wrappers replace os.stat and os.lstat for the whole process and
+    every thread in it, and stay until stop is called.  Use tracing,
+    which always stops, rather than pairing start and stop by hand.
+
+    Returns:
+        trace being recorded
+    """
+    global _hook_installed, _trace
+    if not _hook_installed and hasattr(sys, 'addaudithook'):
+        # Audit hooks cannot be removed, so one hook serves every trace
+        sys.addaudithook(_audit)
+        _hook_installed = True
+    if not _stat_functions:
+        for name in ('stat', 'lstat'):
+            _stat_functions[name] = getattr(os, name)
+            setattr(os, name, _counting(_stat_functions[name]))
+    _trace = IOTrace()
+    return _trace
+
+
+def start_profile(path: Path = PROFILE_PATH, cprofile: bool = False) -> Profile:
+    """Starts recording spans
+
+    Args:
+        path: path to write the Chrome trace to [default: ./vsh-profile.json]
+        cprofile: also run cProfile [default: False]
+
+    Returns:
+        profile being recorded
+    """
+    global _profile
+    profiler = cProfile.Profile() if cprofile else None
+    _profile = Profile(path=Path(path), profiler=profiler)
+    if profiler:
+        profiler.enable()
+    return _profile
+
+
+def stop() -> Optional[IOTrace]:
+    """Stops recording
+
+    Returns:
+        trace recorded
+    """
+    global _trace
+    trace, _trace = _trace, None
+    for name, function in _stat_functions.items():
+        setattr(os, name, function)
+    _stat_functions.clear()
+    return trace
+
+
+@contextlib.contextmanager
+def tracing() -> Iterator[IOTrace]:
+    """Records a trace for the duration of the block
+
+    Tracing patches os.stat and os.lstat process-wide (see start), so
+    operations of other threads are counted too; the originals are put
+    back when the block exits, even on errors.
+
+    Yields:
+        trace being recorded
+    """
+    trace = start()
+    try:
+        yield trace
+    finally:
+        stop()
+
+
+def _audit(event: str, args):
+    if _trace is not None and event in EVENTS:
+        _trace.record(EVENTS[event])
+
+
+def _counting(function):
+    def stat(*args, **kwds):
+        if _trace is not None:
+            _trace.record('stat')
+        return function(*args, **kwds)
+    return stat
+
+
+def _phases() -> List[str]:
+    return _local.__dict__.setdefault('phases', [])
+
+
+def _spans() -> List[str]:
+    return _local.__dict__.setdefault('spans', [])
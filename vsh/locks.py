@@ -0,0 +1,191 @@
+import contextlib
+import hashlib
+import os
+import threading
+from pathlib import Path
+from typing import Iterator, Optional, Tuple
+
+from . import terminal
+from .errors import VenvLockedError
+from .vsh_config import HOME
+
+try:
+    import fcntl
+except ImportError:  # windows
+    fcntl = None
+
+__all__ = ('LOCKS_PATH', 'acquire', 'discard', 'find_lock', 'held', 'locked', 'release')
+
+# Advisory lock files, one per virtual environment path
+LOCKS_PATH = HOME / '.vsh' / 'locks'
+
+# Locks held by the current thread as (count, shared); nested acquisitions reuse them
+_held = threading.local()
+
+
+def acquire(path: Path, shared: bool = False, blocking: bool = True, locks_path: Optional[Path] = None, verbose: int = 0) -> Tuple[Optional[int], bool]:
+    """Takes an advisory lock on a virtual environment without reentrancy
+
+    Prefer locked; this is for callers which acquire and release from
+    different threads, such as event loops using executors.
+
+    Args:
+        path: path to virtual environment
+        shared: take a shared instead of an exclusive lock [default: False]
+        blocking: wait for other processes to release the lock [default: True]
+        locks_path: path to lock files [default: ~/.vsh/locks]
+        verbose: report waiting for another process on stderr [default: 0]
+
+    Raises:
+        VenvLockedError: when blocking is False and another process holds the lock
+
+    Returns:
+        file descriptor to pass to release (None without fcntl) and
+        whether another process held the lock first
+    """
+    if fcntl is None:
+        return None, False
+    lock_path = find_lock(path, locks_path=locks_path)
+    lock_path.parent.mkdir(parents=True, exist_ok=True)
+    operation = fcntl.LOCK_SH if shared else fcntl.LOCK_EX
+    waited = False
+    while True:
+        fd = os.open(str(lock_path), os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            try:
+                fcntl.flock(fd, operation | fcntl.LOCK_NB)
+            except BlockingIOError:
+                if not blocking:
+                    raise VenvLockedError(path=path)
+                terminal.echo(f'Waiting for {terminal.yellow(path)} to be released...', verbose=verbose, err=True)
+                fcntl.flock(fd, operation)
+                waited = True
+            # A removal may have discarded the lock file while this process waited on it
+            if _same_file(fd, lock_path):
+                return fd, waited
+        except BaseException:
+            os.close(fd)
+            raise
+        os.close(fd)
+
+
+def discard(path: Path, locks_path: Optional[Path] = None):
+    """Deletes the lock file of a removed virtual environment
+
+    The caller must hold the exclusive lock.  Processes waiting on the
+    deleted file notice once they get it and lock a new file instead.
+
+    Args:
+        path: path to virtual environment
+        locks_path: path to lock files [default: ~/.vsh/locks]
+    """
+    if fcntl is None:
+        return
+    with contextlib.suppress(FileNotFoundError):
+        find_lock(path, locks_path=locks_path).unlink()
+
+
+def find_lock(path: Path, locks_path: Optional[Path] = None) -> Path:
+    """Finds the lock file of a virtual environment
+
+    Lock files live outside of the environment so they survive its
+    removal and re-creation.
+
+    Args:
+        path: path to virtual environment
+        locks_path: path to lock files [default: ~/.vsh/locks]
+
+    Returns:
+        path to lock file
+    """
+    digest = hashlib.sha1(str(path).encode('utf-8')).hexdigest()[:12]
+    return Path(locks_path or LOCKS_PATH) / f'{path.name}-{digest}.lock'
+
+
+@contextlib.contextmanager
+def held(path: Path, shared: bool = False, locks_path: Optional[Path] = None) -> Iterator[None]:
+    """Marks a lock on a virtual environment as held by the current thread
+
+    Nested locked calls in this thread then reuse the lock instead of
+    waiting on it.  This lets executor threads work under a lock which
+    an event loop took with acquire.
+
+    Args:
+        path: path to virtual environment
+        shared: the lock is shared instead of exclusive [default: False]
+        locks_path: path to lock files [default: ~/.vsh/locks]
+
+    Raises:
+        VenvLockedError: when an exclusive lock is requested while this thread holds a shared one
+    """
+    lock_path = find_lock(path, locks_path=locks_path)
+    paths = _held.__dict__.setdefault('paths', {})
+    count, held_shared = paths.get(lock_path, (0, shared))
+    # flock would wait forever on the shared lock this thread already holds
+    if held_shared and not shared:
+        raise VenvLockedError(path=path)
+    paths[lock_path] = (count + 1, held_shared)
+    try:
+        yield
+    finally:
+        count, held_shared = paths[lock_path]
+        if count > 1:
+            paths[lock_path] = (count - 1, held_shared)
+        else:
+            del paths[lock_path]
+
+
+@contextlib.contextmanager
+def locked(path: Path, shared: bool = False, blocking: bool = True, locks_path: Optional[Path] = None, verbose: int = 0) -> Iterator[bool]:
+    """Holds an advisory lock on a virtual environment
+
+    Writers (create, upgrade, remove) take exclusive locks while readers
+    (enter) take shared locks.  Locks are no-ops where fcntl is missing.
+    Nested locks in the same thread reuse the outer one; a shared lock
+    cannot be upgraded to an exclusive one.
+
+    Args:
+        path: path to virtual environment
+        shared: take a shared instead of an exclusive lock [default: False]
+        blocking: wait for other processes to release the lock [default: True]
+        locks_path: path to lock files [default: ~/.vsh/locks]
+        verbose: report waiting for another process on stderr [default: 0]
+
+    Raises:
+        VenvLockedError: when blocking is False and another process holds the lock,
+            or when an exclusive lock is requested while this thread holds a shared one
+
+    Yields:
+        True when another process held the lock first, so callers can
+        reuse its work instead of repeating it
+    """
+    if find_lock(path, locks_path=locks_path) in _held.__dict__.get('paths', {}):
+        with held(path, shared=shared, locks_path=locks_path):
+            yield False
+        return
+    fd, waited = acquire(path, shared=shared, blocking=blocking, locks_path=locks_path, verbose=verbose)
+    try:
+        with held(path, shared=shared, locks_path=locks_path):
+            yield waited
+    finally:
+        release(fd)
+
+
+def release(fd: Optional[int]):
+    """Releases a lock taken with acquire
+
+    Args:
+        fd: file descriptor returned by acquire
+    """
+    if fd is not None:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+        os.close(fd)
+
+
+def _same_file(fd: int, path: Path) -> bool:
+    try:
+        stat = os.stat(str(path))
+    except FileNotFoundError:
+        return False
+    opened = os.fstat(fd)
+    return (opened.st_dev, opened.st_ino) == (stat.st_dev, stat.st_ino)
@@ -0,0 +1,148 @@
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from . import tiering
+from .packages import find_site_packages, list_packages, parse_dist_info_name
+from .requirements import canonicalize_name, parse_requirement
+from .vsh_config import HOME
+
+__all__ = ('INDEX_PATH', 'PackageIndex', 'load', 'refresh')
+
+# Stored next to the venv configuration files
+INDEX_PATH = HOME / '.vsh' / 'index.json'
+
+
+@dataclass
+class PackageIndex:
+    """Inverted index of installed distributions across virtual environments
+
+    Attributes:
+        venvs: venv path to its site-packages, modification time, distributions
+            and whether it is archived
+        packages: canonical distribution name to version to venv paths
+    """
+    venvs: Dict[str, Dict] = field(default_factory=dict)
+    packages: Dict[str, Dict[str, List[str]]] = field(default_factory=dict)
+
+    def which_has(self, requirement: str) -> Dict[Path, Tuple[str, str]]:
+        """Finds the virtual environments containing a distribution
+
+        Args:
+            requirement: PEP 508 requirement (e.g. requests<2.20)
+
+        Returns:
+            venv path to (distribution name, version) for every match
+        """
+        parsed = parse_requirement(requirement)
+        found = {}
+        for version, venv_paths in self.packages.get(parsed.key, {}).items():
+            if not parsed.contains(version):
+                continue
+            for venv_path in venv_paths:
+                name = self.venvs[venv_path]['packages'][parsed.key][0]
+                found[Path(venv_path)] = (name, version)
+        return found
+
+    def dump(self, index_path: Path):
+        index_path.parent.mkdir(parents=True, exist_ok=True)
+        staged_path = index_path.with_suffix(f'.{os.getpid()}.tmp')
+        staged_path.write_text(json.dumps({'venvs': self.venvs, 'packages': self.packages}), encoding='utf-8')
+        os.replace(str(staged_path), str(index_path))
+
+    def rebuild(self):
+        """Rebuilds the inverted index from the indexed venvs"""
+        packages: Dict[str, Dict[str, List[str]]] = {}
+        for venv_path, entry in sorted(self.venvs.items()):
+            for key, (name, version) in entry['packages'].items():
+                packages.setdefault(key, {}).setdefault(version, []).append(venv_path)
+        self.packages = packages
+
+
+def load(index_path: Optional[Path] = None) -> PackageIndex:
+    """Loads the package index
+
+    Args:
+        index_path: path to the index [default: ~/.vsh/index.json]
+
+    Returns:
+        package index; empty when missing or unreadable
+    """
+    index_path = Path(index_path or INDEX_PATH)
+    try:
+        data = json.loads(index_path.read_text(encoding='utf-8'))
+        return PackageIndex(venvs=data['venvs'], packages=data['packages'])
+    except (OSError, ValueError, KeyError):
+        return PackageIndex()
+
+
+def refresh(venv_paths: Iterable[Path], index_path: Optional[Path] = None, workers: Optional[int] = None) -> PackageIndex:
+    """Updates the package index for a set of virtual environments
+
+    Only venvs whose site-packages modification time changed since
+    they were last indexed are parsed again, in a thread pool.  Archived
+    venvs have no site-packages; they keep the entry indexed before they
+    were archived, or are listed from their archive once.  Venvs which
+    are no longer in the set are dropped.
+
+    Args:
+        venv_paths: paths to every known virtual environment
+        index_path: path to the index [default: ~/.vsh/index.json]
+        workers: number of threads [default: ThreadPoolExecutor's default]
+
+    Returns:
+        package index
+    """
+    index_path = Path(index_path or INDEX_PATH)
+    index = load(index_path)
+    venvs = {}
+    stale = []
+    archived = []
+    changed = False
+    for venv_path in venv_paths:
+        entry = index.venvs.get(str(venv_path))
+        if tiering.is_archived(venv_path):
+            if entry:
+                changed = changed or not entry.get('archived')
+                venvs[str(venv_path)] = dict(entry, archived=True)
+            else:
+                archived.append(venv_path)
+            continue
+        site_packages = Path(entry['site_packages']) if entry and entry['site_packages'] else find_site_packages(venv_path)
+        mtime = _get_mtime(site_packages)
+        if entry and mtime and entry['mtime'] == mtime and not entry.get('archived'):
+            venvs[str(venv_path)] = entry
+        elif mtime:
+            stale.append((venv_path, site_packages, mtime))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for (venv_path, site_packages, mtime), distributions in zip(stale, executor.map(list_packages, (s[1] for s in stale))):
+            venvs[str(venv_path)] = {
+                'site_packages': str(site_packages),
+                'mtime': mtime,
+                'packages': {canonicalize_name(d.name): (d.name, d.version) for d in distributions},
+                'archived': False,
+                }
+        for venv_path, dist_infos in zip(archived, executor.map(tiering.archived_dist_infos, archived)):
+            names = [parse_dist_info_name(dist_info) for dist_info in dist_infos]
+            venvs[str(venv_path)] = {
+                'site_packages': '',
+                'mtime': 0,
+                'packages': {canonicalize_name(name): (name, version) for name, version in names},
+                'archived': True,
+                }
+    changed = changed or stale or archived or set(venvs) != set(index.venvs)
+    index.venvs = venvs
+    if changed:
+        index.rebuild()
+        index.dump(index_path)
+    return index
+
+
+def _get_mtime(path: Optional[Path]) -> int:
+    try:
+        return path.stat().st_mtime_ns if path else 0
+    except OSError:
+        return 0
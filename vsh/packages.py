@@ -0,0 +1,440 @@
+import base64
+import csv
+import hashlib
+import json
+import os
+import re
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from .requirements import Requirement, canonicalize_name, evaluate_marker, parse_requirement
+
+__all__ = (
+    'DependencyProblem', 'Distribution', 'EnvironmentDiff', 'RecordEntry', 'check_distributions', 'diff_distributions',
+    'find_bin_path', 'find_distributions', 'find_site_packages', 'format_freeze', 'list_packages', 'parse_dist_info_name',
+    'read_distribution', 'read_metadata', 'read_pyvenv_cfg', 'read_record', 'verify_record',
+    )
+
+# Distributions which pip freeze leaves out of its output
+FREEZE_EXCLUDES = {'distribute', 'pip', 'setuptools', 'wheel'}
+
+
+@dataclass
+class DependencyProblem:
+    """A requirement of an installed distribution which is not met
+
+    Attributes:
+        name: name of the distribution with the requirement
+        version: version of the distribution with the requirement
+        requirement: the unmet requirement
+        installed: installed version of the required distribution; None when missing
+    """
+    name: str
+    version: str
+    requirement: Requirement
+    installed: Optional[str] = None
+
+    def __str__(self):
+        if self.installed is None:
+            return f'{self.name} {self.version} requires {self.requirement.name}, which is not installed.'
+        return f'{self.name} {self.version} has requirement {self.requirement}, but you have {self.requirement.name} {self.installed}.'
+
+
+@dataclass
+class Distribution:
+    """An installed distribution
+
+    Attributes:
+        name: name of the distribution
+        version: version of the distribution
+        path: path to the *.dist-info folder
+        requires: Requires-Dist entries of the distribution
+        requires_python: Requires-Python entry of the distribution
+        direct_url: contents of direct_url.json when installed from a url
+    """
+    name: str
+    version: str
+    path: Path
+    requires: List[str] = field(default_factory=list)
+    requires_python: Optional[str] = None
+    direct_url: Optional[Dict] = None
+
+    @property
+    def json(self) -> Dict:
+        json = asdict(self)
+        json['path'] = str(self.path)
+        return json
+
+    @property
+    def requirement(self) -> str:
+        """pip freeze compatible requirement for the distribution"""
+        direct_url = self.direct_url or {}
+        url = direct_url.get('url')
+        if not url:
+            return f'{self.name}=={self.version}'
+        if direct_url.get('dir_info', {}).get('editable'):
+            return f'-e {url}'
+        vcs_info = direct_url.get('vcs_info')
+        if vcs_info:
+            return f'{self.name} @ {vcs_info["vcs"]}+{url}@{vcs_info["commit_id"]}'
+        return f'{self.name} @ {url}'
+
+
+@dataclass
+class EnvironmentDiff:
+    """Differences between the distributions installed in two environments
+
+    Attributes:
+        added: name to version of distributions only found in the second environment
+        removed: name to version of distributions only found in the first environment
+        changed: name to (first version, second version) of distributions with different versions
+        rebuilt: names of distributions with the same version, but different RECORD hashes
+        modified: name to files whose contents no longer match their RECORD hash
+    """
+    added: Dict[str, str] = field(default_factory=dict)
+    removed: Dict[str, str] = field(default_factory=dict)
+    changed: Dict[str, Tuple[str, str]] = field(default_factory=dict)
+    rebuilt: List[str] = field(default_factory=list)
+    modified: Dict[str, List[Path]] = field(default_factory=dict)
+
+    def __bool__(self):
+        return any([self.added, self.removed, self.changed, self.rebuilt, self.modified])
+
+
+class RecordEntry(NamedTuple):
+    """A single row of a dist-info RECORD file
+
+    Attributes:
+        path: path of installed file relative to site-packages
+        hash: hash of the file as <algorithm>=<urlsafe b64 digest>
+        size: size of the file in bytes
+    """
+    path: str
+    hash: str
+    size: Optional[int]
+
+
+def check_distributions(distributions: Iterable[Distribution], environment: Dict[str, str]) -> List[DependencyProblem]:
+    """Finds missing and conflicting requirements among installed distributions
+
+    Requires-Dist entries are evaluated against the marker environment.
+    Requirements behind an extra only apply when another installed
+    distribution asks for that extra.
+
+    Args:
+        distributions: installed distributions
+        environment: marker variable values of the environment's interpreter
+
+    Returns:
+        unmet requirements
+    """
+    by_key = {canonicalize_name(d.name): d for d in distributions}
+    requirements: Dict[str, List[Requirement]] = {}
+    for key, distribution in by_key.items():
+        parsed = requirements.setdefault(key, [])
+        for line in distribution.requires:
+            try:
+                parsed.append(parse_requirement(line))
+            except ValueError:
+                continue
+    extras = {key: {''} for key in by_key}
+    # Requested extras can enable requirements which request more extras
+    changed = True
+    while changed:
+        changed = False
+        for key, parsed in requirements.items():
+            for requirement in parsed:
+                if requirement.key not in by_key or not _requirement_applies(requirement, environment, extras[key]):
+                    continue
+                requested = {canonicalize_name(extra) for extra in requirement.extras} - extras[requirement.key]
+                if requested:
+                    extras[requirement.key] |= requested
+                    changed = True
+    problems = []
+    for key, parsed in requirements.items():
+        distribution = by_key[key]
+        for requirement in parsed:
+            if not _requirement_applies(requirement, environment, extras[key]):
+                continue
+            required = by_key.get(requirement.key)
+            if not required:
+                problems.append(DependencyProblem(name=distribution.name, version=distribution.version, requirement=requirement))
+            elif not requirement.contains(required.version):
+                problems.append(DependencyProblem(name=distribution.name, version=distribution.version, requirement=requirement, installed=required.version))
+    return problems
+
+
+def diff_distributions(first: Iterable[Distribution], second: Iterable[Distribution], files: bool = False, workers: Optional[int] = None) -> EnvironmentDiff:
+    """Compares the distributions installed in two environments
+
+    Args:
+        first: distributions of the first environment
+        second: distributions of the second environment
+        files: also compare RECORD hashes and verify installed files [default: False]
+        workers: number of threads used to verify files [default: ThreadPoolExecutor's default]
+
+    Returns:
+        differences between the environments
+    """
+    first_by_key = {canonicalize_name(d.name): d for d in first}
+    second_by_key = {canonicalize_name(d.name): d for d in second}
+    diff = EnvironmentDiff()
+    for key in sorted(set(first_by_key) | set(second_by_key)):
+        a, b = first_by_key.get(key), second_by_key.get(key)
+        if a and not b:
+            diff.removed[a.name] = a.version
+        elif b and not a:
+            diff.added[b.name] = b.version
+        elif a and b and a.version != b.version:
+            diff.changed[a.name] = (a.version, b.version)
+        elif a and b and files:
+            if {e.path: e.hash for e in read_record(a.path)} != {e.path: e.hash for e in read_record(b.path)}:
+                diff.rebuilt.append(a.name)
+    if files:
+        distributions = [*first_by_key.values(), *second_by_key.values()]
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for distribution, modified in zip(distributions, executor.map(lambda d: verify_record(d.path), distributions)):
+                if modified:
+                    diff.modified.setdefault(distribution.name, []).extend(modified)
+    return diff
+
+
+def find_bin_path(venv_path: Path) -> Path:
+    """Finds the folder holding the interpreter and scripts of a virtual environment
+
+    Args:
+        venv_path: path to virtual environment
+
+    Returns:
+        path to Scripts on windows, else bin
+    """
+    return Path(venv_path) / ('Scripts' if sys.platform == 'win32' else 'bin')
+
+
+def find_distributions(site_packages: Path) -> Iterable[Path]:
+    """Finds the installed distributions within site-packages
+
+    Args:
+        site_packages: path to site-packages
+
+    Yields:
+        paths to *.dist-info folders
+    """
+    try:
+        entries = list(os.scandir(str(site_packages)))
+    except OSError:
+        return
+    for entry in entries:
+        if entry.name.endswith('.dist-info') and entry.is_dir():
+            yield Path(entry.path)
+
+
+def find_site_packages(venv_path: Path) -> Optional[Path]:
+    """Finds the site-packages folder of a virtual environment
+
+    Args:
+        venv_path: path to virtual environment
+
+    Returns:
+        path to site-packages if found
+    """
+    pattern = os.path.join('Lib', 'site-packages') if sys.platform == 'win32' else os.path.join('lib', '*', 'site-packages')
+    found = None
+    for path in venv_path.glob(pattern):
+        # The builder may leave an empty lib/<executable name> next to
+        #  the lib/pythonX.Y that the interpreter actually uses
+        if re.search(r'\d', path.parent.name):
+            return path
+        found = found or path
+    return found
+
+
+def format_freeze(distributions: Iterable[Distribution], output_format: str = 'text', include_all: bool = False) -> str:
+    """Formats distributions like pip freeze
+
+    Args:
+        distributions: installed distributions
+        output_format: either text or json [default: text]
+        include_all: include pip, setuptools, wheel and distribute [default: False]
+
+    Returns:
+        formatted distributions
+    """
+    distributions = [
+        distribution for distribution in distributions
+        if include_all or distribution.name.lower() not in FREEZE_EXCLUDES
+        ]
+    if output_format == 'json':
+        return json.dumps([distribution.json for distribution in distributions], indent=2)
+    return '\n'.join(distribution.requirement for distribution in distributions)
+
+
+def list_packages(site_packages: Path) -> List[Distribution]:
+    """Lists the distributions installed within site-packages
+
+    Only dist-info metadata is read: no interpreter is started and
+    nothing is imported.
+
+    Args:
+        site_packages: path to site-packages
+
+    Returns:
+        installed distributions sorted by name
+    """
+    distributions = [read_distribution(dist_info) for dist_info in find_distributions(site_packages)]
+    return sorted(distributions, key=lambda distribution: distribution.name.lower())
+
+
+def parse_dist_info_name(dist_info: Path) -> Tuple[str, str]:
+    """Splits a dist-info folder name into distribution name and version
+
+    Args:
+        dist_info: path to *.dist-info folder
+
+    Returns:
+        - name: distribution name
+        - version: distribution version
+    """
+    stem = dist_info.name[:-len('.dist-info')]
+    name, _, version = stem.partition('-')
+    return name, version
+
+
+def read_distribution(dist_info: Path) -> Distribution:
+    """Reads the metadata of an installed distribution
+
+    Args:
+        dist_info: path to *.dist-info folder
+
+    Returns:
+        installed distribution
+    """
+    name, version = parse_dist_info_name(dist_info)
+    metadata = read_metadata(dist_info)
+    direct_url = None
+    direct_url_path = dist_info / 'direct_url.json'
+    if direct_url_path.is_file():
+        try:
+            direct_url = json.loads(direct_url_path.read_text(encoding='utf-8'))
+        except ValueError:
+            pass
+    requires_python = metadata.get('requires-python')
+    return Distribution(
+        name=(metadata.get('name') or [name])[0],
+        version=(metadata.get('version') or [version])[0],
+        path=dist_info,
+        requires=metadata.get('requires-dist', []),
+        requires_python=requires_python[0] if requires_python else None,
+        direct_url=direct_url,
+        )
+
+
+def read_metadata(dist_info: Path) -> Dict[str, List[str]]:
+    """Reads the headers of a distribution's METADATA file
+
+    Parsing stops at the first blank line; the long description that
+    follows is never read.
+
+    Args:
+        dist_info: path to *.dist-info folder
+
+    Returns:
+        mapping of lower cased header name to its values
+    """
+    metadata: Dict[str, List[str]] = {}
+    metadata_path = dist_info / 'METADATA'
+    if not metadata_path.is_file():
+        return metadata
+    with metadata_path.open('r', encoding='utf-8', errors='replace') as stream:
+        values = None
+        for line in stream:
+            line = line.rstrip('\r\n')
+            if not line:
+                break
+            if line[0] in ' \t' and values:
+                # Folded header value
+                values[-1] = f'{values[-1]} {line.strip()}'
+                continue
+            key, _, value = line.partition(':')
+            values = metadata.setdefault(key.strip().lower(), [])
+            values.append(value.strip())
+    return metadata
+
+
+def read_pyvenv_cfg(venv_path: Path) -> Dict[str, str]:
+    """Reads the pyvenv.cfg of a virtual environment
+
+    Args:
+        venv_path: path to virtual environment
+
+    Returns:
+        mapping of lower cased key to value; empty when missing
+    """
+    config: Dict[str, str] = {}
+    try:
+        text = (venv_path / 'pyvenv.cfg').read_text(encoding='utf-8')
+    except OSError:
+        return config
+    for line in text.splitlines():
+        key, separator, value = line.partition('=')
+        if separator:
+            config[key.strip().lower()] = value.strip()
+    return config
+
+
+def read_record(dist_info: Path) -> Iterable[RecordEntry]:
+    """Reads the RECORD file of an installed distribution
+
+    Args:
+        dist_info: path to *.dist-info folder
+
+    Yields:
+        entries of the RECORD file
+    """
+    record_path = dist_info / 'RECORD'
+    if not record_path.is_file():
+        return
+    with record_path.open('r', encoding='utf-8', newline='') as stream:
+        for row in csv.reader(stream):
+            if not row:
+                continue
+            path, file_hash, size = (row + ['', ''])[:3]
+            yield RecordEntry(path=path, hash=file_hash, size=int(size) if size.isdigit() else None)
+
+
+def verify_record(dist_info: Path) -> List[Path]:
+    """Finds installed files whose contents do not match their RECORD hash
+
+    Args:
+        dist_info: path to *.dist-info folder
+
+    Returns:
+        paths of files that were modified or removed after installation
+    """
+    site_packages = dist_info.parent
+    modified = []
+    for entry in read_record(dist_info):
+        algorithm, _, expected = entry.hash.partition('=')
+        if not expected:
+            continue
+        path = site_packages / entry.path
+        try:
+            digest = hashlib.new(algorithm, path.read_bytes()).digest()
+        except (OSError, ValueError):
+            modified.append(path)
+            continue
+        if base64.urlsafe_b64encode(digest).rstrip(b'=').decode('ascii') != expected:
+            modified.append(path)
+    return modified
+
+
+def _requirement_applies(requirement: Requirement, environment: Dict[str, str], extras: Iterable[str]) -> bool:
+    if not requirement.marker:
+        return True
+    try:
+        return any(evaluate_marker(requirement.marker, {**environment, 'extra': extra}) for extra in extras)
+    except ValueError:
+        return False
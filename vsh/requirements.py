@@ -0,0 +1,351 @@
+import os
+import platform
+import re
+import sys
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+__all__ = (
+    'Requirement', 'canonicalize_name', 'evaluate_marker', 'marker_environment', 'parse_requirement', 'parse_version',
+    'specifier_contains',
+    )
+
+# PEP 440 version scheme; local versions are accepted but ignored
+VERSION_PATTERN = re.compile(r'''
+    ^\s*v?
+    (?:(?P<epoch>\d+)!)?
+    (?P<release>\d+(?:\.\d+)*)
+    (?:[-_.]?(?P<pre_letter>a|b|c|rc|alpha|beta|pre|preview)[-_.]?(?P<pre_number>\d+)?)?
+    (?:-(?P<post_implicit>\d+)|[-_.]?(?:post|rev|r)[-_.]?(?P<post_number>\d+)?(?P<post_marker>))?
+    (?:[-_.]?(?P<dev_marker>dev)[-_.]?(?P<dev_number>\d+)?)?
+    (?:\+[a-z0-9]+(?:[-_.][a-z0-9]+)*)?
+    \s*$
+    ''', re.VERBOSE | re.IGNORECASE)
+
+PRE_RELEASE_RANKS = {'a': 0, 'alpha': 0, 'b': 1, 'beta': 1, 'c': 2, 'rc': 2, 'pre': 2, 'preview': 2}
+
+REQUIREMENT_PATTERN = re.compile(r'''
+    ^\s*(?P<name>[A-Za-z0-9][A-Za-z0-9._-]*)\s*
+    (?:\[(?P<extras>[^\]]*)\])?\s*
+    \(?(?P<specifiers>[^;()]*)\)?\s*
+    (?:;\s*(?P<marker>.*?))?\s*$
+    ''', re.VERBOSE)
+
+MARKER_TOKEN_PATTERN = re.compile(r'''
+    \s*(?:
+        (?P<string>'[^']*'|"[^"]*")
+        |(?P<operator>===|~=|==|!=|<=|>=|<|>|not\s+in\b|in\b)
+        |(?P<boolean>and\b|or\b)
+        |(?P<paren>[()])
+        |(?P<variable>[a-z_][a-z0-9_.]*)
+    )''', re.VERBOSE)
+
+# Marker variables which are compared as versions rather than strings
+MARKER_VERSION_VARIABLES = {'python_version', 'python_full_version', 'implementation_version', 'platform_release'}
+
+SPECIFIER_PATTERN = re.compile(r'^\s*(?P<operator>~=|===|==|!=|<=|>=|<|>)\s*(?P<version>[^\s]+)\s*$')
+
+VersionKey = Tuple
+
+
+@dataclass
+class Requirement:
+    """A PEP 508 requirement
+
+    Attributes:
+        name: name of the distribution
+        extras: extras requested for the distribution
+        specifiers: (operator, version) pairs which all must match
+        marker: environment marker which must hold for the requirement to apply
+    """
+    name: str
+    extras: List[str] = field(default_factory=list)
+    specifiers: List[Tuple[str, str]] = field(default_factory=list)
+    marker: Optional[str] = None
+
+    @property
+    def key(self) -> str:
+        """Canonical name of the distribution"""
+        return canonicalize_name(self.name)
+
+    def contains(self, version: str) -> bool:
+        """Checks if a version satisfies every specifier
+
+        Args:
+            version: version of the distribution
+
+        Returns:
+            True when the version is allowed by the requirement
+        """
+        return all(specifier_contains(operator, spec_version, version) for operator, spec_version in self.specifiers)
+
+    def __str__(self):
+        extras = f'[{",".join(self.extras)}]' if self.extras else ''
+        specifiers = ','.join(f'{operator}{version}' for operator, version in self.specifiers)
+        marker = f'; {self.marker}' if self.marker else ''
+        return f'{self.name}{extras}{specifiers}{marker}'
+
+
+def canonicalize_name(name: str) -> str:
+    """Normalizes a distribution name as described by PEP 503
+
+    Args:
+        name: name of the distribution
+
+    Returns:
+        normalized name
+    """
+    return re.sub(r'[-_.]+', '-', name).lower()
+
+
+def evaluate_marker(marker: str, environment: Dict[str, str]) -> bool:
+    """Evaluates a PEP 508 environment marker
+
+    Args:
+        marker: environment marker (e.g. python_version < "3.8" and extra == "socks")
+        environment: marker variable values (see marker_environment)
+
+    Raises:
+        ValueError: when the marker cannot be parsed
+
+    Returns:
+        True when the marker holds for the environment
+    """
+    tokens = _tokenize_marker(marker)
+    position, result = _evaluate_or(tokens, 0, environment)
+    if position != len(tokens):
+        raise ValueError(f'Invalid marker: {marker}')
+    return result
+
+
+def marker_environment(python_version: Optional[str] = None, implementation_name: Optional[str] = None) -> Dict[str, str]:
+    """Builds the marker variables for an interpreter
+
+    Platform variables are taken from the running system; only the
+    interpreter details may be overridden.
+
+    Args:
+        python_version: full version of the interpreter [default: running interpreter]
+        implementation_name: name of the interpreter (e.g. cpython) [default: running interpreter]
+
+    Returns:
+        marker variable values
+    """
+    python_full_version = python_version or platform.python_version()
+    implementation_name = implementation_name or sys.implementation.name
+    return {
+        'extra': '',
+        'implementation_name': implementation_name,
+        'implementation_version': python_full_version,
+        'os_name': os.name,
+        'platform_machine': platform.machine(),
+        'platform_python_implementation': 'PyPy' if implementation_name == 'pypy' else 'CPython',
+        'platform_release': platform.release(),
+        'platform_system': platform.system(),
+        'platform_version': platform.version(),
+        'python_full_version': python_full_version,
+        'python_version': '.'.join(python_full_version.split('.')[:2]),
+        'sys_platform': sys.platform,
+        }
+
+
+def parse_requirement(text: str) -> Requirement:
+    """Parses a PEP 508 requirement
+
+    Url requirements (name @ url) are parsed without their url.
+
+    Args:
+        text: requirement (e.g. requests[socks]>=2,<3; python_version > "3.6")
+
+    Raises:
+        ValueError: when the requirement cannot be parsed
+
+    Returns:
+        requirement
+    """
+    text = text.split(' #', 1)[0]
+    name_part, at, url_part = text.partition(' @ ')
+    if at:
+        _, semicolon, marker = url_part.partition(';')
+        text = f'{name_part};{marker}' if semicolon else name_part
+    match = REQUIREMENT_PATTERN.match(text)
+    if not match:
+        raise ValueError(f'Invalid requirement: {text}')
+    specifiers = []
+    for specifier in (match.group('specifiers') or '').split(','):
+        if not specifier.strip():
+            continue
+        specifier_match = SPECIFIER_PATTERN.match(specifier)
+        if not specifier_match:
+            raise ValueError(f'Invalid specifier "{specifier}" in requirement: {text}')
+        specifiers.append((specifier_match.group('operator'), specifier_match.group('version')))
+    return Requirement(
+        name=match.group('name'),
+        extras=[extra.strip() for extra in (match.group('extras') or '').split(',') if extra.strip()],
+        specifiers=specifiers,
+        marker=match.group('marker') or None,
+        )
+
+
+def parse_version(version: str) -> VersionKey:
+    """Builds a sortable key from a PEP 440 version
+
+    Args:
+        version: version string
+
+    Returns:
+        key that orders versions the way pip does; versions which cannot
+        be parsed sort before every valid version
+    """
+    match = VERSION_PATTERN.match(version)
+    if not match:
+        return (-1, (), (-1,), (-1,), (1,))
+    epoch = int(match.group('epoch') or 0)
+    release = tuple(int(part) for part in match.group('release').split('.'))
+    # Trailing zeros do not change a release: 1.0 == 1.0.0
+    while len(release) > 1 and release[-1] == 0:
+        release = release[:-1]
+    pre_letter = match.group('pre_letter')
+    has_post = match.group('post_implicit') is not None or match.group('post_marker') is not None
+    has_dev = match.group('dev_marker') is not None
+    if pre_letter:
+        pre: Tuple = (0, PRE_RELEASE_RANKS[pre_letter.lower()], int(match.group('pre_number') or 0))
+    elif has_dev and not has_post:
+        # 1.0.dev0 sorts before 1.0a0
+        pre = (-1,)
+    else:
+        pre = (1,)
+    post = (int(match.group('post_implicit') or match.group('post_number') or 0),) if has_post else (-1,)
+    dev = (0, int(match.group('dev_number') or 0)) if has_dev else (1,)
+    return (epoch, release, pre, post, dev)
+
+
+def specifier_contains(operator: str, spec_version: str, version: str) -> bool:
+    """Checks if a version satisfies a single specifier
+
+    Args:
+        operator: comparison operator (e.g. ==, >=, ~=)
+        spec_version: version of the specifier (may end with .* for == and !=)
+        version: version to check
+
+    Returns:
+        True when the version satisfies the specifier
+    """
+    if operator == '===':
+        return version.strip().lower() == spec_version.strip().lower()
+    if operator in ('==', '!=') and spec_version.endswith('.*'):
+        prefix = _release(spec_version[:-2])
+        matched = _release(version, length=len(prefix))[:len(prefix)] == prefix
+        return matched if operator == '==' else not matched
+    key = parse_version(version)
+    spec_key = parse_version(spec_version)
+    if operator == '==':
+        return key == spec_key
+    if operator == '!=':
+        return key != spec_key
+    if operator == '<':
+        # PEP 440: <V excludes pre-releases of V unless V is one itself, so it means <V.dev0
+        if not _is_prerelease(spec_key):
+            spec_key = parse_version(f'{spec_version.partition("+")[0]}.dev0')
+        return key < spec_key
+    if operator == '<=':
+        return key <= spec_key
+    if operator == '>':
+        # PEP 440: >V excludes post-releases of V unless V is a post or dev release itself
+        if spec_key[3] != (-1,) or spec_key[4] != (1,):
+            return key > spec_key
+        return key > spec_key and key[:3] != spec_key[:3]
+    if operator == '>=':
+        return key >= spec_key
+    if operator == '~=':
+        # ~=1.4.5 is equivalent to >=1.4.5, ==1.4.*
+        prefix = _release(spec_version)[:-1]
+        return key >= spec_key and key[0] == spec_key[0] and _release(version, length=len(prefix))[:len(prefix)] == prefix
+    raise ValueError(f'Invalid operator: {operator}')
+
+
+def _tokenize_marker(marker: str) -> List[Tuple[str, str]]:
+    tokens = []
+    position = 0
+    marker = marker.strip()
+    while position < len(marker):
+        match = MARKER_TOKEN_PATTERN.match(marker, position)
+        if not match or match.end() == position:
+            raise ValueError(f'Invalid marker: {marker}')
+        kind = match.lastgroup or ''
+        value = match.group(kind)
+        tokens.append((kind, value[1:-1] if kind == 'string' else value))
+        position = match.end()
+    return tokens
+
+
+def _is_prerelease(key: VersionKey) -> bool:
+    # Developmental releases count as pre-releases
+    return key[2] != (1,) or key[4] != (1,)
+
+
+def _release(version: str, length: int = 0) -> Tuple[int, ...]:
+    match = VERSION_PATTERN.match(version)
+    if not match:
+        return ()
+    release = tuple(int(part) for part in match.group('release').split('.'))
+    # Missing components compare as zeros: 2 matches ==2.0.*
+    return release + (0,) * (length - len(release))
+
+
+def _compare_marker(lhs: Tuple[str, str], operator: str, rhs: Tuple[str, str], environment: Dict[str, str]) -> bool:
+    values = []
+    version_comparison = False
+    for kind, value in (lhs, rhs):
+        if kind == 'variable':
+            if value not in environment:
+                raise ValueError(f'Unknown marker variable: {value}')
+            version_comparison = version_comparison or value in MARKER_VERSION_VARIABLES
+            value = environment[value]
+        values.append(value)
+    left, right = values
+    if lhs == ('variable', 'extra') or rhs == ('variable', 'extra'):
+        left, right = canonicalize_name(left), canonicalize_name(right)
+    operator = ' '.join(operator.split())
+    if operator == 'in':
+        return left in right
+    if operator == 'not in':
+        return left not in right
+    if version_comparison and VERSION_PATTERN.match(left) and VERSION_PATTERN.match(right.rstrip('.*')):
+        return specifier_contains(operator, right, left)
+    if operator == '==':
+        return left == right
+    if operator == '!=':
+        return left != right
+    # Ordering is undefined for strings, so never match
+    return False
+
+
+def _evaluate_and(tokens: List[Tuple[str, str]], position: int, environment: Dict[str, str]) -> Tuple[int, bool]:
+    position, result = _evaluate_atom(tokens, position, environment)
+    while position < len(tokens) and tokens[position] == ('boolean', 'and'):
+        position, other = _evaluate_atom(tokens, position + 1, environment)
+        result = result and other
+    return position, result
+
+
+def _evaluate_atom(tokens: List[Tuple[str, str]], position: int, environment: Dict[str, str]) -> Tuple[int, bool]:
+    if position < len(tokens) and tokens[position] == ('paren', '('):
+        position, result = _evaluate_or(tokens, position + 1, environment)
+        if position >= len(tokens) or tokens[position] != ('paren', ')'):
+            raise ValueError('Unbalanced parenthesis in marker')
+        return position + 1, result
+    if position + 3 > len(tokens):
+        raise ValueError('Incomplete marker')
+    lhs, (kind, operator), rhs = tokens[position:position + 3]
+    if kind != 'operator' or lhs[0] not in ('string', 'variable') or rhs[0] not in ('string', 'variable'):
+        raise ValueError('Invalid marker comparison')
+    return position + 3, _compare_marker(lhs, operator, rhs, environment)
+
+
+def _evaluate_or(tokens: List[Tuple[str, str]], position: int, environment: Dict[str, str]) -> Tuple[int, bool]:
+    position, result = _evaluate_and(tokens, position, environment)
+    while position < len(tokens) and tokens[position] == ('boolean', 'or'):
+        position, other = _evaluate_and(tokens, position + 1, environment)
+        result = result or other
+    return position, result
@@ -0,0 +1,130 @@
+import json
+import sys
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import List, Optional
+
+from . import history
+
+try:
+    import resource
+except ImportError:  # windows
+    resource = None
+
+__all__ = ('CommandUsage', 'append', 'format_usage', 'measure', 'snapshot')
+
+# ru_maxrss is in kilobytes except on macOS, where it is in bytes
+MAXRSS_UNIT = 1 if sys.platform == 'darwin' else 1024
+
+
+@dataclass
+class CommandUsage:
+    """Resources used by a command run in a virtual environment
+
+    CPU and block counts are read from RUSAGE_CHILDREN before and after
+    the command, so children vsh waited on earlier (e.g. git) are not
+    included.  Max RSS cannot be subtracted; it is the largest of any
+    child vsh has waited on, which is almost always the command.
+
+    Attributes:
+        path: path to virtual environment
+        command: arguments spawned
+        returncode: exit status of the command
+        timestamp: time the command started
+        wall: seconds the command ran
+        user: seconds of user CPU used by the command
+        system: seconds of system CPU used by the command
+        max_rss: largest resident set size in bytes
+        blocks_in: blocks read from disk
+        blocks_out: blocks written to disk
+        overhead: seconds vsh spent in enter before spawning the command
+        overhead_cpu: seconds of CPU vsh used over the same interval
+
+    """
+    path: str
+    command: List[str]
+    returncode: int
+    timestamp: float
+    wall: float
+    user: Optional[float] = None
+    system: Optional[float] = None
+    max_rss: Optional[int] = None
+    blocks_in: Optional[int] = None
+    blocks_out: Optional[int] = None
+    overhead: float = 0.0
+    overhead_cpu: float = 0.0
+
+    @property
+    def json(self) -> str:
+        return json.dumps(asdict(self), sort_keys=True)
+
+
+def append(usage: CommandUsage, metrics_path: Path) -> Path:
+    """Appends resource usage to a JSON lines file (see history.append_line)
+
+    Args:
+        usage: resource usage of a command
+        metrics_path: path to JSON lines file
+
+    Returns:
+        path to JSON lines file
+    """
+    return history.append_line(metrics_path, usage.json)
+
+
+def format_usage(usage: CommandUsage) -> str:
+    """Formats resource usage on a single line
+
+    Args:
+        usage: resource usage of a command
+
+    Returns:
+        readable summary
+    """
+    fields = [f'wall {usage.wall:.3f}s']
+    if usage.user is not None:
+        fields.append(f'user {usage.user:.3f}s')
+        fields.append(f'sys {usage.system:.3f}s')
+        fields.append(f'max rss {usage.max_rss / 2 ** 20:.1f}M')
+        fields.append(f'blocks in {usage.blocks_in} out {usage.blocks_out}')
+    fields.append(f'vsh overhead {usage.overhead:.3f}s ({usage.overhead_cpu:.3f}s CPU)')
+    return ', '.join(fields)
+
+
+def measure(before, path: Path, command: List[str], returncode: int, timestamp: float, wall: float, overhead: float = 0.0, overhead_cpu: float = 0.0) -> CommandUsage:
+    """Measures the resources used by a command which finished
+
+    Args:
+        before: snapshot taken just before the command was spawned
+        path: path to virtual environment
+        command: arguments spawned
+        returncode: exit status of the command
+        timestamp: time the command started
+        wall: seconds the command ran
+        overhead: seconds vsh spent before spawning the command
+        overhead_cpu: seconds of CPU vsh used over the same interval (see time.process_time)
+
+    Returns:
+        resource usage of the command
+    """
+    usage = CommandUsage(path=str(path), command=list(command), returncode=returncode, timestamp=timestamp, wall=wall, overhead=overhead, overhead_cpu=overhead_cpu)
+    after = snapshot()
+    if before is None or after is None:
+        return usage
+    usage.user = after.ru_utime - before.ru_utime
+    usage.system = after.ru_stime - before.ru_stime
+    usage.max_rss = after.ru_maxrss * MAXRSS_UNIT
+    usage.blocks_in = after.ru_inblock - before.ru_inblock
+    usage.blocks_out = after.ru_oublock - before.ru_oublock
+    return usage
+
+
+def snapshot():
+    """Reads resource usage of waited-on children
+
+    Returns:
+        RUSAGE_CHILDREN or None without the resource module
+    """
+    if resource is None:
+        return None
+    return resource.getrusage(resource.RUSAGE_CHILDREN)
@@ -0,0 +1,106 @@
+import os
+import shutil
+import subprocess
+import sys
+from pathlib import Path
+from typing import Optional
+
+from . import packages
+from .vsh_config import HOME
+
+__all__ = ('PTH_NAME', 'SHARED_PIP_PATH', 'SCRIPT_MARKER', 'ensure', 'interpreter_version', 'link', 'upgrade')
+
+# One virtual environment holding pip and setuptools per python version
+SHARED_PIP_PATH = HOME / '.vsh' / 'shared-pip'
+
+# Name of the .pth file which adds the shared site-packages to a virtual environment
+PTH_NAME = '_vsh_shared_pip.pth'
+
+# Identifies pip scripts which run the shared pip
+SCRIPT_MARKER = '# vsh: shared pip'
+
+SCRIPT = '''\
+#!{executable}
+{marker}
+import sys
+
+from pip._internal.cli.main import main
+
+if __name__ == '__main__':
+    sys.exit(main())
+'''
+
+
+def ensure(executable: Path, version: str, shared_path: Optional[Path] = None) -> Path:
+    """Creates the shared pip installation for a python version when missing
+
+    Args:
+        executable: base python interpreter used to create the installation
+        version: major.minor version of the interpreter
+        shared_path: path to shared pip installations [default: ~/.vsh/shared-pip]
+
+    Returns:
+        path to the shared site-packages
+    """
+    target = Path(shared_path or SHARED_PIP_PATH) / version
+    site_packages = packages.find_site_packages(target) if target.exists() else None
+    if site_packages:
+        return site_packages
+    target.parent.mkdir(parents=True, exist_ok=True)
+    # Build aside and rename so concurrent creations never see a partial copy
+    staging = target.parent / f'.{version}.{os.getpid()}'
+    subprocess.check_output([str(executable), '-Es', '-m', 'venv', str(staging)], stderr=subprocess.STDOUT)
+    try:
+        os.rename(staging, target)
+    except OSError:
+        shutil.rmtree(staging, ignore_errors=True)
+    return packages.find_site_packages(target)
+
+
+def interpreter_version(executable: Path) -> str:
+    """Finds the major.minor version of a python interpreter
+
+    Args:
+        executable: path to python interpreter
+
+    Returns:
+        version (e.g. 3.7)
+    """
+    cmd = [str(executable), '-Esc', 'import sys; print("%d.%d" % sys.version_info[:2])']
+    return subprocess.check_output(cmd).decode().strip()
+
+
+def link(env_dir: Path, version: str, shared_site_packages: Path):
+    """Exposes the shared pip installation inside of a virtual environment
+
+    Args:
+        env_dir: path to virtual environment
+        version: major.minor version of the environment's interpreter
+        shared_site_packages: path to the shared site-packages
+    """
+    if sys.platform == 'win32':
+        bin_path = env_dir / 'Scripts'
+        site_packages = env_dir / 'Lib' / 'site-packages'
+    else:
+        bin_path = env_dir / 'bin'
+        site_packages = env_dir / 'lib' / f'python{version}' / 'site-packages'
+    site_packages.mkdir(parents=True, exist_ok=True)
+    (site_packages / PTH_NAME).write_text(f'{shared_site_packages}\n', encoding='utf-8')
+    script = SCRIPT.format(executable=bin_path / 'python', marker=SCRIPT_MARKER)
+    for name in ('pip', 'pip3', f'pip{version}'):
+        script_path = bin_path / name
+        script_path.write_text(script, encoding='utf-8')
+        script_path.chmod(0o755)
+
+
+def upgrade(version: str, shared_path: Optional[Path] = None):
+    """Upgrades pip and setuptools of a shared pip installation
+
+    Args:
+        version: major.minor version of the installation
+        shared_path: path to shared pip installations [default: ~/.vsh/shared-pip]
+    """
+    target = Path(shared_path or SHARED_PIP_PATH) / version
+    python = packages.find_bin_path(target) / 'python'
+    cmd = [str(python), '-Esm', 'pip', 'install', '--quiet', '--upgrade', 'pip', 'setuptools']
+    subprocess.check_output(cmd, stderr=subprocess.STDOUT)
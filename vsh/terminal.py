@@ -1,3 +1,4 @@
+import sys
 from typing import Any, Optional, Union
 
 from .vendored.colorama import Fore, Style
@@ -28,6 +29,6 @@ def yellow(msg: Any) -> str:
     return msg
 
 
-def echo(message, verbose: Optional[Union[bool, int]] = None, flush: bool = True, end: str = '\n'):
+def echo(message, verbose: Optional[Union[bool, int]] = None, flush: bool = True, end: str = '\n', err: bool = False):
     if verbose or (verbose is None):
-        print(message, flush=flush, end=end)
+        print(message, flush=flush, end=end, file=sys.stderr if err else sys.stdout)
@@ -1,5 +1,9 @@
+import base64
+import hashlib
 import os
+import zipfile
 from pathlib import Path
+from typing import Iterable
 
 
 def scan_tree(path: Path):
@@ -25,6 +29,61 @@ def scan_tree(path: Path):
             yield relative_path
 
 
+def build_wheel(directory: Path, name: str, version: str = '1.0') -> Path:
+    """Writes a pure python wheel with a single module
+
+    Args:
+        directory: folder to write the wheel into
+        name: name of distribution
+        version: version of distribution
+
+    Returns:
+        path to the wheel
+    """
+    dist_info = f'{name}-{version}.dist-info'
+    files = {
+        f'{name}.py': f'VERSION = {version!r}\n',
+        f'{dist_info}/METADATA': f'Metadata-Version: 2.1\nName: {name}\nVersion: {version}\n',
+        f'{dist_info}/WHEEL': 'Wheel-Version: 1.0\nGenerator: vsh-tests\nRoot-Is-Purelib: true\nTag: py3-none-any\n',
+        }
+    record = []
+    for filename, content in files.items():
+        digest = base64.urlsafe_b64encode(hashlib.sha256(content.encode('utf-8')).digest()).rstrip(b'=').decode('ascii')
+        record.append(f'{filename},sha256={digest},{len(content)}')
+    record.append(f'{dist_info}/RECORD,,')
+    files[f'{dist_info}/RECORD'] = '\n'.join(record) + '\n'
+    wheel_path = directory / f'{name}-{version}-py3-none-any.whl'
+    with zipfile.ZipFile(str(wheel_path), 'w') as wheel:
+        for filename, content in files.items():
+            wheel.writestr(filename, content)
+    return wheel_path
+
+
+def install_distribution(site_packages: Path, name: str, version: str = '1.0', requires: Iterable[str] = (), size: int = 0) -> Path:
+    """Writes the dist-info of a distribution with a single module
+
+    Args:
+        site_packages: path to site-packages
+        name: name of distribution
+        version: version of distribution
+        requires: Requires-Dist entries
+        size: size of the distribution's module in bytes
+
+    Returns:
+        path to the dist-info folder
+    """
+    module_path = site_packages / f'{name}.py'
+    module_path.write_text('#' * size)
+    digest = base64.urlsafe_b64encode(hashlib.sha256(module_path.read_bytes()).digest()).rstrip(b'=').decode('ascii')
+    dist_info = site_packages / f'{name}-{version}.dist-info'
+    dist_info.mkdir(parents=True)
+    headers = ['Metadata-Version: 2.1', f'Name: {name}', f'Version: {version}']
+    headers.extend(f'Requires-Dist: {requirement}' for requirement in requires)
+    (dist_info / 'METADATA').write_text('\n'.join(headers) + '\n')
+    (dist_info / 'RECORD').write_text(f'{name}.py,sha256={digest},{size}\n{dist_info.name}/METADATA,,\n{dist_info.name}/RECORD,,\n')
+    return dist_info
+
+
 class EmulateSequence:
 
     def __len__(self):
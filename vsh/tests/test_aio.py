@@ -0,0 +1,109 @@
+import asyncio
+import os
+import sys
+import time
+
+import pytest
+
+
+@pytest.mark.unit
+@pytest.mark.skipif(sys.platform == 'win32', reason='uses a posix shell')
+def test_aio_create_enter_remove(workon_home, monkeypatch):
+    from vsh import aio
+
+    monkeypatch.setenv('SHELL', '/bin/sh')
+    # Keeps the repository's .vshrc out of the entered shell
+    monkeypatch.chdir(workon_home)
+    venv_paths = [workon_home / f'aio-{index}' for index in range(3)]
+
+    async def main():
+        await asyncio.gather(*(aio.create(path, include_pip=False, precompile=False) for path in venv_paths))
+        lines = []
+        return_code = await aio.enter(venv_paths[0], ['echo', '$VIRTUAL_ENV'], on_stdout=lines.append)
+        await asyncio.gather(*(aio.remove(path) for path in venv_paths))
+        return return_code, lines
+
+    return_code, lines = asyncio.run(main())
+    assert return_code == 0
+    assert str(venv_paths[0]) in lines
+    assert not any(path.exists() for path in venv_paths)
+
+
+@pytest.mark.unit
+@pytest.mark.skipif(sys.platform == 'win32', reason='uses a posix shell')
+def test_aio_enter_cancelled(workon_home, monkeypatch):
+    from vsh import aio
+
+    monkeypatch.setenv('SHELL', '/bin/sh')
+    monkeypatch.chdir(workon_home)
+    venv_path = workon_home / 'aio-cancelled'
+    pid_path = workon_home / 'sleep.pid'
+
+    async def main():
+        await aio.create(venv_path, include_pip=False, precompile=False)
+        task = asyncio.ensure_future(aio.enter(venv_path, ['sleep 30 & echo $! >', str(pid_path), '; wait']))
+        while not pid_path.exists() or not pid_path.read_text().strip():
+            await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(main())
+    # The shell's child is killed with it instead of being orphaned
+    pid = int(pid_path.read_text())
+    deadline = time.time() + 5
+    while time.time() < deadline:
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            break
+        time.sleep(0.05)
+    else:
+        pytest.fail(f'process {pid} is still running')
+
+
+@pytest.mark.unit
+def test_aio_create_cancelled(venv_path):
+    from vsh import aio
+
+    async def main():
+        task = asyncio.ensure_future(aio.create(venv_path, include_pip=True))
+        # Cancel while ensurepip is running
+        while not (venv_path / 'pyvenv.cfg').exists():
+            await asyncio.sleep(0.01)
+        await asyncio.sleep(0.2)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(main())
+    assert not venv_path.exists()
+
+
+@pytest.mark.unit
+def test_aio_create_waits_for_setup(venv_path):
+    from vsh import aio, packages
+
+    async def main():
+        first = asyncio.ensure_future(aio.create(venv_path, include_pip=True, precompile=False))
+        while not (venv_path / 'pyvenv.cfg').exists():
+            await asyncio.sleep(0.01)
+        # Waits until the first creator has installed pip
+        await aio.create(venv_path, include_pip=False, precompile=False)
+        assert list(packages.find_site_packages(venv_path).glob('pip-*.dist-info'))
+        await first
+
+    asyncio.run(main())
+
+
+@pytest.mark.unit
+def test_aio_create_skips_uncompilable(venv_path):
+    from vsh import aio, packages
+
+    asyncio.run(aio.create(venv_path, include_pip=False, precompile=False))
+    site_packages = packages.find_site_packages(venv_path)
+    (site_packages / 'bad.py').write_text('print "python 2"\n')
+
+    asyncio.run(aio.create(venv_path, include_pip=False, upgrade=True))
+    assert venv_path.exists()
+    assert not list(site_packages.glob('__pycache__/bad.*.pyc'))
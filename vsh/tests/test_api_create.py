@@ -91,3 +91,125 @@ def test_create(venv_path, test_case):
         actual_path = venv_path / path
         if actual_path.exists():
             actual_path.unlink()
+
+
+@pytest.mark.unit
+@pytest.mark.skipif(sys.platform == 'win32', reason='lazy pip falls back to pip on windows')
+def test_create_lazy_pip(venv_path):
+    import subprocess
+
+    from vsh import api
+    from vsh.builder import PIP_LOCK_NAME, PIP_SHIM, PIP_SHIM_MARKER
+
+    api.create(path=venv_path, lazy_pip=True)
+    pip_path = venv_path / 'bin' / 'pip'
+    assert PIP_SHIM_MARKER in pip_path.read_text()
+    assert 'pip' not in [d.name for d in api.list_packages(venv_path)]
+
+    # Only pip's own output reaches stdout, even while pip is installed
+    output = subprocess.check_output([str(pip_path), '--version'], stderr=subprocess.DEVNULL).decode()
+    assert output.startswith('pip ') and len(output.splitlines()) == 1
+    assert str(venv_path) in output
+    assert PIP_SHIM_MARKER not in pip_path.read_text()
+    assert 'pip' in [d.name for d in api.list_packages(venv_path)]
+
+    # A shim started after pip was installed finds it instead of bootstrapping again
+    shim_path = venv_path / 'bin' / 'pip-shim'
+    shim_path.write_text(PIP_SHIM.format(executable=venv_path / 'bin' / 'python', marker=PIP_SHIM_MARKER, lock_path=str(venv_path / PIP_LOCK_NAME)))
+    shim_path.chmod(0o755)
+    output = subprocess.check_output([str(shim_path), '--version'], stderr=subprocess.STDOUT).decode()
+    assert output.startswith('pip ') and len(output.splitlines()) == 1
+
+
+@pytest.mark.unit
+@pytest.mark.skipif(sys.platform == 'win32', reason='shared pip falls back to pip on windows')
+def test_create_shared_pip(workon_home, tmpdir, monkeypatch):
+    import subprocess
+
+    from vsh import api, shared_pip
+
+    monkeypatch.setattr(shared_pip, 'SHARED_PIP_PATH', Path(str(tmpdir)) / 'shared-pip')
+    first, second = workon_home / 'shared-a', workon_home / 'shared-b'
+    api.create(path=first, shared_pip=True)
+    api.create(path=second, shared_pip=True)
+
+    shared_paths = list((Path(str(tmpdir)) / 'shared-pip').iterdir())
+    assert len(shared_paths) == 1
+    for path in (first, second):
+        assert 'pip' not in [d.name for d in api.list_packages(path)]
+        output = subprocess.check_output([str(path / 'bin' / 'pip'), '--version']).decode()
+        assert str(shared_paths[0]) in output
+
+
+@pytest.mark.unit
+def test_compile_site_packages(venv_path):
+    from vsh import api, packages
+    from vsh.builder import compile_site_packages
+
+    from .common import install_distribution
+
+    api.create(path=venv_path, precompile=False)
+    site_packages = packages.find_site_packages(venv_path)
+    install_distribution(site_packages, 'vshexample')
+    assert not list(site_packages.glob('__pycache__/vshexample.*.pyc'))
+
+    assert compile_site_packages(str(venv_path))
+    assert list(site_packages.glob('__pycache__/vshexample.*.pyc'))
+
+    # Files which do not compile never fail create or upgrade
+    (site_packages / 'bad.py').write_text('print "python 2"\n')
+    assert not compile_site_packages(str(venv_path))
+    assert api.upgrade(venv_path, include_pip=False) == venv_path
+
+
+@pytest.mark.unit
+@pytest.mark.skipif(sys.platform == 'win32', reason='background pip falls back to pip on windows')
+def test_create_background_pip(venv_path):
+    import subprocess
+
+    from vsh import api
+    from vsh.builder import PIP_LOCK_NAME
+
+    api.create(path=venv_path, background_pip=True)
+    assert api.validate_environment(venv_path)
+
+    # pip waits for the background installation instead of racing it
+    output = subprocess.check_output([str(venv_path / 'bin' / 'pip'), '--version'], stderr=subprocess.STDOUT)
+    assert str(venv_path) in output.decode()
+    assert not (venv_path / PIP_LOCK_NAME).exists()
+    assert 'pip' in [d.name for d in api.list_packages(venv_path)]
+
+    # Once installed, pip is never bootstrapped again
+    output = subprocess.check_output([str(venv_path / 'bin' / 'pip'), '--version'], stderr=subprocess.STDOUT).decode()
+    assert output.startswith('pip ') and len(output.splitlines()) == 1
+
+
+@pytest.mark.unit
+@pytest.mark.skipif(sys.platform == 'win32', reason='background pip falls back to pip on windows')
+def test_remove_stops_background_pip(venv_path):
+    import os
+
+    from vsh import api
+    from vsh.builder import PIP_LOCK_NAME
+
+    api.create(path=venv_path, background_pip=True)
+    pid = int((venv_path / PIP_LOCK_NAME).read_text())
+    api.remove(venv_path)
+    assert not venv_path.exists()
+    # The installer, a child of this process, was killed instead of writing into the removed folder
+    _, status = os.waitpid(pid, 0)
+    assert os.WIFSIGNALED(status)
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize('size', [0, 1, 3 * 1024 * 1024 + 7])
+def test_copy_file(tmpdir, size):
+    import os
+
+    from vsh.builder import copy_file
+
+    src, dst = Path(str(tmpdir)) / 'src', Path(str(tmpdir)) / 'dst'
+    src.write_bytes(os.urandom(size))
+    dst.write_bytes(b'previous contents which are longer than nothing')
+    copy_file(str(src), str(dst))
+    assert dst.read_bytes() == src.read_bytes()
@@ -0,0 +1,62 @@
+import sys
+
+import pytest
+
+
+@pytest.mark.unit
+def test_each(workon_home, capsys):
+    from vsh import api, history
+
+    for name in ('each-a', 'each-b', 'other'):
+        api.create(path=workon_home / name, precompile=False)
+    command = [sys.executable, '-c', 'import os, sys; print(os.environ["VIRTUAL_ENV"]); sys.exit(os.environ["VIRTUAL_ENV"].endswith("b"))']
+
+    results = api.each(command, pattern='each-*', jobs=2, path=workon_home)
+    assert results == {workon_home / 'each-a': 0, workon_home / 'each-b': 1}
+    output = capsys.readouterr().out
+    assert f'{workon_home / "each-a"}' in output and 'other' not in output
+    assert {workon_home / 'each-a', workon_home / 'each-b'} <= set(history.last_used())
+
+    results = api.each(command, pattern='each-*', jobs=1, fail_fast=True, path=workon_home)
+    assert results[workon_home / 'each-a'] == 0 and results[workon_home / 'each-b'] == 1
+
+    results = api.each(command, jobs=1, fail_fast=True, path=workon_home)
+    assert results[workon_home / 'other'] is None
+
+
+@pytest.mark.unit
+def test_matrix(workon_home, capsys):
+    from vsh import api
+    from vsh.errors import InterpreterNotFound
+
+    version = '.'.join(map(str, sys.version_info[:2]))
+    command = ['python', '-c', 'import sys; print(sys.prefix)']
+
+    results = api.matrix('proj', [version], command, include_pip=False, path=workon_home)
+    venv_path = workon_home / f'proj-py{version.replace(".", "")}'
+    assert list(results) == [version]
+    assert results[version][0] == 0
+    assert str(venv_path) in capsys.readouterr().out
+
+    with pytest.raises(InterpreterNotFound):
+        api.matrix('proj', [version, '0.1'], command, path=workon_home)
+
+
+@pytest.mark.unit
+@pytest.mark.skipif(sys.platform == 'win32', reason='interpreters are found by name on PATH')
+def test_matrix_names(workon_home, monkeypatch):
+    import os
+
+    from vsh import api, history
+
+    bin_path = workon_home / 'interpreters'
+    bin_path.mkdir()
+    (bin_path / 'pypy3').symlink_to(sys.executable)
+    monkeypatch.setenv('PATH', f'{bin_path}{os.pathsep}{os.environ["PATH"]}')
+    version = '.'.join(map(str, sys.version_info[:2]))
+
+    results = api.matrix('proj', ['pypy3', f'python{version}'], ['python', '-c', 'pass'], include_pip=False, path=workon_home)
+    assert all(return_code == 0 for return_code, _ in results.values())
+    assert (workon_home / 'proj-pypy3' / 'pyvenv.cfg').exists()
+    assert workon_home / 'proj-pypy3' in history.last_used()
+    assert (workon_home / f'proj-py{version.replace(".", "")}' / 'pyvenv.cfg').exists()
@@ -0,0 +1,36 @@
+import os
+
+import pytest
+
+
+@pytest.mark.unit
+def test_gc(workon_home):
+    from vsh import api, history
+    from vsh.disk_usage import directory_size
+
+    stale = 0
+    venv_paths = [workon_home / name for name in ('gc-oldest', 'gc-pinned', 'gc-newest')]
+    for venv_path in venv_paths:
+        api.create(path=venv_path, include_pip=False)
+        os.utime(venv_path, (stale, stale))
+        stale += 60
+    oldest, pinned, newest = venv_paths
+    config = api.read_vsh_config(api.find_vsh_config(name=pinned.name))
+    config.pinned = True
+    config.dump(api.find_vsh_config(name=pinned.name))
+
+    # Only enough room for one environment
+    budget = directory_size(newest)
+    assert api.gc(max_size=budget, path=workon_home, dry_run=True) == [oldest, newest]
+    assert all(venv_path.exists() for venv_path in venv_paths)
+
+    for timestamp in (1, 2):
+        history.record(pinned, timestamp=timestamp, duration=0)
+    assert api.gc(max_size=budget, keep_recent=0, path=workon_home) == [oldest, newest]
+    # gc compacts the history to one record per environment
+    assert [path for path, _, _ in history.read()] == [pinned]
+    assert not oldest.exists()
+    assert pinned.exists()
+    assert not newest.exists()
+
+    api.remove(pinned)
@@ -0,0 +1,79 @@
+import subprocess
+
+import pytest
+
+
+@pytest.mark.unit
+def test_venv_run(workon_home):
+    from vsh import api, history
+    from vsh.errors import VenvLockedError
+
+    venv_path = workon_home / 'run-me'
+    api.create(path=venv_path, include_pip=False, precompile=False)
+
+    with api.Venv(venv_path, working=workon_home) as venv:
+        result = venv.run(['python', '-c', 'import os, sys; print(sys.prefix); print(os.getcwd()); print("oops", file=sys.stderr)'])
+        assert result.ok
+        assert result.stdout.splitlines() == [str(venv_path), str(workon_home)]
+        assert result.stderr == 'oops\n'
+        assert result.duration > 0
+
+        lines = []
+        result = venv.run('python -c "print(1); print(2)"', capture=False, stream=lambda name, line: lines.append((name, line)))
+        assert lines == [('stdout', '1'), ('stdout', '2')]
+        assert result.stdout is None
+
+        result = venv.run(['python', '-c', 'import os; print(os.environ["EXTRA"])'], env={'EXTRA': 'yes'})
+        assert result.stdout == 'yes\n'
+
+        result = venv.run(['python', '-c', 'import time; time.sleep(30)'], timeout=0.5)
+        assert result.timed_out and not result.ok
+
+        # Children holding the pipes are killed with the command
+        grandchild = 'import subprocess, sys, time; subprocess.Popen([sys.executable, "-c", "import time; time.sleep(30)"]); time.sleep(30)'
+        result = venv.run(['python', '-c', grandchild], timeout=0.5)
+        assert result.timed_out and result.duration < 10
+
+        with pytest.raises(subprocess.CalledProcessError):
+            venv.run(['python', '-c', 'raise SystemExit(3)'], check=True)
+
+        # Removing or upgrading an environment in use raises instead of deadlocking
+        with pytest.raises(VenvLockedError):
+            api.remove(venv)
+        with pytest.raises(VenvLockedError):
+            api.create(venv, upgrade=True, include_pip=False, precompile=False)
+
+    assert venv_path in history.last_used()
+    assert api.run(venv_path, ['python', '-c', 'raise SystemExit(2)']).returncode == 2
+
+
+@pytest.mark.unit
+def test_venv_invalid(workon_home):
+    from vsh import api
+    from vsh.errors import InvalidEnvironmentError
+
+    with pytest.raises(InvalidEnvironmentError):
+        api.Venv(workon_home / 'missing')
+
+
+@pytest.mark.unit
+def test_venv_model(workon_home, mocker):
+    from vsh import api
+
+    venv = api.Venv(workon_home / 'model', check=False)
+    assert not venv.is_valid
+    assert not hasattr(venv, '__dict__')
+    assert api.create(venv, include_pip=False, precompile=False) == venv.path
+    assert venv.is_valid
+    assert venv.python == venv.bin_path / 'python'
+    assert venv.site_packages.name == 'site-packages'
+    assert venv.version.startswith('3.')
+    assert venv.config.venv_path == venv.path
+
+    validate = mocker.spy(api, 'validate_environment')
+    assert venv.is_valid
+    assert api.list_packages(venv) == api.list_packages(venv)
+    assert validate.call_count == 0
+
+    api.remove(venv)
+    assert not venv.is_valid
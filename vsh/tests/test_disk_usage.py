@@ -0,0 +1,54 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from .common import install_distribution
+
+
+@pytest.mark.unit
+def test_package_sizes(venv_path):
+    from vsh import api
+    from vsh.disk_usage import package_sizes
+    from vsh.packages import find_site_packages
+
+    api.create(path=venv_path, include_pip=False)
+    site_packages = find_site_packages(venv_path)
+    install_distribution(site_packages, 'alpha', '1.0', size=1000)
+    install_distribution(site_packages, 'beta', '2.0', size=10)
+    # Nothing records this folder so it must be walked
+    unrecorded = site_packages / 'gamma'
+    unrecorded.mkdir()
+    (unrecorded / '__init__.py').write_text('#' * 5000)
+
+    sizes = package_sizes(site_packages)
+    assert sizes['alpha'] > 1000
+    assert 10 < sizes['beta'] < sizes['alpha']
+    assert sizes['gamma'] == 5000
+
+
+@pytest.mark.unit
+def test_usage_cache(venv_path, tmpdir):
+    from vsh import api
+    from vsh.disk_usage import usage, usages
+    from vsh.packages import find_site_packages
+
+    cache_path = Path(str(tmpdir)) / 'cache'
+    api.create(path=venv_path, include_pip=False)
+    site_packages = find_site_packages(venv_path)
+    install_distribution(site_packages, 'alpha', '1.0', size=1000)
+
+    venv_usage = usage(venv_path, cache_path=cache_path)
+    assert venv_usage.total > 1000
+    cache_files = list(cache_path.iterdir())
+    assert len(cache_files) == 1
+
+    # A matching key returns the cached value without walking the venv
+    data = json.loads(cache_files[0].read_text())
+    data['total'] = 1
+    cache_files[0].write_text(json.dumps(data))
+    assert usages([venv_path], cache_path=cache_path)[venv_path].total == 1
+
+    # Installing into site-packages invalidates the cache
+    install_distribution(site_packages, 'beta', '2.0', size=10)
+    assert usage(venv_path, cache_path=cache_path).total > 1000
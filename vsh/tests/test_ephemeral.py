@@ -0,0 +1,126 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+
+@pytest.mark.unit
+def test_mount_types_and_memory(tmpdir):
+    from vsh import ephemeral
+
+    root = Path(str(tmpdir))
+    (root / 'mounts').write_text('tmpfs /dev/shm tmpfs rw,nosuid 0 0\n/dev/sda1 /my\\040disk ext4 rw 0 0\n')
+    (root / 'meminfo').write_text('MemTotal: 16000000 kB\nMemAvailable: 8000000 kB\n')
+
+    assert ephemeral.mount_types(root / 'mounts') == {Path('/dev/shm'): 'tmpfs', Path('/my disk'): 'ext4'}
+    assert ephemeral.mount_types(root / 'missing') == {}
+    assert ephemeral.available_memory(root / 'meminfo') == 8000000 * 1024
+    assert ephemeral.available_memory(root / 'missing') is None
+
+
+@pytest.mark.unit
+@pytest.mark.skipif(sys.platform == 'win32', reason='memory backed folders are posix only')
+def test_find_ram_home(tmpdir, monkeypatch):
+    from vsh import api, ephemeral
+
+    root = Path(str(tmpdir)).resolve()
+    monkeypatch.setattr(ephemeral, 'mount_types', lambda: {root: 'tmpfs'})
+    monkeypatch.setattr(ephemeral, 'available_memory', lambda: 1024 ** 3)
+    monkeypatch.setattr(ephemeral, 'ram_candidates', lambda: [root])
+
+    home = ephemeral.find_ram_home(min_free=1024)
+    assert home is not None and home.parent == root and home.is_dir()
+    assert api.find_ram_path('scratch', min_free='1K') == home / 'scratch'
+    # More than the available memory
+    assert ephemeral.find_ram_home(min_free=2 * 1024 ** 3) is None
+
+    monkeypatch.setattr(ephemeral, 'mount_types', lambda: {root: 'ext4'})
+    assert ephemeral.find_ram_home(min_free=1024) is None
+
+
+@pytest.mark.unit
+def test_unique_name(tmpdir):
+    from vsh.ephemeral import unique_name
+
+    names = {unique_name('job', home=Path(str(tmpdir))) for _ in range(100)}
+    assert len(names) == 100
+    assert all(name.startswith('job-') for name in names)
+
+
+@pytest.mark.unit
+@pytest.mark.skipif(sys.platform == 'win32', reason='SIGTERM cannot be handled on windows')
+def test_exit_on_signals():
+    import os
+    import signal
+
+    from vsh.ephemeral import exit_on_signals
+
+    previous = signal.getsignal(signal.SIGTERM)
+    with pytest.raises(SystemExit) as error:
+        with exit_on_signals():
+            os.kill(os.getpid(), signal.SIGTERM)
+    assert error.value.code == 128 + signal.SIGTERM
+    assert signal.getsignal(signal.SIGTERM) == previous
+
+
+TRAP_SIGTERM = '''\
+import signal, sys, time
+signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(7))
+print('ready', flush=True)
+time.sleep(30)
+'''
+
+
+@pytest.mark.unit
+@pytest.mark.skipif(sys.platform == 'win32', reason='SIGTERM cannot be handled on windows')
+def test_stop_process():
+    import signal
+    import subprocess
+
+    from vsh.ephemeral import stop_process
+
+    process = subprocess.Popen([sys.executable, '-c', TRAP_SIGTERM], stdout=subprocess.PIPE)
+    assert process.stdout.readline() == b'ready\n'
+    assert stop_process(process, SystemExit(128 + signal.SIGTERM)) == 7
+    process.stdout.close()
+
+    # Children ignoring the signal are killed after the timeout
+    process = subprocess.Popen([sys.executable, '-c', TRAP_SIGTERM.replace('sys.exit(7)', 'None')], stdout=subprocess.PIPE)
+    assert process.stdout.readline() == b'ready\n'
+    assert stop_process(process, SystemExit(128 + signal.SIGTERM), timeout=0.5) == -signal.SIGKILL
+    process.stdout.close()
+
+
+@pytest.mark.unit
+@pytest.mark.skipif(sys.platform == 'win32', reason='SIGTERM cannot be handled on windows')
+def test_enter_forwards_signals(workon_home):
+    import os
+    import signal
+    import threading
+    import time
+
+    from vsh import api
+    from vsh.ephemeral import exit_on_signals
+
+    venv_path = workon_home / 'signalled'
+    api.create(path=venv_path, include_pip=False, precompile=False)
+    marker = workon_home / 'stopped'
+    script = workon_home / 'trap.py'
+    ready = workon_home / 'ready'
+    script.write_text(
+        TRAP_SIGTERM.replace('sys.exit(7)', f'(open({str(marker)!r}, "w").close(), sys.exit(7))')
+        .replace("print('ready', flush=True)", f'open({str(ready)!r}, "w").close()')
+        )
+
+    def terminate():
+        while not ready.exists():
+            time.sleep(0.05)
+        os.kill(os.getpid(), signal.SIGTERM)
+
+    threading.Thread(target=terminate, daemon=True).start()
+    with pytest.raises(SystemExit) as error:
+        with exit_on_signals():
+            api.enter(venv_path, ['exec', 'python', str(script)])
+    assert error.value.code == 128 + signal.SIGTERM
+    # The command finished before enter gave up the environment
+    assert marker.exists()
@@ -0,0 +1,67 @@
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pytest
+
+
+@pytest.mark.unit
+def test_history_record(tmpdir):
+    from vsh import history
+
+    history_path = Path(str(tmpdir)) / 'history.log'
+    history.record(Path('/venvs/a'), timestamp=100, duration=5, history_path=history_path)
+    history.record(Path('/venvs/b'), timestamp=200, duration=1, history_path=history_path)
+    history.record(Path('/venvs/a'), timestamp=50, duration=1, history_path=history_path)
+
+    assert list(history.read(history_path=history_path)) == [
+        (Path('/venvs/a'), 100, 5),
+        (Path('/venvs/b'), 200, 1),
+        (Path('/venvs/a'), 50, 1),
+        ]
+    assert history.last_used(history_path=history_path) == {
+        Path('/venvs/a'): 105,
+        Path('/venvs/b'): 201,
+        }
+
+
+@pytest.mark.unit
+def test_history_concurrent_records(tmpdir):
+    from vsh import history
+
+    history_path = Path(str(tmpdir)) / 'history.log'
+    count = 500
+
+    def record(index):
+        history.record(Path(f'/venvs/venv-{index}'), timestamp=index, duration=0, history_path=history_path)
+
+    with ThreadPoolExecutor(max_workers=16) as executor:
+        list(executor.map(record, range(count)))
+    assert len(history.last_used(history_path=history_path)) == count
+
+
+@pytest.mark.unit
+def test_append_line(tmpdir):
+    from vsh import history
+
+    log_path = Path(str(tmpdir)) / 'logs' / 'metrics.jsonl'
+    assert history.append_line(log_path, '{"a": 1}') == log_path
+    history.append_line(log_path, '{"a": 2}')
+    assert log_path.read_text() == '{"a": 1}\n{"a": 2}\n'
+
+
+@pytest.mark.unit
+def test_history_compact(tmpdir):
+    from vsh import history
+
+    history_path = Path(str(tmpdir)) / 'history.log'
+    for timestamp in (100, 300, 200):
+        history.record(Path('/venvs/a'), timestamp=timestamp, duration=1, history_path=history_path)
+    history.record(Path('/venvs/b'), timestamp=50, duration=1, history_path=history_path)
+    with history_path.open('a') as stream:
+        stream.write('torn')
+    last_used = history.last_used(history_path=history_path)
+
+    assert history.compact(history_path=history_path) == history_path
+    assert list(history.read(history_path=history_path)) == [(Path('/venvs/a'), 300, 1), (Path('/venvs/b'), 50, 1)]
+    assert history.last_used(history_path=history_path) == last_used
+    assert [path.name for path in history_path.parent.iterdir()] == ['history.log']
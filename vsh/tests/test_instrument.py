@@ -0,0 +1,65 @@
+import os
+
+import pytest
+
+
+@pytest.mark.unit
+def test_tracing(tmp_path):
+    from vsh import instrument
+
+    with instrument.tracing() as trace:
+        with instrument.phase('config'):
+            (tmp_path / 'file').write_text('text')
+            os.stat(tmp_path / 'file')
+            with instrument.phase('validation'):
+                os.listdir(tmp_path)
+        os.lstat(tmp_path)
+    os.stat(tmp_path)
+
+    assert trace.count('open', phase='config') == 1
+    assert trace.count('stat', phase='config') == 1
+    assert trace.count('listdir', phase='validation') == 1
+    assert trace.count('stat', phase=instrument.OTHER_PHASE) == 1
+    assert trace.count('stat') == 2
+    assert trace.over_budget({'stat': 1, 'open': 1}) == {'stat': (2, 1)}
+    assert instrument.active() is None
+    assert 'validation' in trace.format_table()
+
+
+@pytest.mark.unit
+def test_enter_budget(workon_home, monkeypatch):
+    from vsh import api, instrument
+
+    monkeypatch.chdir(workon_home)
+    monkeypatch.setenv('SHELL', '/bin/sh')
+    venv_path = api.create(path=workon_home / 'budget', include_pip=False, precompile=False)
+
+    with instrument.tracing() as trace:
+        assert api.enter(venv_path, ['true']) == 0
+
+    assert trace.over_budget({'spawn': 1}, phase='spawn') == {}
+    assert trace.over_budget({'stat': 30, 'open': 5, 'listdir': 5}, phase='validation') == {}
+    assert trace.over_budget({'stat': 10, 'open': 2}, phase='config') == {}
+
+
+@pytest.mark.unit
+def test_profiling(workon_home, capsys):
+    import json
+
+    from vsh import api, instrument
+
+    trace_path = workon_home / 'profile' / 'trace.json'
+    with instrument.profiling(path=trace_path, cprofile=True) as profile:
+        api.create(path=workon_home / 'profiled', include_pip=False, precompile=False)
+
+    names = {span.name for span in profile.spans}
+    assert {'vsh', 'create', 'build', 'ensure_directories', 'setup_python', 'setup_scripts', 'config dump'} <= names
+    events = json.loads(trace_path.read_text())['traceEvents']
+    assert {event['name'] for event in events} == names
+    assert all(event['ph'] == 'X' for event in events)
+    assert trace_path.with_suffix('.prof').exists()
+    assert 'setup_python' in capsys.readouterr().err
+
+    with instrument.span('ignored'):
+        pass
+    assert 'ignored' not in {span.name for span in profile.spans}
@@ -0,0 +1,110 @@
+import os
+import subprocess
+import sys
+import textwrap
+from pathlib import Path
+
+import pytest
+
+pytestmark = pytest.mark.skipif(sys.platform == 'win32', reason='locks are no-ops on windows')
+
+HOLD_LOCK = textwrap.dedent('''\
+    import sys, time
+    from pathlib import Path
+    from vsh import api, locks
+    path = Path(sys.argv[1])
+    with locks.locked(path, shared=sys.argv[2] == 'shared', locks_path=Path(sys.argv[3])):
+        if sys.argv[4] == 'create':
+            api.create(path=path, precompile=False)
+        print('locked', flush=True)
+        time.sleep(float(sys.argv[5]))
+        if sys.argv[4] == 'discard':
+            locks.discard(path, locks_path=Path(sys.argv[3]))
+    ''')
+
+
+def hold_lock(path: Path, locks_path: Path, shared: bool = False, create: bool = False, seconds: float = 1.0, discard: bool = False) -> subprocess.Popen:
+    """Holds a lock in another process until it prints "locked" and sleeps"""
+    action = 'create' if create else 'discard' if discard else ''
+    cmd = [sys.executable, '-c', HOLD_LOCK, str(path), 'shared' if shared else 'exclusive', str(locks_path), action, str(seconds)]
+    process = subprocess.Popen(cmd, stdout=subprocess.PIPE, cwd=str(Path(__file__).parents[2]), env=dict(os.environ))
+    assert process.stdout.readline().strip() == b'locked'
+    return process
+
+
+@pytest.mark.unit
+def test_locked(tmpdir, capsys):
+    from vsh.errors import VenvLockedError
+    from vsh.locks import locked
+
+    root = Path(str(tmpdir))
+    venv_path = root / 'locked-venv'
+
+    # Nested locks in the same thread do not deadlock
+    with locked(venv_path, locks_path=root) as waited:
+        assert waited is False
+        with locked(venv_path, locks_path=root, blocking=False) as nested:
+            assert nested is False
+
+    # A shared lock cannot be upgraded by the thread holding it
+    with locked(venv_path, shared=True, locks_path=root):
+        with locked(venv_path, shared=True, locks_path=root):
+            pass
+        with pytest.raises(VenvLockedError):
+            with locked(venv_path, locks_path=root):
+                pass
+
+    process = hold_lock(venv_path, root, shared=True)
+    with locked(venv_path, shared=True, locks_path=root, blocking=False):
+        pass
+    with pytest.raises(VenvLockedError):
+        with locked(venv_path, locks_path=root, blocking=False):
+            pass
+    with locked(venv_path, locks_path=root, verbose=1) as waited:
+        assert waited is True
+    process.wait()
+    # Waiting is reported on stderr so piped output stays clean
+    output = capsys.readouterr()
+    assert 'Waiting for' in output.err and 'Waiting for' not in output.out
+
+
+@pytest.mark.unit
+def test_create_reuses_environment(workon_home, monkeypatch, mocker):
+    from vsh import api, locks
+
+    monkeypatch.setattr(locks, 'LOCKS_PATH', workon_home / 'locks')
+    install_requirements = mocker.patch.object(api, 'install_requirements')
+    venv_path = workon_home / 'shared-env'
+    requirements = workon_home / 'requirements.txt'
+    requirements.write_text('')
+    process = hold_lock(venv_path, workon_home / 'locks', create=True, seconds=0.5)
+    created = (venv_path / 'pyvenv.cfg').stat().st_mtime_ns
+
+    assert api.create(path=venv_path, requirements=requirements) == venv_path
+    assert (venv_path / 'pyvenv.cfg').stat().st_mtime_ns == created
+    # The build is reused but the requirements are still checked
+    assert install_requirements.call_count == 1
+    assert install_requirements.call_args[1]['requirements'] == requirements
+    process.wait()
+
+
+@pytest.mark.unit
+def test_discard(workon_home, capsys):
+    from vsh import api
+    from vsh.locks import find_lock, locked
+
+    root = workon_home / 'locks'
+    venv_path = workon_home / 'discarded'
+
+    # A waiter on a discarded lock file locks a new one
+    process = hold_lock(venv_path, root, seconds=0.5, discard=True)
+    with locked(venv_path, locks_path=root) as waited:
+        assert waited is True
+        assert find_lock(venv_path, locks_path=root).exists()
+    process.wait()
+    assert 'Waiting for' not in capsys.readouterr().err
+
+    api.create(path=venv_path, include_pip=False, precompile=False)
+    assert find_lock(venv_path).exists()
+    api.remove(venv_path)
+    assert not find_lock(venv_path).exists()
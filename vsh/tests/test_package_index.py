@@ -0,0 +1,68 @@
+from pathlib import Path
+
+import pytest
+
+from .common import install_distribution
+
+
+@pytest.mark.unit
+def test_package_index(workon_home, tmpdir):
+    from vsh import api, package_index
+    from vsh.packages import find_site_packages
+
+    index_path = Path(str(tmpdir)) / 'index' / 'index.json'
+    venv_paths = [workon_home / 'index-old', workon_home / 'index-new']
+    for venv_path, version in zip(venv_paths, ['2.19.1', '2.31.0']):
+        api.create(path=venv_path, include_pip=False)
+        install_distribution(find_site_packages(venv_path), 'Requests', version)
+    old, new = venv_paths
+
+    index = package_index.refresh(venv_paths, index_path=index_path)
+    assert index.which_has('requests<2.20') == {old: ('Requests', '2.19.1')}
+    assert set(index.which_has('requests')) == {old, new}
+    assert index.which_has('flask') == {}
+
+    # Unchanged environments are answered from the stored index
+    index_mtime = index_path.stat().st_mtime_ns
+    assert package_index.refresh(venv_paths, index_path=index_path).packages == index.packages
+    assert index_path.stat().st_mtime_ns == index_mtime
+
+    # Changed environments are parsed again
+    install_distribution(find_site_packages(new), 'urllib3', '1.24')
+    index = package_index.refresh(venv_paths, index_path=index_path)
+    assert index.which_has('urllib3<1.25') == {new: ('urllib3', '1.24')}
+
+    # Removed environments are dropped
+    index = package_index.refresh([new], index_path=index_path)
+    assert index.which_has('requests<2.20') == {}
+
+
+@pytest.mark.unit
+def test_which_has_archived(workon_home, capsys):
+    from vsh import api, package_index, tiering
+    from vsh.packages import find_site_packages
+
+    indexed, unindexed = workon_home / 'index-archived', workon_home / 'index-unindexed'
+    for venv_path in (indexed, unindexed):
+        api.create(path=venv_path, include_pip=False, precompile=False)
+        install_distribution(find_site_packages(venv_path), 'Requests', '2.19.1')
+    (workon_home / 'not-a-venv').mkdir()
+
+    # Environments archived before they were ever indexed are listed from their archive
+    tiering.archive(unindexed)
+    assert set(api.which_has('requests<2.20', path=workon_home)) == {indexed, unindexed}
+    index = package_index.load()
+    assert index.venvs[str(unindexed)]['packages']['requests'] == ['Requests', '2.19.1']
+    assert not index.venvs[str(indexed)]['archived']
+
+    # Archived environments keep the entry indexed before they were archived
+    tiering.archive(indexed)
+    capsys.readouterr()
+    assert set(api.which_has('requests<2.20', path=workon_home)) == {indexed, unindexed}
+    assert capsys.readouterr().out.count('(archived)') == 2
+
+    # Restored environments are indexed from site-packages again
+    tiering.restore(indexed)
+    install_distribution(find_site_packages(indexed), 'urllib3', '1.24')
+    assert api.which_has('urllib3', path=workon_home) == {indexed: ('urllib3', '1.24')}
+    assert not package_index.load().venvs[str(indexed)]['archived']
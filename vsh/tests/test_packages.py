@@ -0,0 +1,138 @@
+import json
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import pytest
+
+from .common import install_distribution
+
+
+@dataclass
+class DistributionTestCase:
+    """Test case for reading dist-info metadata
+
+    Attributes:
+        name: name of distribution
+        version: version of distribution
+        requires: Requires-Dist entries written to METADATA
+        direct_url: contents of direct_url.json
+        expected: expected freeze line
+    """
+    name: str = 'example'
+    version: str = '1.0'
+    requires: List[str] = field(default_factory=list)
+    direct_url: Optional[Dict] = None
+    expected: str = ''
+
+    def install(self, site_packages: Path) -> Path:
+        dist_info = site_packages / f'{self.name}-{self.version}.dist-info'
+        dist_info.mkdir(parents=True)
+        headers = ['Metadata-Version: 2.1', f'Name: {self.name}', f'Version: {self.version}']
+        headers.extend(f'Requires-Dist: {requirement}' for requirement in self.requires)
+        (dist_info / 'METADATA').write_text('\n'.join(headers) + '\n\nName: not-a-header\n')
+        if self.direct_url is not None:
+            (dist_info / 'direct_url.json').write_text(json.dumps(self.direct_url))
+        return dist_info
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize('test_case', [
+    DistributionTestCase(expected='example==1.0'),
+    DistributionTestCase(requires=['requests>=2', 'six; python_version < "3"'], expected='example==1.0'),
+    DistributionTestCase(
+        direct_url={'url': 'https://github.com/org/example', 'vcs_info': {'vcs': 'git', 'commit_id': 'abc123'}},
+        expected='example @ git+https://github.com/org/example@abc123',
+        ),
+    DistributionTestCase(
+        direct_url={'url': 'file:///src/example', 'dir_info': {'editable': True}},
+        expected='-e file:///src/example',
+        ),
+    DistributionTestCase(
+        direct_url={'url': 'https://example.com/example-1.0.tar.gz', 'archive_info': {}},
+        expected='example @ https://example.com/example-1.0.tar.gz',
+        ),
+    ])
+def test_read_distribution(tmpdir, test_case):
+    from vsh.packages import read_distribution
+
+    dist_info = test_case.install(Path(str(tmpdir)))
+    distribution = read_distribution(dist_info)
+    assert distribution.name == test_case.name
+    assert distribution.version == test_case.version
+    assert distribution.requires == test_case.requires
+    assert distribution.requirement == test_case.expected
+
+
+@pytest.mark.unit
+def test_list_packages(venv_path):
+    from vsh import api
+    from vsh.packages import find_bin_path, find_site_packages, format_freeze
+
+    api.create(path=venv_path, include_pip=False)
+    assert (find_bin_path(venv_path) / 'python').exists()
+    site_packages = find_site_packages(venv_path)
+    for name in ('zeta', 'Alpha', 'pip'):
+        DistributionTestCase(name=name).install(site_packages)
+
+    distributions = api.list_packages(venv_path)
+    assert [distribution.name for distribution in distributions] == ['Alpha', 'pip', 'zeta']
+    assert format_freeze(distributions) == 'Alpha==1.0\nzeta==1.0'
+    assert [item['name'] for item in json.loads(format_freeze(distributions, output_format='json', include_all=True))] == ['Alpha', 'pip', 'zeta']
+
+
+@pytest.mark.unit
+def test_diff_envs(workon_home):
+    from vsh import api
+    from vsh.packages import find_site_packages
+
+    first, second = workon_home / 'diff-first', workon_home / 'diff-second'
+    for venv_path in (first, second):
+        api.create(path=venv_path, include_pip=False)
+    first_site_packages, second_site_packages = find_site_packages(first), find_site_packages(second)
+    install_distribution(first_site_packages, 'same', '1.0', size=10)
+    install_distribution(second_site_packages, 'same', '1.0', size=10)
+    install_distribution(first_site_packages, 'removed', '1.0')
+    install_distribution(second_site_packages, 'added', '2.0')
+    install_distribution(first_site_packages, 'changed', '1.0')
+    install_distribution(second_site_packages, 'changed', '1.1')
+    install_distribution(first_site_packages, 'rebuilt', '1.0', size=1)
+    install_distribution(second_site_packages, 'rebuilt', '1.0', size=2)
+
+    diff = api.diff_envs(first, second)
+    assert diff.added == {'added': '2.0'}
+    assert diff.removed == {'removed': '1.0'}
+    assert diff.changed == {'changed': ('1.0', '1.1')}
+    assert diff.rebuilt == []
+    assert not api.diff_envs(first, first)
+
+    (second_site_packages / 'same.py').write_text('# patched')
+    diff = api.diff_envs(first, second, files=True)
+    assert diff.rebuilt == ['rebuilt']
+    assert diff.modified == {'same': [second_site_packages / 'same.py']}
+
+
+@pytest.mark.unit
+def test_check(venv_path):
+    from vsh import api
+    from vsh.packages import find_site_packages
+
+    api.create(path=venv_path, include_pip=False)
+    site_packages = find_site_packages(venv_path)
+    install_distribution(site_packages, 'app', '1.0', requires=[
+        'missing',
+        'conflicting>=2',
+        'satisfied<2',
+        'skipped; python_version < "3"',
+        'helper[extra]',
+        ])
+    install_distribution(site_packages, 'conflicting', '1.0')
+    install_distribution(site_packages, 'satisfied', '1.5')
+    install_distribution(site_packages, 'helper', '1.0', requires=['extra-only; extra == "extra"', 'unused-only; extra == "unused"'])
+
+    problems = api.check_envs(venv_path)[venv_path]
+    assert sorted((problem.requirement.name, problem.installed) for problem in problems) == [
+        ('conflicting', '1.0'),
+        ('extra-only', None),
+        ('missing', None),
+        ]
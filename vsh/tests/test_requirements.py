@@ -0,0 +1,84 @@
+from dataclasses import dataclass
+
+import pytest
+
+
+@dataclass
+class SpecifierTestCase:
+    """Test case for requirement specifiers
+
+    Attributes:
+        requirement: PEP 508 requirement
+        version: installed version
+        expected: whether the version satisfies the requirement
+    """
+    requirement: str = ''
+    version: str = ''
+    expected: bool = True
+
+
+@pytest.mark.unit
+def test_parse_version_ordering():
+    from vsh.requirements import parse_version
+
+    versions = ['0.9', '1.0.dev0', '1.0a1', '1.0b2.dev1', '1.0b2', '1.0rc1', '1.0', '1.0.post1', '1.0.1', '1.10', '1!0.1']
+    keys = [parse_version(version) for version in versions]
+    assert keys == sorted(keys)
+    assert parse_version('1.0') == parse_version('1.0.0')
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize('test_case', [
+    SpecifierTestCase(requirement='requests<2.20', version='2.19.1'),
+    SpecifierTestCase(requirement='requests<2.20', version='2.20.0', expected=False),
+    SpecifierTestCase(requirement='requests>=2,<3', version='2.31.0'),
+    SpecifierTestCase(requirement='requests==2.*', version='2.0'),
+    SpecifierTestCase(requirement='requests!=2.0.*', version='2', expected=False),
+    SpecifierTestCase(requirement='requests~=2.19.1', version='2.19.9'),
+    SpecifierTestCase(requirement='requests~=2.19.1', version='2.20.0', expected=False),
+    SpecifierTestCase(requirement='Requests[socks] (>=2.0) ; python_version > "3"', version='2.1'),
+    SpecifierTestCase(requirement='requests', version='0.1'),
+    # Exclusive comparisons leave out pre- and post-releases of the version itself
+    SpecifierTestCase(requirement='requests<2.20', version='2.20.0rc1', expected=False),
+    SpecifierTestCase(requirement='requests<2.20', version='2.20.dev0', expected=False),
+    SpecifierTestCase(requirement='requests<2.20', version='2.20a1.dev1', expected=False),
+    SpecifierTestCase(requirement='requests<2.20', version='2.19.1rc1'),
+    SpecifierTestCase(requirement='requests<2.20rc2', version='2.20rc1'),
+    SpecifierTestCase(requirement='requests<2.20.post1', version='2.20rc1'),
+    SpecifierTestCase(requirement='requests<2.20.post2', version='2.20.post2.dev0', expected=False),
+    SpecifierTestCase(requirement='requests>1.0', version='1.0.post1', expected=False),
+    SpecifierTestCase(requirement='requests>1.0', version='1.0.post1.dev0', expected=False),
+    SpecifierTestCase(requirement='requests>1.0rc1', version='1.0rc1.post1', expected=False),
+    SpecifierTestCase(requirement='requests>1.0rc1', version='1.0.post1'),
+    SpecifierTestCase(requirement='requests>1.0.dev0', version='1.0.post1'),
+    SpecifierTestCase(requirement='requests>1.0', version='1.0.1.post1'),
+    SpecifierTestCase(requirement='requests>1.0.post1', version='1.0.post2'),
+    SpecifierTestCase(requirement='requests<=2.20', version='2.20.0rc1'),
+    SpecifierTestCase(requirement='requests>=1.0', version='1.0.post1'),
+    SpecifierTestCase(requirement='requests~=0.9', version='1!0.9.1', expected=False),
+    ])
+def test_requirement_contains(test_case):
+    from vsh.requirements import parse_requirement
+
+    requirement = parse_requirement(test_case.requirement)
+    assert requirement.key == 'requests'
+    assert requirement.contains(test_case.version) is test_case.expected
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize('marker, expected', [
+    ('python_version < "3.8"', True),
+    ('python_version >= "3.8"', False),
+    ('python_full_version == "3.7.*"', True),
+    ('python_version >= "3.8" or implementation_name == "cpython"', True),
+    ('(os_name == "nt" or os_name == "posix") and python_version > "3"', True),
+    ('extra == "socks"', False),
+    ('"3.7" in python_version', True),
+    ('implementation_name not in "cpython pypy"', False),
+    ])
+def test_evaluate_marker(marker, expected):
+    from vsh.requirements import evaluate_marker, marker_environment
+
+    environment = marker_environment(python_version='3.7.3', implementation_name='cpython')
+    environment['os_name'] = 'posix'
+    assert evaluate_marker(marker, environment) is expected
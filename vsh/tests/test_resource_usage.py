@@ -0,0 +1,31 @@
+import json
+import sys
+
+import pytest
+
+
+@pytest.mark.unit
+def test_enter_usage(workon_home, monkeypatch, capsys):
+    from vsh import api
+
+    monkeypatch.chdir(workon_home)
+    monkeypatch.setenv('SHELL', '/bin/sh')
+    venv_path = api.create(path=workon_home / 'usage', include_pip=False, precompile=False)
+    metrics_path = workon_home / 'metrics' / 'usage.jsonl'
+
+    for _ in range(2):
+        assert api.enter(venv_path, ['python', '-c', "'sum(range(10 ** 6))'"], show_usage=True, metrics_path=metrics_path) == 0
+
+    assert 'vsh overhead' in capsys.readouterr().err
+    records = [json.loads(line) for line in metrics_path.read_text().splitlines()]
+    assert len(records) == 2
+    record = records[0]
+    assert record['path'] == str(venv_path)
+    assert record['returncode'] == 0
+    assert record['wall'] > 0 and record['overhead'] >= 0
+    # CPU overhead covers the same interval as the wall overhead, not vsh's whole life
+    assert 0 <= record['overhead_cpu'] <= record['overhead'] + 0.5
+    if sys.platform != 'win32':
+        assert record['user'] + record['system'] > 0
+        assert record['max_rss'] > 0
+        assert record['blocks_in'] >= 0 and record['blocks_out'] >= 0
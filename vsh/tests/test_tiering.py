@@ -0,0 +1,71 @@
+import os
+from dataclasses import dataclass
+
+import pytest
+
+from .common import scan_tree
+
+
+@dataclass
+class DurationTestCase:
+    """Test case for parse_duration
+
+    Attributes:
+        value: human readable duration
+        expected: number of seconds
+    """
+    value: str = ''
+    expected: float = 0
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize('test_case', [
+    DurationTestCase(value='90', expected=90),
+    DurationTestCase(value='15m', expected=15 * 60),
+    DurationTestCase(value='12h', expected=12 * 60 * 60),
+    DurationTestCase(value='30d', expected=30 * 24 * 60 * 60),
+    DurationTestCase(value='1.5w', expected=1.5 * 7 * 24 * 60 * 60),
+    ])
+def test_parse_duration(test_case):
+    from vsh.units import parse_duration
+
+    assert parse_duration(test_case.value) == test_case.expected
+
+
+@pytest.mark.unit
+def test_archive_and_restore(venv_path, capsys):
+    from vsh import api, tiering
+
+    api.create(path=venv_path, include_pip=False)
+    expected_files = set(scan_tree(venv_path))
+
+    tiering.archive(venv_path)
+    assert tiering.is_archived(venv_path)
+    assert len(list(scan_tree(venv_path))) == 1
+    assert not list(venv_path.parent.glob(f'.{venv_path.name}*'))
+    assert api.validate_environment(venv_path, check=True)
+
+    capsys.readouterr()
+    tiering.restore(venv_path)
+    # Progress never mixes with the output of commands run in the environment
+    assert capsys.readouterr().out == ''
+    assert not tiering.is_archived(venv_path)
+    assert set(scan_tree(venv_path)) == expected_files
+    assert api.validate_environment(venv_path, check=True)
+
+
+@pytest.mark.unit
+def test_tier(workon_home, venv_path):
+    from vsh import api, tiering
+
+    api.create(path=venv_path, include_pip=False)
+    assert api.tier(idle='1d', path=workon_home) == []
+
+    stale = 0
+    os.utime(venv_path, (stale, stale))
+    assert api.tier(idle='1d', path=workon_home) == [venv_path]
+    assert tiering.is_archived(venv_path)
+
+    assert api.enter(venv_path, command='true') == 0
+    assert not tiering.is_archived(venv_path)
+    assert api.tier(idle='1d', path=workon_home) == []
@@ -0,0 +1,75 @@
+from pathlib import Path
+
+import pytest
+
+from .common import build_wheel
+
+
+@pytest.mark.unit
+def test_read_requirements(tmpdir):
+    from vsh.wheelhouse import read_requirements, requirements_hash
+
+    root = Path(str(tmpdir))
+    (root / 'base.txt').write_text('six==1.16.0  # pinned\n\n# comment\n')
+    (root / 'requirements.txt').write_text('-r base.txt\nrequests >=2.0\n')
+    (root / 'reordered.txt').write_text('requests   >=2.0\n-r  base.txt\n')
+
+    lines = read_requirements(root / 'requirements.txt')
+    assert lines == ['six==1.16.0', 'requests >=2.0']
+    assert requirements_hash(lines) == requirements_hash(read_requirements(root / 'reordered.txt'))
+    assert requirements_hash(lines, python_version='3.7.3') != requirements_hash(lines, python_version='3.8.0')
+
+
+@pytest.mark.unit
+def test_install_requirements(venv_path, tmpdir, monkeypatch):
+    from vsh import api, wheelhouse
+
+    root = Path(str(tmpdir))
+    monkeypatch.setattr(wheelhouse, 'WHEELHOUSE_PATH', root / 'wheelhouse')
+    wheel_path = build_wheel(root, 'vshexample', '1.0')
+    requirements = root / 'requirements.txt'
+    requirements.write_text(f'{wheel_path}\n')
+
+    api.create(path=venv_path, include_pip=True, requirements=requirements)
+    assert [d.name for d in api.list_packages(venv_path) if d.name == 'vshexample'] == ['vshexample']
+    assert list((root / 'wheelhouse').glob('*.whl'))
+    assert api.read_vsh_config(api.find_vsh_config(venv_path.name)).requirements_hash
+
+    # The same requirement set is not installed twice
+    assert api.install_requirements(venv_path, requirements=requirements) is False
+    assert api.install_requirements(venv_path) is False
+
+
+@pytest.mark.unit
+def test_provision_offline(workon_home, tmpdir, monkeypatch):
+    from vsh import api, wheelhouse
+
+    root = Path(str(tmpdir))
+    monkeypatch.setattr(wheelhouse, 'WHEELHOUSE_PATH', root / 'wheelhouse')
+    (root / 'wheelhouse').mkdir()
+    build_wheel(root / 'wheelhouse', 'vshexample', '1.0')
+    requirements = root / 'requirements.txt'
+    requirements.write_text('vshexample==1.0\n')
+    paths = [workon_home / 'provisioned-a', workon_home / 'provisioned-b']
+
+    assert api.provision(paths, requirements=requirements, jobs=2, offline=True) == paths
+    for path in paths:
+        assert 'vshexample' in [d.name for d in api.list_packages(path)]
+    assert api.provision(paths, requirements=requirements, offline=True) == []
+
+
+@pytest.mark.unit
+def test_build_wheelhouse_error(tmpdir):
+    import sys
+
+    from vsh import wheelhouse
+    from vsh.errors import RequirementsError
+
+    root = Path(str(tmpdir))
+    requirements = root / 'requirements.txt'
+    requirements.write_text('vsh-missing-package==9.9\n')
+
+    with pytest.raises(RequirementsError) as error:
+        wheelhouse.build_wheelhouse(Path(sys.executable), requirements, digest='missing', wheelhouse=root / 'wheelhouse', offline=True)
+    assert 'vsh-missing-package' in str(error.value)
+    assert not (root / 'wheelhouse' / '.built' / 'missing').exists()
@@ -0,0 +1,118 @@
+import os
+import shutil
+import sys
+import tarfile
+from pathlib import Path
+from typing import List
+
+from . import terminal
+from .vendored import click
+
+__all__ = ('ARCHIVE_NAME', 'archive', 'archived_dist_infos', 'find_archive', 'is_archived', 'restore')
+
+# Name of the compressed environment left inside of the stub folder
+ARCHIVE_NAME = '.vsh-archive.tar.gz'
+
+
+def archive(path: Path, verbose: int = 0, dry_run: bool = False) -> Path:
+    """Compresses a virtual environment into a single archive
+
+    The virtual environment folder is replaced by a stub folder which
+    only holds the archive.  This keeps the name and path of the
+    environment intact while releasing almost all of its inodes.
+
+    Args:
+        path: path to virtual environment
+        verbose: more output [default: 0]
+        dry_run: do not update system
+
+    Returns:
+        path to archive
+    """
+    verbose = max(int(verbose or 0), 0)
+    archive_path = find_archive(path)
+    if not (dry_run or is_archived(path)):
+        # Build the archive next to the environment so a failure never
+        #  leaves a partially removed environment behind
+        staged_path = path.parent / f'.{path.name}{ARCHIVE_NAME}'
+        with tarfile.open(str(staged_path), 'w:gz') as tar:
+            for child in sorted(path.iterdir()):
+                tar.add(str(child), arcname=child.name)
+        # Move the environment aside and only delete it once the stub is in place
+        removed_path = path.parent / f'.{path.name}.vsh-archived'
+        if removed_path.exists():
+            shutil.rmtree(removed_path)
+        os.replace(str(path), str(removed_path))
+        path.mkdir()
+        os.replace(str(staged_path), str(archive_path))
+        shutil.rmtree(removed_path)
+    terminal.echo(f'{terminal.blue("Archived")}: {terminal.green(path)}', verbose=verbose)
+    return archive_path
+
+
+def archived_dist_infos(path: Path) -> List[Path]:
+    """Lists the distributions installed in an archived virtual environment
+
+    Only member names are read; nothing is extracted.
+
+    Args:
+        path: path to virtual environment
+
+    Returns:
+        *.dist-info folders in site-packages, relative to the environment
+    """
+    with tarfile.open(str(find_archive(path)), 'r:gz') as tar:
+        names = [Path(name) for name in tar.getnames()]
+    return sorted({name for name in names if name.suffix == '.dist-info' and name.parent.name == 'site-packages'})
+
+
+def find_archive(path: Path) -> Path:
+    """Returns the path to where a virtual environment's archive lives
+
+    Args:
+        path: path to virtual environment
+
+    Returns:
+        path to archive
+    """
+    return path / ARCHIVE_NAME
+
+
+def is_archived(path: Path) -> bool:
+    """Checks if a virtual environment has been archived
+
+    Args:
+        path: path to virtual environment
+
+    Returns:
+        True if the path is an archive stub
+    """
+    return find_archive(path).is_file()
+
+
+def restore(path: Path, verbose: int = 0) -> Path:
+    """Restores an archived virtual environment in place
+
+    Args:
+        path: path to virtual environment
+        verbose: more output [default: 0]
+
+    Returns:
+        path to virtual environment
+    """
+    verbose = max(int(verbose or 0), 0)
+    archive_path = find_archive(path)
+    if not archive_path.is_file():
+        return path
+    # Python 3.12+ filters extracted members; venvs legitimately carry
+    #  absolute symlinks to their interpreter, so use the tar filter
+    kwds = {'filter': 'tar'} if hasattr(tarfile, 'tar_filter') else {}
+    with tarfile.open(str(archive_path), 'r:gz') as tar:
+        members = tar.getmembers()
+        label = f'Restoring {terminal.yellow(path.name)}'
+        with click.progressbar(members, label=label, file=sys.stderr) as progress:
+            for member in progress:
+                tar.extract(member, path=str(path), **kwds)
+    archive_path.unlink()
+    terminal.echo(f'{terminal.blue("Restored")}: {terminal.green(path)}', verbose=verbose)
+    return path
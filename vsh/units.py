@@ -0,0 +1,77 @@
+import re
+
+__all__ = ('format_size', 'parse_duration', 'parse_size')
+
+DURATION_UNITS = {
+    's': 1,
+    'm': 60,
+    'h': 60 * 60,
+    'd': 60 * 60 * 24,
+    'w': 60 * 60 * 24 * 7,
+    }
+
+SIZE_UNITS = {
+    '': 1,
+    'k': 1024,
+    'm': 1024 ** 2,
+    'g': 1024 ** 3,
+    't': 1024 ** 4,
+    }
+
+
+def format_size(size: int) -> str:
+    """Converts a number of bytes into a human readable size
+
+    Args:
+        size: number of bytes
+
+    Returns:
+        size (e.g. 512B, 1.5K, 50.0G)
+    """
+    if abs(size) < 1024:
+        return f'{size}B'
+    value = float(size)
+    for unit in ('K', 'M', 'G'):
+        value /= 1024
+        if abs(value) < 1024:
+            return f'{value:.1f}{unit}'
+    return f'{value / 1024:.1f}T'
+
+
+def parse_duration(value: str) -> float:
+    """Converts a human readable duration into seconds
+
+    Args:
+        value: duration (e.g. 90, 90s, 15m, 12h, 30d, 2w)
+
+    Raises:
+        ValueError: when the duration cannot be parsed
+
+    Returns:
+        number of seconds
+    """
+    match = re.fullmatch(r'\s*(?P<amount>\d+(\.\d+)?)\s*(?P<unit>[smhdw]?)\s*', str(value).lower())
+    if not match:
+        raise ValueError(f'Invalid duration: {value}')
+    amount = float(match.group('amount'))
+    unit = match.group('unit') or 's'
+    return amount * DURATION_UNITS[unit]
+
+
+def parse_size(value: str) -> int:
+    """Converts a human readable size into bytes
+
+    Args:
+        value: size (e.g. 1024, 512K, 1.5M, 50G, 2T)
+
+    Raises:
+        ValueError: when the size cannot be parsed
+
+    Returns:
+        number of bytes
+    """
+    match = re.fullmatch(r'\s*(?P<amount>\d+(\.\d+)?)\s*(?P<unit>[kmgt]?)(i?b)?\s*', str(value).lower())
+    if not match:
+        raise ValueError(f'Invalid size: {value}')
+    amount = float(match.group('amount'))
+    return int(amount * SIZE_UNITS[match.group('unit')])
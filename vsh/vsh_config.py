@@ -4,6 +4,7 @@ from dataclasses import asdict, dataclass
 from pathlib import Path
 from typing import Dict, List, Optional, Tuple, Union
 
+from . import instrument
 from .__metadata__ import package_metadata
 from .vendored import toml
 
@@ -35,6 +36,9 @@ class VshConfig:
         interpreter: path to the python executable
         shell: path to the os shell to run commands
         vsh_version: version of vsh
+        pinned: never evict the venv when reclaiming disk space
+        requirements_path: path to the requirements file installed into the venv
+        requirements_hash: hash of the requirement set last installed successfully
 
     """
     venv_name: Optional[str] = None
@@ -44,6 +48,9 @@ class VshConfig:
     interpreter_path: Optional[PathString] = None
     shell_path: Optional[PathString] = None
     vsh_version: str = package_metadata.version
+    pinned: bool = False
+    requirements_path: Optional[PathString] = None
+    requirements_hash: Optional[str] = None
 
     @property
     def json(self):
@@ -61,8 +68,8 @@ class VshConfig:
             self.venv_path = Path(self.venv_path)
 
         if self.vsh_config_path:
-            vsh_path = self.vsh_config_path.expanduser().resolve().absolute()
-            self.load(vsh_path)
+            # Reading needs no resolved path; resolving costs a stat per component
+            self.load(Path(self.vsh_config_path).expanduser())
 
         if self.venv_path and not self.venv_name:
             self.venv_name = self.venv_path.name
@@ -78,10 +85,12 @@ class VshConfig:
         else:
             self.interpreter_path = self._find_interpreter_path(self.interpreter_path)
 
+    @instrument.span('config dump')
     def dump(self, config_path: Path):
         with config_path.open('w') as stream:
             toml.dump(self.json, stream)
 
+    @instrument.span('config load')
     def load(self, config_path: Optional[Path] = None):
         if not config_path:
             config_path = Path(self.vsh_config_path)
@@ -106,7 +115,8 @@ class VshConfig:
     @staticmethod
     def _load_path(path: str, default: Path):
         new_path = Path(path.strip('"'))
-        if new_path.expanduser().resolve().absolute().exists():
+        # exists() follows symlinks itself, so the path need not be resolved first
+        if new_path.expanduser().exists():
             return new_path
         else:
             return default
@@ -0,0 +1,123 @@
+import hashlib
+import shlex
+import subprocess
+from pathlib import Path
+from typing import List, Optional, Set
+
+from .errors import RequirementsError
+from .vsh_config import HOME
+
+__all__ = ('WHEELHOUSE_PATH', 'build_wheelhouse', 'install_requirements', 'read_requirements', 'requirements_hash')
+
+# Wheels built or downloaded for any virtual environment
+WHEELHOUSE_PATH = HOME / '.vsh' / 'wheelhouse'
+
+
+def build_wheelhouse(python: Path, requirements_file: Path, digest: str, wheelhouse: Optional[Path] = None, offline: bool = False) -> Path:
+    """Builds or collects wheels for a requirements file
+
+    Wheels for a requirement set are only built once; identical sets
+    found by digest reuse the wheels already in the wheelhouse.
+
+    Args:
+        python: interpreter with pip used to build the wheels
+        requirements_file: path to requirements file
+        digest: hash of the declared requirement set (see requirements_hash)
+        wheelhouse: path to wheelhouse [default: ~/.vsh/wheelhouse]
+        offline: only use wheels already in the wheelhouse [default: False]
+
+    Raises:
+        RequirementsError: when pip fails, with pip's output
+
+    Returns:
+        path to wheelhouse
+    """
+    wheelhouse = Path(wheelhouse or WHEELHOUSE_PATH)
+    built_path = wheelhouse / '.built' / digest
+    if built_path.exists():
+        return wheelhouse
+    built_path.parent.mkdir(parents=True, exist_ok=True)
+    cmd = [str(python), '-m', 'pip', 'wheel', '--quiet', '--find-links', str(wheelhouse), '--wheel-dir', str(wheelhouse), '-r', str(requirements_file)]
+    if offline:
+        cmd.insert(cmd.index('--find-links'), '--no-index')
+    _run_pip(cmd, requirements_file)
+    built_path.touch()
+    return wheelhouse
+
+
+def install_requirements(python: Path, requirements_file: Path, wheelhouse: Optional[Path] = None):
+    """Installs a requirements file using only the wheelhouse
+
+    Args:
+        python: interpreter of the virtual environment
+        requirements_file: path to requirements file
+        wheelhouse: path to wheelhouse [default: ~/.vsh/wheelhouse]
+
+    Raises:
+        RequirementsError: when pip fails, with pip's output
+    """
+    wheelhouse = Path(wheelhouse or WHEELHOUSE_PATH)
+    cmd = [str(python), '-m', 'pip', 'install', '--quiet', '--no-index', '--find-links', str(wheelhouse), '-r', str(requirements_file)]
+    _run_pip(cmd, requirements_file)
+
+
+def read_requirements(path: Path, seen: Optional[Set[Path]] = None) -> List[str]:
+    """Reads a requirements file, including any files it references
+
+    Comments and blank lines are dropped and whitespace is normalized so
+    that equivalent files produce the same lines.
+
+    Args:
+        path: path to requirements file
+        seen: files already read, used to break include cycles
+
+    Returns:
+        requirement and option lines
+    """
+    path = path.expanduser().resolve().absolute()
+    seen = set() if seen is None else seen
+    if path in seen:
+        return []
+    seen.add(path)
+    lines = []
+    text = path.read_text(encoding='utf-8').replace('\\\n', ' ')
+    for line in text.splitlines():
+        line = line.split(' #', 1)[0].strip()
+        if not line or line.startswith('#'):
+            continue
+        tokens = shlex.split(line)
+        if tokens[0] in ('-r', '--requirement', '-c', '--constraint') and len(tokens) > 1:
+            lines.extend(read_requirements(path.parent / tokens[1], seen=seen))
+            continue
+        lines.append(' '.join(tokens))
+    return lines
+
+
+def requirements_hash(lines: List[str], python_version: str = '') -> str:
+    """Hashes a declared requirement set
+
+    Only the requirement lines and python version are keyed, not the
+    versions pip resolves them to; resolving would need the index on
+    every run, which is what the cache avoids.  Unpinned requirements
+    therefore keep their first build until a line changes, so pin them
+    (or add a constraints file) to pick up new releases.
+
+    Args:
+        lines: requirement and option lines (see read_requirements)
+        python_version: version of the interpreter the set is installed for
+
+    Returns:
+        hex digest identifying the requirement set
+    """
+    digest = hashlib.sha256(python_version.encode('utf-8'))
+    for line in sorted(set(lines)):
+        digest.update(b'\0' + line.encode('utf-8'))
+    return digest.hexdigest()
+
+
+def _run_pip(cmd: List[str], requirements_file: Path):
+    try:
+        subprocess.check_output(cmd, stderr=subprocess.STDOUT)
+    except subprocess.CalledProcessError as error:
+        output = (error.output or b'').decode('utf-8', errors='replace').strip()
+        raise RequirementsError(requirements=requirements_file, output=output) from error